@@ -0,0 +1,153 @@
+"""
+账号配置文件监听
+
+常驻运行时监听 ANYROUTER_ACCOUNTS_FILE，文件变化后重新加载并与当前账号增量比较。
+Linux 上使用 inotify 监听文件所在目录（编辑器保存时常用先写临时文件再改名的方式），
+inotify 不可用时按 mtime、大小和 inode 轮询。
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from journal import account_keys
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# struct inotify_event: wd, mask, cookie, len，后面跟 len 字节的文件名
+_EVENT = struct.Struct('iIII')
+
+
+@dataclass
+class AccountDiff:
+	added: list[str] = field(default_factory=list)
+	removed: list[str] = field(default_factory=list)
+	changed: list[str] = field(default_factory=list)
+
+	def __bool__(self):
+		return bool(self.added or self.removed or self.changed)
+
+
+def index_accounts(accounts) -> dict[str, dict]:
+	"""按账号标识（站点 + api_user）索引账号"""
+	return dict(zip(account_keys(accounts), accounts))
+
+
+def diff_accounts(old: dict[str, dict], new: dict[str, dict]) -> AccountDiff:
+	"""比较两份按标识索引的账号配置；同一账号的 cookies、代理等字段变化记为 changed"""
+	return AccountDiff(
+		added=[key for key in new if key not in old],
+		removed=[key for key in old if key not in new],
+		changed=[key for key in new if key in old and new[key] != old[key]],
+	)
+
+
+def _libc():
+	if not sys.platform.startswith('linux'):
+		return None
+	try:
+		libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+	except OSError:
+		return None
+	return libc if hasattr(libc, 'inotify_init1') else None
+
+
+class FileWatcher:
+	"""文件变化时调用 on_change()，短时间内的多次变化只触发一次"""
+
+	def __init__(self, path, on_change, poll_interval: float = 2.0, debounce: float = 0.2, use_inotify: bool = True):
+		self.path = Path(path).resolve()
+		self.on_change = on_change
+		self.poll_interval = poll_interval
+		self.debounce = debounce
+		self.use_inotify = use_inotify
+		self.mode = None
+		self._fd = None
+		self._poll_task = None
+		self._pending = None
+		self._loop = None
+
+	def start(self):
+		self._loop = asyncio.get_running_loop()
+		if self.use_inotify and self._start_inotify():
+			self.mode = 'inotify'
+		else:
+			self.mode = 'poll'
+			self._poll_task = asyncio.create_task(self._poll())
+		print(f'[INFO] Watching {self.path} for account changes ({self.mode})')
+
+	def stop(self):
+		if self._fd is not None:
+			self._loop.remove_reader(self._fd)
+			os.close(self._fd)
+			self._fd = None
+		if self._poll_task:
+			self._poll_task.cancel()
+			self._poll_task = None
+		if self._pending:
+			self._pending.cancel()
+			self._pending = None
+
+	def _start_inotify(self) -> bool:
+		libc = _libc()
+		if libc is None:
+			return False
+		fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+		if fd < 0:
+			return False
+		if libc.inotify_add_watch(fd, os.fsencode(self.path.parent), WATCH_MASK) < 0:
+			os.close(fd)
+			return False
+		self._fd = fd
+		self._loop.add_reader(fd, self._read_events)
+		return True
+
+	def _read_events(self):
+		try:
+			data = os.read(self._fd, 65536)
+		except BlockingIOError:
+			return
+		name = os.fsencode(self.path.name)
+		offset = 0
+		while offset + _EVENT.size <= len(data):
+			_, _, _, length = _EVENT.unpack_from(data, offset)
+			event_name = data[offset + _EVENT.size : offset + _EVENT.size + length].rstrip(b'\0')
+			offset += _EVENT.size + length
+			if event_name == name:
+				self._schedule()
+				return
+
+	def _signature(self):
+		try:
+			stat = os.stat(self.path)
+		except OSError:
+			return None
+		return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+	async def _poll(self):
+		signature = self._signature()
+		while True:
+			await asyncio.sleep(self.poll_interval)
+			current = self._signature()
+			if current != signature:
+				signature = current
+				self._schedule()
+
+	def _schedule(self):
+		if self._pending:
+			self._pending.cancel()
+		self._pending = self._loop.call_later(self.debounce, self._fire)
+
+	def _fire(self):
+		self._pending = None
+		self.on_change()
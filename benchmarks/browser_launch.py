@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+浏览器冷启动基准测试
+
+对比 headful、new-headless 和 headless-shell 三种模式的冷启动时间和内存占用（RSS），
+仅支持 Linux。headful 模式需要 DISPLAY（例如在 xvfb-run 下执行），否则跳过。
+
+用法: python benchmarks/browser_launch.py [--runs 5] [--modes headful,new,shell] [--json out.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from playwright.async_api import async_playwright
+
+from browser import HEADFUL, HEADLESS_MODES, context_options, has_display, launch_options
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _process_table():
+	"""读取 /proc 中所有进程的父进程和 RSS"""
+	table = {}
+	for entry in os.listdir('/proc'):
+		if not entry.isdigit():
+			continue
+		try:
+			with open(f'/proc/{entry}/stat') as f:
+				fields = f.read().rsplit(')', 1)[1].split()
+			table[int(entry)] = (int(fields[1]), int(fields[21]) * PAGE_SIZE)
+		except (OSError, IndexError, ValueError):
+			continue
+	return table
+
+
+def tree_rss(root_pid: int) -> int:
+	"""统计进程树（不含根进程）的 RSS 总和，单位字节"""
+	table = _process_table()
+	children = {}
+	for pid, (ppid, _) in table.items():
+		children.setdefault(ppid, []).append(pid)
+
+	total = 0
+	stack = list(children.get(root_pid, []))
+	while stack:
+		pid = stack.pop()
+		total += table[pid][1]
+		stack.extend(children.get(pid, []))
+	return total
+
+
+async def measure(playwright, mode: str) -> dict:
+	"""测量一次冷启动：启动浏览器到打开空白页的耗时，以及启动后的内存占用"""
+	baseline_rss = tree_rss(os.getpid())
+	start = time.perf_counter()
+	browser = await playwright.chromium.launch(**launch_options(mode))
+	context = await browser.new_context(**context_options())
+	page = await context.new_page()
+	await page.goto('about:blank')
+	elapsed = time.perf_counter() - start
+	rss = tree_rss(os.getpid()) - baseline_rss
+	await browser.close()
+	return {'cold_start': elapsed, 'rss': rss}
+
+
+async def run(modes, runs):
+	results = {}
+	async with async_playwright() as p:
+		for mode in modes:
+			if mode == HEADFUL and not has_display():
+				print(f'[SKIP] {mode}: no DISPLAY, run under xvfb-run to include it')
+				continue
+			samples = []
+			for _ in range(runs):
+				try:
+					samples.append(await measure(p, mode))
+				except Exception as e:
+					print(f'[FAILED] {mode}: {e}')
+					break
+			if samples:
+				results[mode] = {
+					'runs': len(samples),
+					'cold_start_median': statistics.median(s['cold_start'] for s in samples),
+					'cold_start_max': max(s['cold_start'] for s in samples),
+					'rss_median_mb': statistics.median(s['rss'] for s in samples) / 1024 / 1024,
+				}
+	return results
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Compare browser cold-start time and RSS per headless mode')
+	parser.add_argument('--runs', type=int, default=5)
+	parser.add_argument('--modes', default=','.join(HEADLESS_MODES))
+	parser.add_argument('--json', help='write results to this file')
+	args = parser.parse_args()
+
+	if not sys.platform.startswith('linux'):
+		print('[ERROR] This benchmark reads /proc and only runs on Linux')
+		sys.exit(1)
+
+	results = asyncio.run(run(args.modes.split(','), args.runs))
+
+	print(f'{"mode":<10} {"runs":>4} {"cold start (s)":>15} {"max (s)":>8} {"RSS (MB)":>9}')
+	for mode, r in results.items():
+		print(
+			f'{mode:<10} {r["runs"]:>4} {r["cold_start_median"]:>15.3f} {r["cold_start_max"]:>8.3f} {r["rss_median_mb"]:>9.1f}'
+		)
+
+	if args.json:
+		with open(args.json, 'w', encoding='utf-8') as f:
+			json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+登录页磁盘缓存基准测试
+
+对比冷缓存（每次使用全新的配置目录）和热缓存（复用同一个持久化配置目录）时，打开登录页的导航耗时和
+实际经网络传输的字节数（CDP Network.loadingFinished 的 encodedDataLength，命中缓存的资源不计入）。
+
+默认使用进程内的假 AnyRouter 服务（登录页引用一个可缓存的 JS 文件），也可以用 --url 指定真实站点。
+
+用法: python benchmarks/profile_cache.py [--runs 5] [--url https://anyrouter.top/login] [--json out.json]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+sys.path.insert(0, str(root / 'tests'))
+
+from fake_anyrouter import FakeAnyRouter
+from playwright.async_api import async_playwright
+
+from browser import launch_profile_context
+
+
+async def navigate(playwright, profile: Path, url: str) -> dict:
+	"""启动一次浏览器并打开登录页，返回导航耗时、网络传输字节数和命中缓存的请求数"""
+	context = await launch_profile_context(playwright, profile)
+	try:
+		await context.clear_cookies()
+		page = context.pages[0] if context.pages else await context.new_page()
+		session = await context.new_cdp_session(page)
+		stats = {'bytes': 0, 'cached': 0}
+
+		def finished(event):
+			stats['bytes'] += int(event.get('encodedDataLength', 0))
+
+		def served_from_cache(event):
+			stats['cached'] += 1
+
+		session.on('Network.loadingFinished', finished)
+		session.on('Network.requestServedFromCache', served_from_cache)
+		await session.send('Network.enable')
+
+		start = time.perf_counter()
+		await page.goto(url, wait_until='networkidle')
+		stats['navigation'] = time.perf_counter() - start
+		return stats
+	finally:
+		await context.close()
+
+
+def summarize(samples: list[dict]) -> dict:
+	return {
+		'runs': len(samples),
+		'navigation_median': statistics.median(s['navigation'] for s in samples),
+		'bytes_median': statistics.median(s['bytes'] for s in samples),
+		'cached_median': statistics.median(s['cached'] for s in samples),
+	}
+
+
+async def run(url: str, runs: int) -> dict:
+	async with async_playwright() as p:
+		cold = []
+		for _ in range(runs):
+			with tempfile.TemporaryDirectory() as profile:
+				cold.append(await navigate(p, Path(profile), url))
+
+		warm = []
+		with tempfile.TemporaryDirectory() as profile:
+			# 先访问一次填充缓存
+			await navigate(p, Path(profile), url)
+			for _ in range(runs):
+				warm.append(await navigate(p, Path(profile), url))
+	return {'cold': summarize(cold), 'warm': summarize(warm)}
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Compare login page navigation with a cold and a warm disk cache')
+	parser.add_argument('--runs', type=int, default=5)
+	parser.add_argument('--url', help='login page to load, defaults to an in-process fake AnyRouter')
+	parser.add_argument('--asset-kb', type=int, default=512, help='size of the cacheable script on the fake login page')
+	parser.add_argument('--json', help='write results to this file')
+	args = parser.parse_args()
+
+	if args.url:
+		results = asyncio.run(run(args.url, args.runs))
+	else:
+		with FakeAnyRouter(asset_size=args.asset_kb * 1024) as server:
+			results = asyncio.run(run(f'{server.base_url}/login', args.runs))
+
+	print(f'{"cache":<6} {"runs":>4} {"navigation (s)":>15} {"network KB":>11} {"cached requests":>16}')
+	for name, r in results.items():
+		print(
+			f'{name:<6} {r["runs"]:>4} {r["navigation_median"]:>15.3f} '
+			f'{r["bytes_median"] / 1024:>11.1f} {r["cached_median"]:>16.0f}'
+		)
+
+	if args.json:
+		with open(args.json, 'w', encoding='utf-8') as f:
+			json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+WAF cookies 获取的浏览器内核对比
+
+对每个内核（chromium、firefox、webkit）重复获取 WAF cookies，记录启动耗时（启动浏览器到上下文可用）、
+拿到 cookies 的耗时（打开登录页到三个 WAF cookies 齐全）、拿到 cookies 时浏览器进程树的内存占用（RSS）
+以及成功率，仅支持 Linux。
+
+默认使用进程内的假 AnyRouter 服务，登录页先返回 JS 挑战（--rounds 轮哈希），浏览器算出 acw_sc__v2 后再请求
+校验接口换取剩余 cookie；也可以用 --url 指定真实站点。未安装的内核会跳过（playwright install firefox webkit）。
+
+用法: python benchmarks/waf_engines.py [--runs 10] [--engines chromium,firefox,webkit] [--json out.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+sys.path.insert(0, str(root / 'tests'))
+
+from browser_launch import tree_rss
+from fake_anyrouter import FakeAnyRouter
+from playwright.async_api import async_playwright
+
+from browser import ENGINES, open_context
+from checkin import WAF_COOKIES, read_waf_cookies
+
+
+async def measure(playwright, engine: str, base_url: str) -> dict:
+	"""完整获取一次 WAF cookies，启动失败时抛出异常"""
+	baseline_rss = tree_rss(os.getpid())
+	start = time.perf_counter()
+	context, close = await open_context(playwright, engine=engine)
+	launched = time.perf_counter()
+	try:
+		cookies = await read_waf_cookies(context, base_url)
+		elapsed = time.perf_counter() - launched
+		rss = tree_rss(os.getpid()) - baseline_rss
+	except Exception as e:
+		print(f'[FAILED] {engine}: {e}')
+		cookies, elapsed, rss = {}, None, None
+	finally:
+		await close()
+	return {
+		'launch': launched - start,
+		'time_to_cookie': elapsed,
+		'rss': rss,
+		'success': all(name in cookies for name in WAF_COOKIES),
+	}
+
+
+def summarize(samples: list[dict]) -> dict:
+	succeeded = [s for s in samples if s['success']]
+	result = {
+		'runs': len(samples),
+		'success_rate': len(succeeded) / len(samples),
+		'launch_median': statistics.median(s['launch'] for s in samples),
+		'launch_max': max(s['launch'] for s in samples),
+	}
+	if succeeded:
+		result['time_to_cookie_median'] = statistics.median(s['time_to_cookie'] for s in succeeded)
+		result['time_to_cookie_max'] = max(s['time_to_cookie'] for s in succeeded)
+		result['rss_median_mb'] = statistics.median(s['rss'] for s in succeeded) / 1024 / 1024
+	return result
+
+
+async def run(engines, runs: int, base_url: str, server: FakeAnyRouter | None = None) -> dict:
+	results = {}
+	async with async_playwright() as p:
+		for engine in engines:
+			if not os.path.exists(getattr(p, engine).executable_path):
+				print(f'[SKIP] {engine}: not installed, run playwright install {engine}')
+				continue
+			samples = []
+			for _ in range(runs):
+				if server:
+					# 每次都要重新过挑战，不能用上一次算出的答案
+					server.waf_generation += 1
+					# 服务端先算好答案，不计入拿到 cookies 的耗时
+					server.challenge_answer(server.waf_generation)
+				try:
+					samples.append(await measure(p, engine, base_url))
+				except Exception as e:
+					print(f'[FAILED] {engine}: {e}')
+					break
+			if samples:
+				results[engine] = summarize(samples)
+	return results
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Compare WAF cookie acquisition across browser engines')
+	parser.add_argument('--runs', type=int, default=10)
+	parser.add_argument('--engines', default=','.join(ENGINES))
+	parser.add_argument('--url', help='site to load /login from, defaults to an in-process fake AnyRouter')
+	parser.add_argument('--rounds', type=int, default=2_000_000, help='hash rounds of the fake JS challenge')
+	parser.add_argument('--json', help='write results to this file')
+	args = parser.parse_args()
+
+	if not sys.platform.startswith('linux'):
+		print('[ERROR] This benchmark reads /proc and only runs on Linux')
+		sys.exit(1)
+
+	engines = args.engines.split(',')
+	unknown = [engine for engine in engines if engine not in ENGINES]
+	if unknown:
+		parser.error(f'unknown engines: {", ".join(unknown)}')
+
+	if args.url:
+		results = asyncio.run(run(engines, args.runs, args.url.rstrip('/')))
+	else:
+		with FakeAnyRouter(challenge_rounds=args.rounds) as server:
+			results = asyncio.run(run(engines, args.runs, server.base_url, server))
+
+	print(
+		f'{"engine":<9} {"runs":>4} {"success":>8} {"launch (s)":>11} {"to cookie (s)":>14} {"max (s)":>8} {"RSS (MB)":>9}'
+	)
+	for engine, r in results.items():
+		if 'time_to_cookie_median' in r:
+			cookie = f'{r["time_to_cookie_median"]:>14.3f} {r["time_to_cookie_max"]:>8.3f} {r["rss_median_mb"]:>9.1f}'
+		else:
+			cookie = f'{"-":>14} {"-":>8} {"-":>9}'
+		print(f'{engine:<9} {r["runs"]:>4} {r["success_rate"]:>8.0%} {r["launch_median"]:>11.3f} {cookie}')
+
+	if args.json:
+		with open(args.json, 'w', encoding='utf-8') as f:
+			json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+	main()
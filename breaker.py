@@ -0,0 +1,90 @@
+"""
+通知通道熔断器
+
+连续失败达到阈值后熔断该通道，冷却时间过后放行一次半开探测，
+探测成功则恢复，失败则重新熔断。状态保存在磁盘上，跨运行生效。
+"""
+
+import time
+
+from state import load_json, save_json
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+	def __init__(self, path, failure_threshold: int = 3, cooldown: float = 6 * 3600, clock=time.time):
+		self.path = path
+		self.failure_threshold = max(1, failure_threshold)
+		self.cooldown = cooldown
+		self.clock = clock
+		self.channels: dict[str, dict] = load_json(path, {}) or {}
+		self.transitions: list[str] = []
+
+	def _channel(self, name: str) -> dict:
+		return self.channels.setdefault(name, {'state': CLOSED, 'failures': 0, 'opened_at': None, 'last_error': None})
+
+	def _transition(self, name: str, channel: dict, new_state: str, reason: str = ''):
+		old_state = channel['state']
+		if old_state == new_state:
+			return
+		channel['state'] = new_state
+		message = f'{name}: {old_state} -> {new_state}'
+		if reason:
+			message += f' ({reason})'
+		self.transitions.append(message)
+		print(f'[BREAKER] {message}')
+
+	def state(self, name: str) -> str:
+		return self.channels.get(name, {}).get('state', CLOSED)
+
+	def allow(self, name: str) -> bool:
+		"""判断通道是否允许发送，熔断冷却结束后转为半开状态放行一次探测"""
+		channel = self._channel(name)
+		if channel['state'] != OPEN:
+			return True
+
+		if self.clock() - (channel['opened_at'] or 0) >= self.cooldown:
+			self._transition(name, channel, HALF_OPEN, 'cooldown elapsed, probing')
+			return True
+		return False
+
+	def record_success(self, name: str):
+		channel = self._channel(name)
+		channel['failures'] = 0
+		channel['last_error'] = None
+		self._transition(name, channel, CLOSED, 'probe succeeded' if channel['state'] == HALF_OPEN else '')
+
+	def record_failure(self, name: str, error: str = ''):
+		channel = self._channel(name)
+		channel['failures'] += 1
+		channel['last_error'] = error[:100] if error else None
+
+		if channel['state'] == HALF_OPEN or channel['failures'] >= self.failure_threshold:
+			channel['opened_at'] = self.clock()
+			self._transition(name, channel, OPEN, f'{channel["failures"]} consecutive failures')
+
+	def retry_at(self, name: str) -> float | None:
+		channel = self.channels.get(name)
+		if not channel or channel['state'] != OPEN:
+			return None
+		return (channel['opened_at'] or 0) + self.cooldown
+
+	def report_lines(self) -> list[str]:
+		"""生成报告中展示的通道健康信息，只列出非正常通道"""
+		lines = []
+		for name, channel in self.channels.items():
+			if channel['state'] == OPEN:
+				retry_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.retry_at(name)))
+				lines.append(f'[BREAKER] {name}: open after {channel["failures"]} failures, next probe at {retry_at}')
+			elif channel['state'] == HALF_OPEN:
+				lines.append(f'[BREAKER] {name}: half-open, probing')
+		return lines
+
+	def save(self):
+		try:
+			save_json(self.path, self.channels)
+		except OSError as e:
+			print(f'[BREAKER] Failed to save breaker state: {e}')
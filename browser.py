@@ -0,0 +1,357 @@
+"""
+浏览器启动配置
+
+ANYROUTER_HEADLESS 选择启动模式：
+- headful: 有界面模式，需要桌面环境或 Xvfb
+- new: 完整 Chromium 的新版无头模式
+- shell: Chromium headless shell，体积更小、启动更快
+- auto（默认）: 有桌面环境时使用 headful，否则使用 new
+
+ANYROUTER_BROWSER_ARGS 选择启动参数：default 或 lean（与青龙版本一致的精简参数），
+无头模式下默认使用 lean。
+
+ANYROUTER_BROWSER_ENDPOINT 指定一个常驻运行的浏览器（CDP 地址或 Playwright 浏览器服务的
+WebSocket 地址），设置后直接连接该浏览器，不再为每次获取 WAF cookies 启动 Chromium；
+无法连接时回退到本地启动，之后 ANYROUTER_BROWSER_RETRY 秒内不再尝试连接。
+
+ANYROUTER_BROWSER_PROFILE 开启持久化的浏览器配置目录：本地启动时使用 launch_persistent_context，
+登录页的 JS 和挑战脚本保存在磁盘缓存中，下次运行直接复用。cookies 在每个账号使用前后清空，
+不会在账号之间或运行之间共享。目录总大小超过 ANYROUTER_BROWSER_PROFILE_MAX_MB 时删除最久未用的配置。
+
+ANYROUTER_BROWSER_ENGINE 选择浏览器内核：chromium（默认）、firefox 或 webkit。启动参数、new / shell 模式和
+Chrome 的 User-Agent 只用于 Chromium，其他内核以无头或有界面模式启动并使用自身的 User-Agent；
+CDP 只支持 Chromium，连接 Playwright 浏览器服务时服务端需要使用相同的内核。
+"""
+
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from state import state_path
+
+HEADFUL = 'headful'
+NEW_HEADLESS = 'new'
+HEADLESS_SHELL = 'shell'
+HEADLESS_MODES = (HEADFUL, NEW_HEADLESS, HEADLESS_SHELL)
+
+CHROMIUM = 'chromium'
+FIREFOX = 'firefox'
+WEBKIT = 'webkit'
+ENGINES = (CHROMIUM, FIREFOX, WEBKIT)
+
+CDP = 'cdp'
+PLAYWRIGHT_SERVER = 'playwright'
+
+USER_AGENT = (
+	'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36'
+)
+
+DEFAULT_ARGS = [
+	'--disable-blink-features=AutomationControlled',
+	'--disable-dev-shm-usage',
+	'--disable-web-security',
+	'--disable-features=VizDisplayCompositor',
+	'--no-sandbox',
+]
+
+LEAN_ARGS = DEFAULT_ARGS + [
+	'--disable-setuid-sandbox',
+	'--disable-gpu',
+	'--disable-extensions',
+	'--disable-background-timer-throttling',
+	'--disable-renderer-backgrounding',
+	'--disable-backgrounding-occluded-windows',
+	'--disable-ipc-flooding-protection',
+	'--memory-pressure-off',
+]
+
+# 同时获取 WAF cookies 的浏览器不能共用一个配置目录，每个浏览器占用一个 slot-N 子目录
+PROFILE_SLOT_PREFIX = 'slot-'
+
+_MODE_ALIASES = {
+	'false': HEADFUL,
+	'0': HEADFUL,
+	'headful': HEADFUL,
+	'true': NEW_HEADLESS,
+	'1': NEW_HEADLESS,
+	'new': NEW_HEADLESS,
+	'shell': HEADLESS_SHELL,
+	'headless-shell': HEADLESS_SHELL,
+}
+
+
+def has_display() -> bool:
+	"""判断当前环境是否可以显示浏览器窗口"""
+	if sys.platform in ('win32', 'darwin'):
+		return True
+	return bool(os.getenv('DISPLAY') or os.getenv('WAYLAND_DISPLAY'))
+
+
+def headless_mode() -> str:
+	"""根据 ANYROUTER_HEADLESS 解析启动模式"""
+	value = os.getenv('ANYROUTER_HEADLESS', 'auto').strip().lower()
+	if value in _MODE_ALIASES:
+		return _MODE_ALIASES[value]
+	if value != 'auto':
+		print(f'[WARNING] Unknown ANYROUTER_HEADLESS value {value!r}, falling back to auto')
+	return HEADFUL if has_display() else NEW_HEADLESS
+
+
+def browser_engine() -> str:
+	"""根据 ANYROUTER_BROWSER_ENGINE 选择浏览器内核"""
+	value = os.getenv('ANYROUTER_BROWSER_ENGINE', '').strip().lower() or CHROMIUM
+	if value not in ENGINES:
+		print(f'[WARNING] Unknown ANYROUTER_BROWSER_ENGINE value {value!r}, falling back to {CHROMIUM}')
+		return CHROMIUM
+	return value
+
+
+def launch_options(mode: str | None = None, args_profile: str | None = None, engine: str = CHROMIUM) -> dict:
+	"""生成 launch 的参数"""
+	mode = mode or headless_mode()
+	if mode not in HEADLESS_MODES:
+		raise ValueError(f'Unknown headless mode: {mode}')
+	if engine != CHROMIUM:
+		# 启动参数和 channel 都是 Chromium 专用的，其他内核只区分是否无头
+		return {'headless': mode != HEADFUL}
+
+	args_profile = args_profile or os.getenv('ANYROUTER_BROWSER_ARGS') or ('default' if mode == HEADFUL else 'lean')
+	options = {
+		'headless': mode != HEADFUL,
+		'args': list(LEAN_ARGS if args_profile == 'lean' else DEFAULT_ARGS),
+	}
+	# 新版无头模式需要完整的 Chromium，headless=True 且不指定 channel 时 Playwright 使用 headless shell
+	if mode == NEW_HEADLESS:
+		options['channel'] = 'chromium'
+	return options
+
+
+def context_options(engine: str = CHROMIUM) -> dict:
+	"""生成 browser.new_context 的参数"""
+	options = {'viewport': {'width': 1920, 'height': 1080}}
+	# Chrome 的 User-Agent 配上其他内核的指纹反而更容易被 WAF 识别
+	if engine == CHROMIUM:
+		options['user_agent'] = USER_AGENT
+	return options
+
+
+async def launch_browser(
+	playwright,
+	mode: str | None = None,
+	args_profile: str | None = None,
+	proxy: dict | None = None,
+	engine: str | None = None,
+):
+	"""按配置启动浏览器，proxy 为 Playwright 格式的代理参数"""
+	engine = engine or browser_engine()
+	options = launch_options(mode, args_profile, engine)
+	if proxy:
+		options['proxy'] = proxy
+	return await getattr(playwright, engine).launch(**options)
+
+
+def browser_endpoint() -> tuple[str, str] | None:
+	"""返回 (外部浏览器地址, 协议)，未配置时返回 None
+
+	协议由 ANYROUTER_BROWSER_PROTOCOL（cdp 或 playwright）指定，默认按地址判断：http(s):// 地址和
+	路径以 /devtools/ 开头的 WebSocket 地址使用 CDP，其他 WebSocket 地址视为 Playwright 浏览器服务。
+	"""
+	endpoint = os.getenv('ANYROUTER_BROWSER_ENDPOINT', '').strip()
+	if not endpoint:
+		return None
+	protocol = os.getenv('ANYROUTER_BROWSER_PROTOCOL', '').strip().lower()
+	if protocol not in (CDP, PLAYWRIGHT_SERVER):
+		parts = urlsplit(endpoint)
+		is_cdp = parts.scheme in ('http', 'https') or parts.path.startswith('/devtools/')
+		protocol = CDP if is_cdp else PLAYWRIGHT_SERVER
+	return endpoint, protocol
+
+
+# 连接失败过的地址及失败时间，重试间隔内直接本地启动，不再等待连接超时
+_unreachable: dict[str, float] = {}
+
+
+def endpoint_unreachable(url: str) -> bool:
+	"""地址最近连接失败过；超过 ANYROUTER_BROWSER_RETRY 秒后重新尝试，常驻进程中重启过的外部浏览器可以恢复使用"""
+	failed_at = _unreachable.get(url)
+	if failed_at is None:
+		return False
+	if time.monotonic() - failed_at < float(os.getenv('ANYROUTER_BROWSER_RETRY', '300')):
+		return True
+	del _unreachable[url]
+	return False
+
+
+async def open_browser(playwright, mode: str | None = None, proxy: dict | None = None, engine: str | None = None):
+	"""连接外部浏览器，未配置或无法连接时按配置在本地启动，返回 (浏览器, 是否为外部浏览器)
+
+	连接外部浏览器时 proxy 不生效，需要在创建上下文时传入。
+	"""
+	engine = engine or browser_engine()
+	endpoint = browser_endpoint()
+	if endpoint and not endpoint_unreachable(endpoint[0]):
+		url, protocol = endpoint
+		timeout = float(os.getenv('ANYROUTER_BROWSER_CONNECT_TIMEOUT', '5')) * 1000
+		try:
+			if protocol == CDP:
+				return await playwright.chromium.connect_over_cdp(url, timeout=timeout), True
+			return await getattr(playwright, engine).connect(url, timeout=timeout), True
+		except Exception as e:
+			_unreachable[url] = time.monotonic()
+			print(f'[WARNING] Unable to connect to browser endpoint ({protocol}): {e}, launching a local browser')
+	return await launch_browser(playwright, mode, proxy=proxy, engine=engine), False
+
+
+def profile_root() -> Path | None:
+	"""返回持久化配置的根目录，未开启时返回 None，设为 1 或 true 时使用状态目录下的 browser_profile"""
+	value = os.getenv('ANYROUTER_BROWSER_PROFILE', '').strip()
+	if not value or value.lower() in ('0', 'false'):
+		return None
+	if value.lower() in ('1', 'true'):
+		return state_path('browser_profile')
+	return Path(value)
+
+
+def profile_max_bytes() -> int:
+	return int(float(os.getenv('ANYROUTER_BROWSER_PROFILE_MAX_MB', '200')) * 1024 * 1024)
+
+
+def directory_size(path: Path) -> int:
+	total = 0
+	for dirpath, _, filenames in os.walk(path):
+		for filename in filenames:
+			try:
+				total += os.lstat(os.path.join(dirpath, filename)).st_size
+			except OSError:
+				continue
+	return total
+
+
+class ProfilePool:
+	"""分配配置目录，正在使用的目录不会分给其他浏览器"""
+
+	def __init__(self):
+		self.busy: set[Path] = set()
+
+	def acquire(self, root: Path) -> Path:
+		index = 0
+		while (slot := root / f'{PROFILE_SLOT_PREFIX}{index}') in self.busy:
+			index += 1
+		slot.mkdir(parents=True, exist_ok=True)
+		self.busy.add(slot)
+		return slot
+
+	def release(self, slot: Path):
+		self.busy.discard(slot)
+		try:
+			# 目录的修改时间作为最近使用时间，清理时先删除最久未用的配置
+			os.utime(slot)
+		except OSError:
+			pass
+
+	def trim(self, root: Path, max_bytes: int) -> list[Path]:
+		"""总大小超过上限时，按最近使用时间从旧到新删除空闲的配置目录，返回删除的目录"""
+		if not root.is_dir():
+			return []
+		slots = [path for path in root.iterdir() if path.is_dir() and path.name.startswith(PROFILE_SLOT_PREFIX)]
+		sizes = {slot: directory_size(slot) for slot in slots}
+		total = sum(sizes.values())
+		removed = []
+		for slot in sorted(slots, key=lambda path: path.stat().st_mtime):
+			if total <= max_bytes:
+				break
+			if slot in self.busy:
+				continue
+			shutil.rmtree(slot, ignore_errors=True)
+			total -= sizes[slot]
+			removed.append(slot)
+		if removed:
+			print(
+				f'[INFO] Browser profile cache over {max_bytes / 1024 / 1024:.0f} MB, '
+				f'removed {len(removed)} least recently used profiles'
+			)
+		return removed
+
+
+_profiles = ProfilePool()
+
+
+async def launch_profile_context(
+	playwright,
+	slot: Path,
+	mode: str | None = None,
+	proxy: dict | None = None,
+	max_bytes: int | None = None,
+	engine: str | None = None,
+):
+	"""以 slot 为配置目录启动浏览器，返回持久化上下文"""
+	engine = engine or browser_engine()
+	options = launch_options(mode, engine=engine)
+	options.update(context_options(engine))
+	max_bytes = profile_max_bytes() if max_bytes is None else max_bytes
+	# 限制单个配置的 HTTP 缓存大小，其余文件（代码缓存等）由 trim 控制
+	if engine == CHROMIUM:
+		options['args'].append(f'--disk-cache-size={max_bytes}')
+	elif engine == FIREFOX:
+		options['firefox_user_prefs'] = {
+			'browser.cache.disk.smart_size.enabled': False,
+			'browser.cache.disk.capacity': max_bytes // 1024,
+		}
+	if proxy:
+		options['proxy'] = proxy
+	return await getattr(playwright, engine).launch_persistent_context(str(slot), **options)
+
+
+async def open_context(playwright, mode: str | None = None, proxy: dict | None = None, engine: str | None = None):
+	"""打开获取 WAF cookies 用的浏览器上下文，返回 (上下文, 关闭函数)
+
+	优先连接外部浏览器；未配置外部浏览器且开启了持久化配置时使用持久化上下文，启动失败（例如配置目录
+	被其他进程占用）时回退到普通的无痕上下文。
+	"""
+	engine = engine or browser_engine()
+	endpoint = browser_endpoint()
+	root = profile_root()
+	if root and not (endpoint and not endpoint_unreachable(endpoint[0])):
+		# 不同内核的配置目录格式不同，不能共用
+		if engine != CHROMIUM:
+			root = root / engine
+		slot = _profiles.acquire(root)
+		try:
+			context = await launch_profile_context(playwright, slot, mode, proxy, engine=engine)
+			# 上一个账号留下的 cookies 不能带到这个账号
+			await context.clear_cookies()
+		except Exception as e:
+			_profiles.release(slot)
+			print(f'[WARNING] Unable to launch browser with profile {slot}: {e}, using a fresh context')
+		else:
+
+			async def close_profile():
+				try:
+					await context.clear_cookies()
+					await context.close()
+				finally:
+					_profiles.release(slot)
+					_profiles.trim(root, profile_max_bytes())
+
+			return context, close_profile
+
+	browser, attached = await open_browser(playwright, mode, proxy=proxy, engine=engine)
+	options = context_options(CHROMIUM if attached and endpoint[1] == CDP else engine)
+	if attached and proxy:
+		options['proxy'] = proxy
+	try:
+		context = await browser.new_context(**options)
+	except Exception:
+		await browser.close()
+		raise
+
+	async def close():
+		if attached:
+			# 外部浏览器继续运行，只关闭本次创建的上下文并断开连接
+			await context.close()
+		await browser.close()
+
+	return context, close
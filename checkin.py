@@ -4,50 +4,150 @@ AnyRouter.top 自动签到脚本
 """
 
 import asyncio
+import contextlib
 import json
 import os
+import signal
 import sys
+import time
+from dataclasses import dataclass, field
 from datetime import datetime
-
-import httpx
-from dotenv import load_dotenv
-from playwright.async_api import async_playwright
-
-from notify import notify
-
-load_dotenv()
+from pathlib import Path
+
+import profiling
+from browser import CHROMIUM, USER_AGENT, browser_endpoint, browser_engine, headless_mode, open_context, profile_root
+from deadline import RunDeadline
+from fleet_stats import FleetStats
+from journal import CheckpointJournal, account_keys, resume_requested
+from lease import RunLease, accounts_digest
+from notify import NotificationKit, notify
+from notify_routes import deliver_routes
+from pipeline import Pipeline, Stage
+from progress import ProgressReporter
+from proxy_pool import Proxy, ProxyPool
+from quarantine import AccountQuarantine
+from results import AccountResult, Failure, ResultSink
+from scheduling import AccountHistory, estimate, is_priority, predict_makespan, schedule_order
+from sites import SitePools, account_base_url, default_base_url, host_of
+from state import state_path
+from waf_cache import DIRECT, WafChallengeError, WafCookieCache, is_waf_challenge
+
+
+def load_env():
+	"""加载 .env 文件中的环境变量，在入口处调用，避免导入模块时读取文件"""
+	from dotenv import load_dotenv
+
+	load_dotenv()
 
 
 def load_accounts():
-	"""从环境变量加载多账号配置"""
+	"""加载多账号配置，设置了 ANYROUTER_ACCOUNTS_FILE 时从文件读取，否则从环境变量读取"""
+	accounts_file = os.getenv('ANYROUTER_ACCOUNTS_FILE')
+	if accounts_file:
+		try:
+			with open(accounts_file, encoding='utf-8') as f:
+				return parse_accounts(f.read())
+		except OSError as e:
+			print(f'ERROR: Unable to read account file {accounts_file}: {e}')
+			return None
+
 	accounts_str = os.getenv('ANYROUTER_ACCOUNTS')
 	if not accounts_str:
 		print('ERROR: ANYROUTER_ACCOUNTS environment variable not found')
 		return None
+	return parse_accounts(accounts_str)
+
 
+def parse_accounts(accounts_str):
+	"""解析并校验多账号配置"""
 	try:
 		accounts_data = json.loads(accounts_str)
-
-		# 检查是否为数组格式
-		if not isinstance(accounts_data, list):
-			print('ERROR: Account configuration must use array format [{}]')
-			return None
-
-		# 验证账号数据格式
-		for i, account in enumerate(accounts_data):
-			if not isinstance(account, dict):
-				print(f'ERROR: Account {i + 1} configuration format is incorrect')
-				return None
-			if 'cookies' not in account or 'api_user' not in account:
-				print(f'ERROR: Account {i + 1} missing required fields (cookies, api_user)')
-				return None
-
-		return accounts_data
+		return accounts_data if validate_accounts(accounts_data) else None
 	except Exception as e:
 		print(f'ERROR: Account configuration format is incorrect: {e}')
 		return None
 
 
+def validate_accounts(accounts_data, prefix: str = '') -> bool:
+	"""校验账号列表，prefix 用于在错误信息中标明租户"""
+	# 检查是否为数组格式
+	if not isinstance(accounts_data, list):
+		print(f'ERROR: {prefix}Account configuration must use array format [{{}}]')
+		return False
+
+	# 验证账号数据格式
+	for i, account in enumerate(accounts_data):
+		if not isinstance(account, dict):
+			print(f'ERROR: {prefix}Account {i + 1} configuration format is incorrect')
+			return False
+		if 'cookies' not in account or 'api_user' not in account:
+			print(f'ERROR: {prefix}Account {i + 1} missing required fields (cookies, api_user)')
+			return False
+		if not isinstance(account.get('notify', {}), dict):
+			print(f'ERROR: {prefix}Account {i + 1} notify must be an object keyed by notification variable names')
+			return False
+	return True
+
+
+@dataclass
+class Tenant:
+	"""一组账号及其通知配置；notify 为 None 时使用环境变量中的通知配置"""
+
+	name: str
+	accounts: list[dict]
+	notify: dict | None = None
+	# 在本次运行全部账号中的起始位置
+	start: int = 0
+
+	def notifier(self):
+		if self.notify is None:
+			return notify
+		# 各租户的通知通道不同，熔断状态分开保存
+		slug = ''.join(c if c.isalnum() or c in '-_' else '_' for c in self.name)
+		return NotificationKit(self.notify, breaker_file=state_path(f'notify_breaker_{slug}.json'))
+
+
+def load_tenants():
+	"""加载多租户配置（ANYROUTER_TENANTS_FILE 或 ANYROUTER_TENANTS），未配置时返回 None，配置错误时返回空列表"""
+	tenants_file = os.getenv('ANYROUTER_TENANTS_FILE')
+	try:
+		if tenants_file:
+			with open(tenants_file, encoding='utf-8') as f:
+				data = json.load(f)
+		elif os.getenv('ANYROUTER_TENANTS'):
+			data = json.loads(os.environ['ANYROUTER_TENANTS'])
+		else:
+			return None
+	except (OSError, ValueError) as e:
+		print(f'ERROR: Unable to load tenant configuration: {e}')
+		return []
+
+	if not isinstance(data, list):
+		print('ERROR: Tenant configuration must use array format [{"name": ..., "accounts": [...]}]')
+		return []
+	tenants = []
+	start = 0
+	for i, entry in enumerate(data):
+		name = str(entry.get('name') or f'tenant-{i + 1}') if isinstance(entry, dict) else ''
+		if not name or not validate_accounts(entry.get('accounts'), f'Tenant {name}: '):
+			return []
+		config = entry.get('notify')
+		if config is not None and not isinstance(config, dict):
+			print(f'ERROR: Tenant {name}: notify must be an object keyed by notification variable names')
+			return []
+		if any(tenant.name == name for tenant in tenants):
+			print(f'ERROR: Duplicate tenant name {name}')
+			return []
+		tenants.append(Tenant(name, entry['accounts'], config, start))
+		start += len(entry['accounts'])
+	return tenants
+
+
+def get_base_url():
+	"""默认站点地址，可通过 ANYROUTER_BASE_URL 指向其他 new-api 部署，账号也可以用 base_url 字段单独指定"""
+	return default_base_url()
+
+
 def parse_cookies(cookies_data):
 	"""解析 cookies 数据"""
 	if isinstance(cookies_data, dict):
@@ -63,237 +163,1142 @@ def parse_cookies(cookies_data):
 	return {}
 
 
-async def get_waf_cookies_with_playwright(account_name: str):
-	"""使用 Playwright 获取 WAF cookies（隐私模式）"""
-	print(f'[PROCESSING] {account_name}: Starting browser to get WAF cookies...')
+WAF_COOKIES = ('acw_tc', 'cdn_sec_tc', 'acw_sc__v2')
 
-	async with async_playwright() as p:
-		context = await p.chromium.launch_persistent_context(
-			user_data_dir=None,
-			headless=False,
-			user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36',
-			viewport={'width': 1920, 'height': 1080},
-			args=[
-				'--disable-blink-features=AutomationControlled',
-				'--disable-dev-shm-usage',
-				'--disable-web-security',
-				'--disable-features=VizDisplayCompositor',
-				'--no-sandbox',
-			],
-		)
 
-		page = await context.new_page()
+async def read_waf_cookies(context, base_url: str) -> dict:
+	"""在上下文中打开登录页，等待 WAF 挑战完成，返回拿到的 WAF cookies"""
+	page = await context.new_page()
+	await page.goto(f'{base_url}/login', wait_until='networkidle')
 
-		try:
-			print(f'[PROCESSING] {account_name}: Step 1: Access login page to get initial cookies...')
+	try:
+		await page.wait_for_function('document.readyState === "complete"', timeout=5000)
+	except Exception:
+		await page.wait_for_timeout(3000)
 
-			await page.goto('https://anyrouter.top/login', wait_until='networkidle')
+	cookies = await page.context.cookies()
+	return {cookie['name']: cookie['value'] for cookie in cookies if cookie['name'] in WAF_COOKIES}
 
-			try:
-				await page.wait_for_function('document.readyState === "complete"', timeout=5000)
-			except Exception:
-				await page.wait_for_timeout(3000)
 
-			cookies = await page.context.cookies()
+async def get_waf_cookies_with_playwright(account_name: str, base_url: str | None = None, proxy: Proxy | None = None):
+	"""使用 Playwright 获取 WAF cookies（隐私模式）"""
+	base_url = base_url or get_base_url()
+	mode = headless_mode()
+	engine = browser_engine()
+	via = f' via {proxy.label}' if proxy else ''
+	endpoint = browser_endpoint()
+	source = f'{endpoint[1]} endpoint' if endpoint else f'{mode}, profile' if profile_root() else mode
+	if engine != CHROMIUM:
+		source = f'{engine}, {source}'
+	print(f'[PROCESSING] {account_name}: Starting browser ({source}){via} to get WAF cookies...')
+
+	# 浏览器只在需要获取 WAF cookies 时才用到，延迟导入以缩短启动时间
+	from playwright.async_api import async_playwright
+
+	async with async_playwright() as p:
+		proxy_options = proxy.playwright_proxy() if proxy else None
+		context, close_context = await open_context(p, mode, proxy=proxy_options, engine=engine)
 
-			waf_cookies = {}
-			for cookie in cookies:
-				if cookie['name'] in ['acw_tc', 'cdn_sec_tc', 'acw_sc__v2']:
-					waf_cookies[cookie['name']] = cookie['value']
+		try:
+			print(f'[PROCESSING] {account_name}: Step 1: Access login page to get initial cookies...')
+			waf_cookies = await read_waf_cookies(context, base_url)
 
 			print(f'[INFO] {account_name}: Got {len(waf_cookies)} WAF cookies after step 1')
 
-			required_cookies = ['acw_tc', 'cdn_sec_tc', 'acw_sc__v2']
-			missing_cookies = [c for c in required_cookies if c not in waf_cookies]
+			missing_cookies = [c for c in WAF_COOKIES if c not in waf_cookies]
 
 			if missing_cookies:
 				print(f'[FAILED] {account_name}: Missing WAF cookies: {missing_cookies}')
-				await context.close()
 				return None
 
 			print(f'[SUCCESS] {account_name}: Successfully got all WAF cookies')
 
-			await context.close()
-
 			return waf_cookies
 
 		except Exception as e:
 			print(f'[FAILED] {account_name}: Error occurred while getting WAF cookies: {e}')
-			await context.close()
 			return None
+		finally:
+			await close_context()
+
+
+# 请求计划：签到前后是否查询余额以及查询方式
+SKIP_BALANCE = 'skip_balance'
+SEQUENTIAL = 'sequential'
+BALANCE_AFTER = 'balance_after'
+REQUEST_PLANS = (SKIP_BALANCE, SEQUENTIAL, BALANCE_AFTER)
+
+
+def request_plan() -> str:
+	"""根据 ANYROUTER_REQUEST_PLAN 选择请求计划，默认 balance_after"""
+	plan = (os.getenv('ANYROUTER_REQUEST_PLAN') or BALANCE_AFTER).strip().lower()
+	if plan not in REQUEST_PLANS:
+		print(f'[WARNING] Unknown ANYROUTER_REQUEST_PLAN value {plan!r}, falling back to {BALANCE_AFTER}')
+		return BALANCE_AFTER
+	return plan
+
+
+async def fetch_balance(client, headers, base_url: str | None = None):
+	"""查询余额，返回 (余额, 已用) 美元，WAF cookies 失效时抛出 WafChallengeError"""
+	base_url = base_url or get_base_url()
+	response = await client.get(f'{base_url}/api/user/self', headers=headers, timeout=30)
 
+	if is_waf_challenge(response):
+		raise WafChallengeError('WAF challenge returned for user info request')
 
-def get_user_info(client, headers):
+	if response.status_code == 200:
+		data = response.json()
+		if data.get('success'):
+			user_data = data.get('data', {})
+			return round(user_data.get('quota', 0) / 500000, 2), round(user_data.get('used_quota', 0) / 500000, 2)
+	return None
+
+
+def format_balance(balance, before=None) -> str:
+	quota, used_quota = balance
+	text = f':money: Current balance: ${quota}, Used: ${used_quota}'
+	if before is not None:
+		text += f', Reward: +${round(quota - before[0], 2)}'
+	return text
+
+
+async def get_user_info(client, headers, base_url: str | None = None):
 	"""获取用户信息"""
 	try:
-		response = client.get('https://anyrouter.top/api/user/self', headers=headers, timeout=30)
-
-		if response.status_code == 200:
-			data = response.json()
-			if data.get('success'):
-				user_data = data.get('data', {})
-				quota = round(user_data.get('quota', 0) / 500000, 2)
-				used_quota = round(user_data.get('used_quota', 0) / 500000, 2)
-				return f':money: Current balance: ${quota}, Used: ${used_quota}'
+		balance = await fetch_balance(client, headers, base_url)
+	except WafChallengeError:
+		raise
 	except Exception as e:
 		return f'[FAIL] Failed to get user info: {str(e)[:50]}...'
-	return None
+	return format_balance(balance) if balance else None
+
+
+def cookie_header(cookies: dict) -> str:
+	return '; '.join(f'{name}={value}' for name, value in cookies.items())
+
+
+def api_headers(base_url: str, api_user: str, cookies=None) -> dict:
+	"""API 请求头，cookies 通过请求头发送"""
+	headers = {
+		'User-Agent': USER_AGENT,
+		'Accept': 'application/json, text/plain, */*',
+		'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+		'Accept-Encoding': 'gzip, deflate, br, zstd',
+		'Referer': f'{base_url}/console',
+		'Origin': base_url,
+		'Connection': 'keep-alive',
+		'Sec-Fetch-Dest': 'empty',
+		'Sec-Fetch-Mode': 'cors',
+		'Sec-Fetch-Site': 'same-origin',
+		'new-api-user': api_user,
+	}
+	if cookies:
+		headers['Cookie'] = cookie_header(cookies)
+	return headers
+
+
+def parse_check_in_response(response) -> tuple[bool, str]:
+	"""解析签到响应，返回 (是否成功, 失败原因)"""
+	if response.status_code != 200:
+		return False, f'HTTP {response.status_code}'
+	try:
+		result = response.json()
+	except json.JSONDecodeError:
+		# 如果不是 JSON 响应，检查是否包含成功标识
+		if 'success' in response.text.lower():
+			return True, ''
+		return False, 'Invalid response format'
+	if result.get('ret') == 1 or result.get('code') == 0 or result.get('success'):
+		return True, ''
+	return False, result.get('msg', result.get('message', 'Unknown error'))
+
+
+async def execute_check_in(
+	client,
+	account_name,
+	api_user,
+	base_url: str | None = None,
+	cookies=None,
+	limiter=None,
+	plan: str | None = None,
+	result: AccountResult | None = None,
+):
+	"""按请求计划查询余额并发送签到请求，WAF cookies 失效时抛出 WafChallengeError
+
+	cookies 通过请求头发送，客户端可以在账号之间共享；limiter 为站点的请求速率限制。
+	请求计划（ANYROUTER_REQUEST_PLAN）：
+	- skip_balance: 只发送签到请求
+	- sequential: 依次查询签到前余额、签到、查询签到后余额
+	- balance_after: 签到成功后查询一次余额，不计算签到获得的额度
+	result 用于记录失败类别和余额。
+	"""
+	import httpx
+
+	base_url = base_url or get_base_url()
+	plan = plan or request_plan()
+	headers = api_headers(base_url, api_user, cookies)
+
+	# 更新签到请求头
+	checkin_headers = headers.copy()
+	checkin_headers.update({'Content-Type': 'application/json', 'X-Requested-With': 'XMLHttpRequest'})
+
+	async def balance(after_sign_in=False):
+		"""返回 (余额, 错误信息)，余额查询失败不影响签到
+
+		签到之后发出的查询不抛出 WAF 和网络错误，避免已完成的签到被重试。
+		"""
+		if limiter:
+			await limiter.wait()
+		try:
+			return await fetch_balance(client, headers, base_url), None
+		except (WafChallengeError, httpx.TransportError) as e:
+			if not after_sign_in:
+				raise
+			return None, f'[FAIL] Failed to get user info: {str(e)[:50]}...'
+		except Exception as e:
+			return None, f'[FAIL] Failed to get user info: {str(e)[:50]}...'
 
+	async def sign_in():
+		if limiter:
+			await limiter.wait()
+		print(f'[NETWORK] {account_name}: Executing check-in')
+		return await client.post(f'{base_url}/api/user/sign_in', headers=checkin_headers, timeout=30)
 
-async def check_in_account(account_info, account_index):
-	"""为单个账号执行签到操作"""
-	account_name = f'Account {account_index + 1}'
-	print(f'\n[PROCESSING] Starting to process {account_name}')
+	before = after = error = None
+	started = time.perf_counter()
+
+	try:
+		if plan == SEQUENTIAL:
+			before, error = await balance()
+
+		response = await sign_in()
+
+		print(f'[RESPONSE] {account_name}: Response status code {response.status_code}')
+
+		if is_waf_challenge(response):
+			raise WafChallengeError('WAF challenge returned for check-in request')
+
+		success, reason = parse_check_in_response(response)
+		if success:
+			print(f'[SUCCESS] {account_name}: Check-in successful!')
+			if plan != SKIP_BALANCE:
+				after, after_error = await balance(after_sign_in=True)
+				error = error or after_error
+		else:
+			print(f'[FAILED] {account_name}: Check-in failed - {reason}')
+			if result:
+				result.fail(Failure.REJECTED, reason)
+
+	except (WafChallengeError, httpx.TransportError):
+		raise
+	except Exception as e:
+		print(f'[FAILED] {account_name}: Error occurred during check-in process - {str(e)[:50]}...')
+		if result:
+			result.fail(Failure.EXCEPTION, str(e))
+		success = False
+
+	print(f'[TIMING] {account_name}: {plan} requests took {(time.perf_counter() - started) * 1000:.0f}ms')
 
+	if result and (after or before):
+		result.balance, result.used = after or before
+		if after and before:
+			result.reward = round(after[0] - before[0], 2)
+
+	if after:
+		user_info_text = format_balance(after, before)
+	elif before:
+		user_info_text = format_balance(before)
+	else:
+		user_info_text = error
+	if user_info_text:
+		print(user_info_text)
+	return success, user_info_text
+
+
+async def _fetch_waf_cookies(key, label):
+	"""WafCookieCache 的获取函数，由第一个需要该站点和出口 cookies 的账号触发
+
+	key 为 (站点地址, 代理地址或 DIRECT)，WAF cookies 按站点和出口分别缓存。
+	"""
+	base_url, exit_key = key
+	proxy = None if exit_key == DIRECT else Proxy(exit_key)
+	return await get_waf_cookies_with_playwright(label, base_url, proxy=proxy)
+
+
+@dataclass
+class RunContext:
+	"""一次运行中所有账号共享的状态"""
+
+	deadline: RunDeadline = field(default_factory=RunDeadline)
+	waf_cache: WafCookieCache = field(default_factory=lambda: WafCookieCache(_fetch_waf_cookies))
+	proxy_pool: ProxyPool | None = None
+	sites: SitePools = field(default_factory=SitePools)
+	sink: ResultSink | None = None
+	# 流水线模式下限制同时获取 WAF cookies 的账号数，签到阶段的刷新重试也受此限制
+	waf_slots: asyncio.Semaphore | None = None
+	# 预检时为账号（按序号）选择的出口，签到时沿用，同一账号的预检和签到走同一个代理
+	exits: dict[int, Proxy | None] = field(default_factory=dict)
+	# 运行租约被其他运行接管后不再开始新的账号
+	lease: RunLease | None = None
+
+
+def account_label(account_index, base_url: str | None = None, tenant: str = '') -> str:
+	"""账号名称，多站点运行时附带站点域名，多租户运行时以租户名开头"""
+	name = f'{tenant} Account {account_index + 1}' if tenant else f'Account {account_index + 1}'
+	return f'{name} ({host_of(base_url)})' if base_url else name
+
+
+@dataclass
+class PreparedAccount:
+	"""已通过配置检查并拿到 WAF cookies、等待发送签到请求的账号"""
+
+	name: str
+	api_user: str
+	base_url: str
+	user_cookies: dict
+	proxy: Proxy | None
+	waf_key: tuple
+	client: object
+	waf_cookies: dict | None = None
+
+
+async def _acquire_waf_cookies(ctx: RunContext, prepared: PreparedAccount, result: AccountResult) -> bool:
+	"""获取 WAF cookies，同一出口的账号共享一次获取，失败时记录原因并返回 False"""
+	deadline, proxy_pool, proxy = ctx.deadline, ctx.proxy_pool, prepared.proxy
+	account_name = prepared.name
+	on_failure = None
+	if proxy and proxy_pool:
+		# 一次获取失败只计一次，等待同一获取的账号不重复计入代理健康度
+		def on_failure():
+			proxy_pool.record_failure(proxy, 'unable to get WAF cookies')
+
+	slots = ctx.waf_slots or contextlib.nullcontext()
+	started = time.perf_counter()
+	try:
+		# 先等到获取名额再开始计算 WAF 超时
+		async with slots, deadline.scope(deadline.waf_timeout), profiling.span(f'waf {account_name}'):
+			prepared.waf_cookies = await ctx.waf_cache.get(prepared.waf_key, account_name, on_failure)
+	except TimeoutError:
+		print(f'[FAILED] {account_name}: Timed out while getting WAF cookies')
+		result.fail(Failure.TIMEOUT, 'Timed out while getting WAF cookies')
+		return False
+	except Exception as e:
+		# 浏览器启动失败、代理不可用等
+		print(f'[FAILED] {account_name}: Error occurred while getting WAF cookies: {e}')
+		prepared.waf_cookies = None
+	finally:
+		result.add_timing('waf', time.perf_counter() - started)
+	if not prepared.waf_cookies:
+		print(f'[FAILED] {account_name}: Unable to get WAF cookies')
+		result.fail(Failure.WAF, 'Unable to get WAF cookies')
+		return False
+	return True
+
+
+def select_proxy(ctx: RunContext, account_info, index: int | None = None) -> Proxy | None:
+	"""账号的出口：固定的代理、代理池轮换或直连（None）
+
+	预检已经为该账号选过出口时沿用，只有选中的代理之后被移出轮换时才重新选择。
+	"""
+	if index in ctx.exits:
+		proxy = ctx.exits.pop(index)
+		if not (proxy and proxy.evicted):
+			return proxy
+	pinned_proxy = account_info.get('proxy')
+	if ctx.proxy_pool:
+		return ctx.proxy_pool.choose(pinned_proxy)
+	return Proxy(pinned_proxy) if pinned_proxy else None
+
+
+async def prepare_check_in(
+	ctx: RunContext, account_info, account_name: str, result: AccountResult
+) -> PreparedAccount | None:
+	"""签到的第一阶段：检查账号配置、选择出口并获取 WAF cookies，失败时返回 None"""
 	# 解析账号配置
 	cookies_data = account_info.get('cookies', {})
 	api_user = account_info.get('api_user', '')
 
 	if not api_user:
 		print(f'[FAILED] {account_name}: API user identifier not found')
-		return False, None
+		result.fail(Failure.CONFIG, 'API user identifier not found')
+		return None
 
 	# 解析用户 cookies
 	user_cookies = parse_cookies(cookies_data)
 	if not user_cookies:
 		print(f'[FAILED] {account_name}: Invalid configuration format')
-		return False, None
+		result.fail(Failure.CONFIG, 'Invalid cookies')
+		return None
 
-	# 步骤1：获取 WAF cookies
-	waf_cookies = await get_waf_cookies_with_playwright(account_name)
-	if not waf_cookies:
-		print(f'[FAILED] {account_name}: Unable to get WAF cookies')
-		return False, None
+	# 选择出口：账号固定的代理、代理池轮换或直连，WAF cookies 按出口分别缓存
+	base_url = account_base_url(account_info)
+	proxy = select_proxy(ctx, account_info, result.index)
+	if proxy:
+		print(f'[INFO] {account_name}: Using proxy {proxy.label}')
+
+	# 同一站点同一出口的账号共享连接池
+	prepared = PreparedAccount(
+		name=account_name,
+		api_user=api_user,
+		base_url=base_url,
+		user_cookies=user_cookies,
+		proxy=proxy,
+		waf_key=(base_url, proxy.url if proxy else DIRECT),
+		client=ctx.sites.get(base_url).client(proxy.url if proxy else None),
+	)
+	if not await _acquire_waf_cookies(ctx, prepared, result):
+		return None
+	return prepared
+
+
+async def finish_check_in(ctx: RunContext, prepared: PreparedAccount, result: AccountResult):
+	"""签到的第二阶段：发送余额查询和签到请求，WAF cookies 被拒绝时刷新后重试"""
+	import httpx
 
-	# 步骤2：使用 httpx 进行 API 请求
-	client = httpx.Client(http2=True, timeout=30.0)
+	deadline, proxy_pool, proxy = ctx.deadline, ctx.proxy_pool, prepared.proxy
+	account_name = prepared.name
+	site = ctx.sites.get(prepared.base_url)
+	waf_retries = max(0, int(os.getenv('ANYROUTER_WAF_RETRIES', '2')))
+
+	# WAF cookies 失效时刷新后重试
+	for attempt in range(waf_retries + 1):
+		if attempt and not await _acquire_waf_cookies(ctx, prepared, result):
+			return False, None
+
+		# 合并 WAF cookies 和用户 cookies，使用 httpx 进行 API 请求
+		cookies = {**prepared.waf_cookies, **prepared.user_cookies}
+
+		started = time.perf_counter()
+		try:
+			async with deadline.scope(deadline.http_timeout), profiling.span(f'http {account_name}'):
+				outcome = await execute_check_in(
+					prepared.client,
+					account_name,
+					prepared.api_user,
+					prepared.base_url,
+					cookies,
+					site.limiter,
+					result=result,
+				)
+			if proxy and proxy_pool:
+				proxy_pool.record_success(proxy, time.perf_counter() - started)
+			return outcome
+		except TimeoutError:
+			print(f'[FAILED] {account_name}: Timed out during check-in requests')
+			result.fail(Failure.TIMEOUT, 'Timed out during check-in requests')
+			return False, None
+		except httpx.TransportError as e:
+			# 连接、代理等网络层错误计入代理健康度
+			if proxy and proxy_pool:
+				proxy_pool.record_failure(proxy, str(e))
+			print(f'[FAILED] {account_name}: Network error during check-in process - {str(e)[:50]}...')
+			result.fail(Failure.NETWORK, str(e) or type(e).__name__)
+			return False, None
+		except WafChallengeError:
+			ctx.waf_cache.invalidate(prepared.waf_key, stale=prepared.waf_cookies)
+			if attempt == waf_retries:
+				print(f'[FAILED] {account_name}: WAF challenge persists after refreshing cookies')
+				result.fail(Failure.WAF, 'WAF challenge persists after refreshing cookies')
+				return False, None
+			print(f'[INFO] {account_name}: WAF cookies rejected, refreshing and retrying')
+		finally:
+			result.add_timing('http', time.perf_counter() - started)
+
+
+async def check_in_account(
+	account_info,
+	account_index,
+	ctx: RunContext | None = None,
+	label: str | None = None,
+	result: AccountResult | None = None,
+):
+	"""为单个账号执行签到操作，result 记录失败类别、各阶段耗时和余额"""
+	owns_ctx = ctx is None
+	ctx = ctx or RunContext()
+	account_name = label or account_label(account_index)
+	result = result or AccountResult(account_index, account_name, host_of(account_base_url(account_info)))
+	print(f'\n[PROCESSING] Starting to process {account_name}')
 
 	try:
-		# 合并 WAF cookies 和用户 cookies
-		all_cookies = {**waf_cookies, **user_cookies}
-		client.cookies.update(all_cookies)
-
-		headers = {
-			'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36',
-			'Accept': 'application/json, text/plain, */*',
-			'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-			'Accept-Encoding': 'gzip, deflate, br, zstd',
-			'Referer': 'https://anyrouter.top/console',
-			'Origin': 'https://anyrouter.top',
-			'Connection': 'keep-alive',
-			'Sec-Fetch-Dest': 'empty',
-			'Sec-Fetch-Mode': 'cors',
-			'Sec-Fetch-Site': 'same-origin',
-			'new-api-user': api_user,
-		}
-
-		user_info_text = None
-
-		user_info = get_user_info(client, headers)
-		if user_info:
-			print(user_info)
-			user_info_text = user_info
+		prepared = await prepare_check_in(ctx, account_info, account_name, result)
+		if prepared is None:
+			return False, None
+		return await finish_check_in(ctx, prepared, result)
+	finally:
+		if owns_ctx:
+			await ctx.sites.aclose()
 
-		print(f'[NETWORK] {account_name}: Executing check-in')
 
-		# 更新签到请求头
-		checkin_headers = headers.copy()
-		checkin_headers.update({'Content-Type': 'application/json', 'X-Requested-With': 'XMLHttpRequest'})
+def create_run_context(deadline: RunDeadline) -> RunContext:
+	"""按环境变量创建运行共享状态
 
-		response = client.post('https://anyrouter.top/api/user/sign_in', headers=checkin_headers, timeout=30)
+	同一站点同一出口的账号共享 WAF cookies，cookies 超过最大有效期后重新获取。
+	"""
+	return RunContext(
+		deadline=deadline,
+		waf_cache=WafCookieCache(
+			_fetch_waf_cookies,
+			max_age=float(os.getenv('ANYROUTER_WAF_MAX_AGE', '600')) or None,
+			store=os.getenv('ANYROUTER_WAF_STORE', str(state_path('waf_cookies.json'))) or None,
+		),
+		proxy_pool=ProxyPool.from_env(),
+		sites=SitePools.from_env(),
+		sink=ResultSink.from_env(),
+	)
+
+
+# 会话预检结果
+SESSION_VALID = 'valid'
+SESSION_EXPIRED = 'expired'
+SESSION_UNKNOWN = 'unknown'
 
-		print(f'[RESPONSE] {account_name}: Response status code {response.status_code}')
 
-		if response.status_code == 200:
+def precheck_enabled() -> bool:
+	return os.getenv('ANYROUTER_PRECHECK', '1').strip().lower() not in ('0', 'false', 'no')
+
+
+async def precheck_session(
+	ctx: RunContext, account_info, proxy: Proxy | None = None, gated: set | None = None
+) -> str | None:
+	"""用一次轻量的已认证请求检查账号的 session 是否有效
+
+	请求经过账号签到时使用的出口 proxy，走站点的共享连接池，并带上缓存中该站点和出口的 WAF cookies。
+	还没有 WAF cookies 时请求必然遇到挑战，不发送预检，返回 None。只有明确的 401/403 JSON 响应
+	才判定为过期；WAF 挑战、网络错误等无法判断时返回 unknown，账号照常签到。
+	gated 记录已经返回过 WAF 挑战的站点和出口，之后不再对它们发送预检请求。
+	"""
+	import httpx
+
+	api_user = account_info.get('api_user', '')
+	user_cookies = parse_cookies(account_info.get('cookies', {}))
+	if not api_user or not user_cookies:
+		return SESSION_UNKNOWN
+
+	base_url = account_base_url(account_info)
+	site = ctx.sites.get(base_url)
+	proxy_url = proxy.url if proxy else None
+	waf_key = (base_url, proxy_url or DIRECT)
+	waf_cookies = ctx.waf_cache.peek(waf_key)
+	if not waf_cookies:
+		return None
+	if gated is not None and waf_key in gated:
+		return SESSION_UNKNOWN
+	headers = api_headers(base_url, api_user, {**waf_cookies, **user_cookies})
+
+	await site.limiter.wait()
+	try:
+		response = await site.client(proxy_url).get(f'{base_url}/api/user/self', headers=headers, timeout=10)
+	except httpx.HTTPError:
+		return SESSION_UNKNOWN
+
+	if is_waf_challenge(response):
+		if gated is not None:
+			gated.add(waf_key)
+		return SESSION_UNKNOWN
+	if 'json' not in response.headers.get('content-type', ''):
+		return SESSION_UNKNOWN
+	if response.status_code in (401, 403):
+		return SESSION_EXPIRED
+	if response.status_code == 200 and response.json().get('success'):
+		return SESSION_VALID
+	return SESSION_UNKNOWN
+
+
+async def precheck_sessions(ctx: RunContext, accounts, indices: list[int] | None = None) -> list[str | None]:
+	"""批量预检所有账号的 session，返回与 accounts 对应的结果，没有 WAF cookies 而未检查的账号为 None
+
+	indices 为账号在本次运行中的序号，为每个账号选择的出口记录在 ctx.exits 中，签到时沿用。
+	整个预检受 ANYROUTER_PRECHECK_TIMEOUT 和运行截止时间限制，超时未完成的账号视为 unknown。
+	"""
+	semaphore = asyncio.Semaphore(max(1, int(os.getenv('ANYROUTER_PRECHECK_CONCURRENCY', '20'))))
+	indices = list(range(len(accounts))) if indices is None else indices
+	proxies = []
+	for index, account_info in zip(indices, accounts):
+		# 与签到相同的方式选择出口，使用代理池的账号不会从本机 IP 直接发出预检请求
+		proxies.append(select_proxy(ctx, account_info))
+		ctx.exits[index] = proxies[-1]
+	statuses: list[str | None] = [SESSION_UNKNOWN] * len(accounts)
+	gated = set()
+
+	async def check(i, account_info):
+		async with semaphore:
 			try:
-				result = response.json()
-				if result.get('ret') == 1 or result.get('code') == 0 or result.get('success'):
-					print(f'[SUCCESS] {account_name}: Check-in successful!')
-					return True, user_info_text
-				else:
-					error_msg = result.get('msg', result.get('message', 'Unknown error'))
-					print(f'[FAILED] {account_name}: Check-in failed - {error_msg}')
-					return False, user_info_text
-			except json.JSONDecodeError:
-				# 如果不是 JSON 响应，检查是否包含成功标识
-				if 'success' in response.text.lower():
-					print(f'[SUCCESS] {account_name}: Check-in successful!')
-					return True, user_info_text
-				else:
-					print(f'[FAILED] {account_name}: Check-in failed - Invalid response format')
-					return False, user_info_text
-		else:
-			print(f'[FAILED] {account_name}: Check-in failed - HTTP {response.status_code}')
-			return False, user_info_text
+				statuses[i] = await precheck_session(ctx, account_info, proxies[i], gated)
+			except Exception as e:
+				print(f'[WARNING] Session precheck error: {e}')
+
+	try:
+		async with ctx.deadline.scope(float(os.getenv('ANYROUTER_PRECHECK_TIMEOUT', '15'))):
+			await asyncio.gather(*(check(i, account) for i, account in enumerate(accounts)))
+	except TimeoutError:
+		print('[WARNING] Session precheck timed out, remaining accounts will be checked in normally')
+	return statuses
+
+
+def _settled_outcome(ctx: RunContext, name: str, session: str | None, result: AccountResult):
+	"""不需要签到就能确定结果的账号（session 已过期、已到运行截止时间或租约已被接管），返回 (状态, 通知内容) 或 None"""
+	if session == SESSION_EXPIRED:
+		print(f'[FAILED] {name}: Session expired, please refresh the session cookie')
+		result.fail(Failure.SESSION, 'Session expired')
+		return 'failed', f'[FAIL] {name}: session expired, please refresh'
+	if ctx.deadline.expired():
+		print(f'[SKIPPED] {name}: Run deadline reached')
+		result.fail(Failure.DEADLINE, 'Run deadline reached')
+		return 'skipped', f'[SKIP] {name} skipped (deadline)'
+	if ctx.lease and ctx.lease.lost:
+		# 接管的运行会签到剩下的账号，这里继续签到就会重复
+		print(f'[SKIPPED] {name}: Run lease was taken over by another run')
+		result.fail(Failure.LEASE, 'Run lease was taken over by another run')
+		return 'skipped', f'[SKIP] {name} skipped (run lease lost)'
+	return None
+
 
+def _account_line(name: str, success: bool, user_info) -> tuple[str, str]:
+	"""签到结果对应的 (状态, 通知内容)"""
+	status = '[SUCCESS]' if success else '[FAIL]'
+	account_result = f'{status} {name}'
+	if user_info:
+		account_result += f'\n{user_info}'
+	return ('success' if success else 'failed'), account_result
+
+
+def _record_result(ctx: RunContext, result: AccountResult, status: str, started: float):
+	result.status = status
+	result.add_timing('total', time.perf_counter() - started)
+	if ctx.sink:
+		ctx.sink.write(result)
+
+
+async def process_account(
+	ctx: RunContext,
+	account_index,
+	account_info,
+	name: str,
+	session: str | None = None,
+	result: AccountResult | None = None,
+):
+	"""在站点的并发限制和账号时间预算内处理单个账号，返回 (状态, 通知内容)
+
+	session 为预检结果，已过期的账号直接报告失败，不启动浏览器。
+	设置了结果导出时，账号完成后立即写入一条结构化记录。
+	"""
+	site = ctx.sites.get(account_base_url(account_info))
+	result = result or AccountResult(account_index, name, site.host)
+	async with site.slot(is_priority(account_info)):
+		started = time.perf_counter()
+		outcome = _settled_outcome(ctx, name, session, result)
+		if outcome is None:
+			outcome = await _process_account(ctx, account_index, account_info, name, result)
+
+	_record_result(ctx, result, outcome[0], started)
+	return outcome
+
+
+async def _guarded(ctx: RunContext, name: str, result: AccountResult, work, span: str):
+	"""在账号时间预算内执行 work()，超时和异常转换为失败的 (状态, 通知内容)"""
+	deadline = ctx.deadline
+	try:
+		async with deadline.scope(deadline.account_timeout), profiling.span(span):
+			return await work()
+	except TimeoutError:
+		reason = 'run deadline reached' if deadline.expired() else 'account time budget exceeded'
+		print(f'[FAILED] {name}: Timed out, {reason}')
+		result.fail(Failure.TIMEOUT, reason)
+		return 'failed', f'[FAIL] {name} timed out ({reason})'
 	except Exception as e:
-		print(f'[FAILED] {account_name}: Error occurred during check-in process - {str(e)[:50]}...')
-		return False, user_info_text
+		print(f'[FAILED] {name} processing exception: {e}')
+		result.fail(Failure.EXCEPTION, str(e))
+		return 'failed', f'[FAIL] {name} exception: {str(e)[:50]}...'
+
+
+async def _process_account(ctx: RunContext, account_index, account_info, name: str, result: AccountResult):
+	async def work():
+		return _account_line(name, *await check_in_account(account_info, account_index, ctx, name, result))
+
+	return await _guarded(ctx, name, result, work, f'account {name}')
+
+
+def pipeline_enabled() -> bool:
+	return os.getenv('ANYROUTER_PIPELINE', '').strip().lower() in ('1', 'true', 'yes')
+
+
+@dataclass
+class PipelineJob:
+	index: int
+	account: dict
+	name: str
+	result: AccountResult
+	session: str | None = None
+	started: float = 0.0
+	prepared: PreparedAccount | None = None
+	outcome: tuple[str, str] | None = None
+
+
+async def run_pipeline(ctx: RunContext, jobs: list[PipelineJob], on_done) -> Pipeline:
+	"""按 WAF cookies、签到请求、结果记录三个阶段处理账号
+
+	浏览器阶段和 HTTP 阶段各有独立的 worker 数（ANYROUTER_WAF_WORKERS、ANYROUTER_HTTP_WORKERS），
+	一个账号发送签到请求的同时，其他账号可以在浏览器阶段获取 WAF cookies。HTTP 阶段仍遵守
+	每个站点的并发限制。每个阶段分别使用账号时间预算。on_done(job) 在结果记录阶段调用。
+	"""
+	queue_size = max(1, int(os.getenv('ANYROUTER_PIPELINE_QUEUE', '20')))
+	waf_workers = max(1, int(os.getenv('ANYROUTER_WAF_WORKERS', '2')))
+	# HTTP 阶段因 WAF cookies 失效而刷新时与浏览器阶段共用名额，同时获取的数量不超过 waf_workers
+	ctx.waf_slots = asyncio.Semaphore(waf_workers)
+
+	async def waf_stage(job: PipelineJob):
+		job.started = time.perf_counter()
+		print(f'\n[PROCESSING] Starting to process {job.name}')
+		job.outcome = _settled_outcome(ctx, job.name, job.session, job.result)
+		if job.outcome is None:
+
+			async def work():
+				job.prepared = await prepare_check_in(ctx, job.account, job.name, job.result)
+				return None if job.prepared else _account_line(job.name, False, None)
+
+			job.outcome = await _guarded(ctx, job.name, job.result, work, f'waf stage {job.name}')
+		return job
+
+	async def http_stage(job: PipelineJob):
+		if job.outcome is None:
+
+			async def work():
+				return _account_line(job.name, *await finish_check_in(ctx, job.prepared, job.result))
+
+			async with ctx.sites.get(job.prepared.base_url).slot(is_priority(job.account)):
+				job.outcome = await _guarded(ctx, job.name, job.result, work, f'account {job.name}')
+		return job
+
+	async def sink_stage(job: PipelineJob):
+		_record_result(ctx, job.result, job.outcome[0], job.started)
+		on_done(job)
+		return job
+
+	pipeline = Pipeline(
+		[
+			Stage('waf', waf_stage, waf_workers, queue_size),
+			Stage('http', http_stage, int(os.getenv('ANYROUTER_HTTP_WORKERS', '10')), queue_size),
+			Stage('sink', sink_stage, 1, queue_size),
+		]
+	)
+	try:
+		await pipeline.run(jobs)
 	finally:
-		client.close()
+		ctx.waf_slots = None
+	return pipeline
+
+
+def plan_schedule(ctx: RunContext, accounts, keys, pending, history: AccountHistory):
+	"""返回待处理账号的开始顺序和预计完成时间（没有任何历史时为 None）
+
+	站点同时有优先账号和普通账号时，按 ANYROUTER_PRIORITY_SLOTS 为优先账号保留并发槽位。
+	ANYROUTER_SCHEDULE=list 时按配置顺序开始签到。
+	"""
+	priority = {i for i in pending if is_priority(accounts[i])}
+	by_site: dict[str, list[int]] = {}
+	for i in pending:
+		by_site.setdefault(account_base_url(accounts[i]), []).append(i)
+
+	slots = int(os.getenv('ANYROUTER_PRIORITY_SLOTS', '0'))
+	for base_url, indices in by_site.items():
+		count = sum(1 for i in indices if i in priority)
+		if slots > 0 and 0 < count < len(indices):
+			site = ctx.sites.get(base_url)
+			if site.reserve(slots):
+				print(
+					f'[SCHEDULE] {site.host}: {site.reserved}/{site.concurrency} slots reserved for {count} priority accounts'
+				)
+
+	durations, known = estimate(history, [keys[i] for i in pending])
+	expected = dict(zip(pending, durations))
+	if os.getenv('ANYROUTER_SCHEDULE', 'history').strip().lower() == 'list':
+		order = list(pending)
+	else:
+		order = schedule_order(pending, expected, priority)
+	if not known:
+		return order, None
+
+	# 不同站点并行处理，整次运行的完成时间取决于最慢的站点
+	predicted = 0.0
+	for base_url, indices in by_site.items():
+		site = ctx.sites.get(base_url)
+		members = set(indices)
+		ordered = [i for i in order if i in members]
+		if site.reserved:
+			pools = [
+				([expected[i] for i in ordered if i in priority], site.reserved),
+				([expected[i] for i in ordered if i not in priority], site.concurrency - site.reserved),
+			]
+		else:
+			pools = [([expected[i] for i in ordered], site.concurrency)]
+		predicted = max(predicted, *(predict_makespan(durations, slots) for durations, slots in pools))
+	print(f'[SCHEDULE] {known}/{len(pending)} accounts have timing history, predicted makespan {predicted:.1f}s')
+	return order, predicted
 
 
 async def main():
 	"""主函数"""
 	print('[SYSTEM] AnyRouter.top multi-account auto check-in script started (using Playwright)')
 	print(f'[TIME] Execution time: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
+	profiling.start_lag_sampler()
 
-	# 加载账号配置
-	accounts = load_accounts()
+	# 加载账号配置，配置了多租户时合并所有租户的账号一起处理
+	tenants = load_tenants()
+	if tenants is None:
+		tenants = [Tenant('', load_accounts() or [])]
+	accounts = [account for tenant in tenants for account in tenant.accounts]
 	if not accounts:
 		print('[FAILED] Unable to load account configuration, program exits')
 		sys.exit(1)
+	profiling.mark('accounts_loaded')
 
 	print(f'[INFO] Found {len(accounts)} account configurations')
+	if tenants[0].name:
+		print(f'[INFO] Tenants: {", ".join(f"{tenant.name} ({len(tenant.accounts)})" for tenant in tenants)}')
+
+	# 同一时间只允许一个签到进程，重叠的运行直接退出或等待前一个运行结束
+	resume = resume_requested()
+	lease = RunLease.from_env()
+	if lease:
+		resume = await acquire_run_lease(lease, account_keys(accounts), resume)
+	try:
+		await check_in_all(accounts, resume, lease, tenants)
+	finally:
+		if lease:
+			await lease.close()
+
+
+async def acquire_run_lease(lease: RunLease, keys: list[str], resume: bool) -> bool:
+	"""获取运行租约并返回是否恢复运行；没有需要做的事情时直接退出
+
+	等待期间前一个运行完整结束且账号相同时不再重复签到；前一个运行中途退出时从它的检查点恢复。
+	"""
+	lease.meta = {'accounts': accounts_digest(keys)}
+	wait = float(os.getenv('ANYROUTER_LEASE_WAIT', '0'))
+	try:
+		holder = await lease.acquire(wait)
+	except (OSError, TimeoutError) as e:
+		print(f'[WARNING] Unable to take the run lease: {e}, continuing without it')
+		return resume
+	if holder:
+		print(f'[LEASE] Another run is in progress ({RunLease.describe(holder)}), exiting')
+		sys.exit(0)
+	lease.start_heartbeat()
+	if not lease.waited_for:
+		return resume
+
+	previous = lease.previous or {}
+	owner = lease.waited_for.get('owner')
+	if (
+		previous.get('owner') == owner
+		and previous.get('complete')
+		and previous.get('accounts') == lease.meta['accounts']
+	):
+		print(f'[LEASE] Run {owner} finished all accounts while waiting, nothing left to do')
+		lease.complete = True
+		await lease.close()
+		sys.exit(0)
+	print(f'[LEASE] Run {owner} did not finish, resuming from its checkpoint')
+	return True
+
+
+async def check_in_all(
+	accounts: list[dict], resume: bool, lease: RunLease | None = None, tenants: list[Tenant] | None = None
+):
+	"""签到所有账号，每个租户单独生成报告并发送通知，按结果退出
+
+	所有租户的账号在同一次运行中处理，共用浏览器、WAF cookies 和各站点的连接池。
+	"""
+	tenants = tenants or [Tenant('', accounts)]
+	# 运行截止时间，收到 SIGTERM 时立即到期，保证部分结果也能发出通知
+	deadline = RunDeadline.from_env()
+	try:
+		asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, deadline.expire_now)
+	except (NotImplementedError, RuntimeError):
+		pass
+
+	ctx = create_run_context(deadline)
+	ctx.lease = lease
+
+	# 账号按站点分组，每个站点有独立的并发和速率限制，不同站点并行处理
+	base_urls = [account_base_url(account) for account in accounts]
+	multi_site = len(set(base_urls)) > 1
+	if multi_site:
+		hosts = ', '.join(sorted({host_of(url) for url in base_urls}))
+		print(f'[INFO] Accounts span {len(set(base_urls))} sites: {hosts}')
+
+	# 检查点日志：每完成一个账号追加一条记录，恢复运行时跳过上次已完成的账号
+	journal = CheckpointJournal.from_env()
+	keys = account_keys(accounts)
+	completed = journal.open(resume=resume, accounts=len(accounts))
+	resumed_count = sum(1 for key in keys if key in completed)
+	if resumed_count:
+		print(f'[INFO] Resuming run: {resumed_count} accounts already completed, skipping them')
+
+	# 隔离期内的长期失败账号不签到，在报告中单独列出
+	quarantine = AccountQuarantine.from_env()
+	quarantined = {}
+	for i, key in enumerate(keys):
+		entry = None if key in completed else quarantine.check(key, accounts[i])
+		if entry:
+			quarantined[i] = entry
+	if quarantined:
+		print(f'[QUARANTINE] Skipping {len(quarantined)} quarantined accounts until their next probe')
+
+	# 多租户运行时账号在租户内编号
+	owners = [tenant for tenant in tenants for _ in tenant.accounts]
+	# 每个租户的进度和汇总都发到自己的通道，共用同一个熔断状态
+	notifiers = {tenant.name: tenant.notifier() for tenant in tenants}
+
+	# 进度通知在后台发送，不阻塞签到；多租户时每个租户只收到自己账号的进度
+	progress = {}
+	for tenant in tenants:
+		span = range(tenant.start, tenant.start + len(tenant.accounts))
+		pending = sum(1 for i in span if keys[i] not in completed and i not in quarantined)
+		title = f'AnyRouter Check-in Progress ({tenant.name})' if tenant.name else 'AnyRouter Check-in Progress'
+		reporter = ProgressReporter.from_env(notifiers[tenant.name], pending, title=title)
+		if reporter:
+			reporter.start()
+			progress[tenant.name] = reporter
+
+	history = AccountHistory.from_env()
+	# 本次运行中每个账号的隔离状态变化，报告到账号所属的租户
+	transitions: dict[int, list[str]] = {}
+
+	def label(i):
+		return account_label(i - owners[i].start, base_urls[i] if multi_site else None, owners[i].name)
+
+	# 每个租户的余额统计，账号完成时累加，内存占用与账号数无关
+	top = int(os.getenv('ANYROUTER_BALANCE_TOP', '3'))
+	stats = {tenant.name: FleetStats(top) for tenant in tenants}
+	for i, key in enumerate(keys):
+		entry = completed.get(key)
+		if entry:
+			stats[owners[i].name].add(label(i), entry.get('balance'), entry.get('used'))
+
+	def settled(i):
+		"""上次运行已完成或隔离中的账号直接返回 (状态, 通知内容)"""
+		entry = completed.get(keys[i])
+		if entry:
+			return entry['status'], entry['line']
+		if i in quarantined:
+			return 'quarantined', f'[QUARANTINE] {label(i)}: {quarantine.describe(quarantined[i])}'
+		return None
 
-	# 为每个账号执行签到
-	success_count = 0
-	total_count = len(accounts)
-	notification_content = []
+	def record(i, result, status, line):
+		# 因截止时间跳过的账号不记录，恢复运行时重新处理
+		if status != 'skipped':
+			journal.record(keys[i], i, status, line, result.balance, result.used)
+			stats[owners[i].name].add(label(i), result.balance, result.used)
+			history.record(keys[i], result.timings.get('total', 0.0), status == 'success')
+			before = len(quarantine.transitions)
+			quarantine.record(keys[i], accounts[i], label(i), status == 'success', result.category, result.error)
+			transitions[i] = quarantine.transitions[before:]
+		reporter = progress.get(owners[i].name)
+		if reporter:
+			reporter.add(status, line)
+
+	async def run_account(i):
+		outcome = settled(i)
+		if outcome:
+			return outcome
+		result = AccountResult(i, label(i), host_of(base_urls[i]))
+		status, line = await process_account(ctx, i, accounts[i], label(i), sessions.get(i), result)
+		record(i, result, status, line)
+		return status, line
+
+	sessions = {}
+	try:
+		# 先批量预检 session，过期的账号不再启动浏览器
+		pending = [i for i, key in enumerate(keys) if key not in completed and i not in quarantined]
+		if precheck_enabled() and pending:
+			async with profiling.span('precheck'):
+				statuses = await precheck_sessions(ctx, [accounts[i] for i in pending], pending)
+			sessions = dict(zip(pending, statuses))
+			if statuses.count(None) == len(statuses):
+				print('[PRECHECK] Skipped, no WAF cookies cached yet')
+			else:
+				print(
+					f'[PRECHECK] Sessions: {statuses.count(SESSION_VALID)} valid, '
+					f'{statuses.count(SESSION_EXPIRED)} expired, {statuses.count(SESSION_UNKNOWN)} unknown, '
+					f'{statuses.count(None)} not checked without WAF cookies'
+				)
+
+		# 按预计耗时从长到短开始签到，通知内容仍按配置顺序排列
+		order, predicted = plan_schedule(ctx, accounts, keys, pending, history)
+		started = time.perf_counter()
+		if pipeline_enabled():
+			# WAF cookies 获取和签到请求分阶段处理，阶段之间用有界队列连接
+			outcomes = {}
+
+			def on_done(job):
+				outcomes[job.index] = job.outcome
+				record(job.index, job.result, *job.outcome)
+
+			jobs = [
+				PipelineJob(
+					i, accounts[i], label(i), AccountResult(i, label(i), host_of(base_urls[i])), sessions.get(i)
+				)
+				for i in order
+			]
+			pipeline = await run_pipeline(ctx, jobs, on_done)
+			for line in pipeline.report_lines():
+				print(line)
+			results = [
+				settled(i) or outcomes.get(i) or ('failed', f'[FAIL] {label(i)} exception: pipeline stage failed')
+				for i in range(len(accounts))
+			]
+		else:
+			order += [i for i in range(len(accounts)) if i not in set(pending)]
+			outcomes = await asyncio.gather(*(run_account(i) for i in order))
+			results = [outcome for _, outcome in sorted(zip(order, outcomes))]
+		if predicted is not None:
+			print(f'[SCHEDULE] Predicted makespan {predicted:.1f}s, actual {time.perf_counter() - started:.1f}s')
+	finally:
+		history.save()
+		quarantine.save()
+		await ctx.sites.aclose()
+		if ctx.sink:
+			ctx.sink.close()
+		for reporter in progress.values():
+			await reporter.close()
+
+	profiling.mark('checkins_done')
+
+	if ctx.waf_cache.fetch_count:
+		print(f'[INFO] WAF cookies acquired {ctx.waf_cache.fetch_count} time(s) for {len(accounts)} accounts')
+
+	# 每个租户单独生成报告，通过租户自己的通知配置发送
+	success_count = skipped_count = 0
+	detail_limit = int(os.getenv('ANYROUTER_REPORT_DETAIL_LIMIT', '50'))
+	for tenant in tenants:
+		span = range(tenant.start, tenant.start + len(tenant.accounts))
+		tenant_results = [results[i] for i in span]
+		tenant_transitions = [line for i in span for line in transitions.get(i, [])]
+		tenant_resumed = sum(1 for i in span if keys[i] in completed)
+		proxy_lines = ctx.proxy_pool.report_lines() if ctx.proxy_pool else []
+		notify_content, succeeded, skipped = build_report(
+			tenant_results,
+			tenant_resumed,
+			tenant_transitions,
+			proxy_lines,
+			stats=stats[tenant.name],
+			detail_limit=detail_limit,
+			detail_path=report_detail_path(tenant.name),
+		)
+		success_count += succeeded
+		skipped_count += skipped
+
+		if tenant.name:
+			print(f'[TENANT] {tenant.name}: {succeeded}/{len(tenant.accounts)} accounts successful')
+		print(notify_content)
+		title = f'AnyRouter Check-in Results ({tenant.name})' if tenant.name else 'AnyRouter Check-in Results'
+		notifiers[tenant.name].push_message(title, notify_content, msg_type='text')
+
+	# 账号自己配置的通知目标，每个目标只收到一条合并的消息
+	await deliver_routes(
+		[(account.get('notify'), *outcome) for account, outcome in zip(accounts, results)], 'AnyRouter Check-in Results'
+	)
+
+	# 通知发出后才标记运行结束，还有账号因截止时间跳过时保留日志供下次恢复
+	journal.finish(complete=skipped_count == 0)
+	if lease:
+		lease.complete = skipped_count == 0
+	profiling.stop_lag_sampler()
+	profiling.mark('notified')
 
-	for i, account in enumerate(accounts):
+	# 设置退出码
+	sys.exit(0 if success_count > 0 else 1)
+
+
+def report_detail_path(tenant: str = '') -> Path:
+	"""账号过多时逐账号结果写入的文件，多租户运行时每个租户一个文件"""
+	path = Path(os.getenv('ANYROUTER_REPORT_DETAIL_FILE') or state_path('report_details.txt'))
+	if tenant:
+		slug = ''.join(c if c.isalnum() or c in '-_' else '_' for c in tenant)
+		path = path.with_name(f'{path.stem}_{slug}{path.suffix}')
+	return path
+
+
+def build_report(
+	results: list[tuple[str, str]],
+	resumed_count: int = 0,
+	transitions=(),
+	extra_lines=(),
+	stats: FleetStats | None = None,
+	detail_limit: int = 0,
+	detail_path=None,
+) -> tuple[str, int, int]:
+	"""根据 (状态, 通知内容) 列表生成通知内容，返回 (内容, 成功数, 跳过数)
+
+	账号数超过 detail_limit 时，逐账号的结果写入 detail_path，通知中只保留余额统计和未成功的账号
+	（最多 detail_limit 条）。
+	"""
+	total_count = len(results)
+	success_count = sum(1 for status, _ in results if status == 'success')
+	skipped_count = sum(1 for status, _ in results if status == 'skipped')
+	quarantined_count = sum(1 for status, _ in results if status == 'quarantined')
+	active_count = total_count - quarantined_count
+	notification_content = [line for status, line in results if status != 'quarantined']
+	quarantine_content = [line for status, line in results if status == 'quarantined'] + list(transitions)
+
+	if detail_limit and detail_path and total_count > detail_limit:
+		detail_path = Path(detail_path)
 		try:
-			success, user_info = await check_in_account(account, i)
-			if success:
-				success_count += 1
-			# 收集通知内容
-			status = '[SUCCESS]' if success else '[FAIL]'
-			account_result = f'{status} Account {i + 1}'
-			if user_info:
-				account_result += f'\n{user_info}'
-			notification_content.append(account_result)
-		except Exception as e:
-			print(f'[FAILED] Account {i + 1} processing exception: {e}')
-			notification_content.append(f'[FAIL] Account {i + 1} exception: {str(e)[:50]}...')
+			detail_path.parent.mkdir(parents=True, exist_ok=True)
+			with open(detail_path, 'w', encoding='utf-8') as f:
+				for _, line in results:
+					f.write(line + '\n')
+		except OSError as e:
+			print(f'[WARNING] Unable to write report details to {detail_path}: {e}')
+		else:
+			unsuccessful = [line for status, line in results if status not in ('success', 'quarantined')]
+			notification_content = unsuccessful[:detail_limit]
+			if len(unsuccessful) > detail_limit:
+				notification_content.append(
+					f'[INFO] ... and {len(unsuccessful) - detail_limit} more unsuccessful accounts'
+				)
+			notification_content.append(f'[INFO] Per-account results for {total_count} accounts: {detail_path}')
+			quarantine_content = quarantine_content[:detail_limit]
 
 	# 构建通知内容
 	summary = [
 		'[STATS] Check-in result statistics:',
 		f'[SUCCESS] Success: {success_count}/{total_count}',
-		f'[FAIL] Failed: {total_count - success_count}/{total_count}',
+		f'[FAIL] Failed: {active_count - success_count - skipped_count}/{total_count}',
 	]
-
-	if success_count == total_count:
+	if skipped_count:
+		summary.append(f'[SKIP] Skipped: {skipped_count}/{total_count}')
+	if quarantined_count:
+		summary.append(f'[QUARANTINE] Quarantined: {quarantined_count}/{total_count}')
+	if resumed_count:
+		summary.append(f'[INFO] Resumed from checkpoint: {resumed_count}/{total_count}')
+
+	if active_count and success_count == active_count:
 		summary.append('[SUCCESS] All accounts check-in successful!')
 	elif success_count > 0:
 		summary.append('[WARN] Some accounts check-in successful')
 	else:
 		summary.append('[ERROR] All accounts check-in failed')
 
-	time_info = f'[TIME] Execution time: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
-
-	notify_content = '\n\n'.join([time_info, '\n'.join(notification_content), '\n'.join(summary)])
-
-	print(notify_content)
+	if stats and stats.count > 1:
+		summary.extend(stats.summary_lines())
+	summary.extend(extra_lines)
 
-	notify.push_message('AnyRouter Check-in Results', notify_content, msg_type='text')
+	time_info = f'[TIME] Execution time: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
 
-	# 设置退出码
-	sys.exit(0 if success_count > 0 else 1)
+	sections = [time_info, '\n'.join(notification_content)]
+	if quarantine_content:
+		sections.append('\n'.join(quarantine_content))
+	return '\n\n'.join([*sections, '\n'.join(summary)]), success_count, skipped_count
 
 
 def run_main():
 	"""运行主函数的包装函数"""
+	load_env()
+	profiler = profiling.RunProfiler() if profiling.profiling_requested() else None
+	if profiler:
+		profiler.start()
 	try:
 		asyncio.run(main())
 	except KeyboardInterrupt:
@@ -302,6 +1307,9 @@ def run_main():
 	except Exception as e:
 		print(f'\n[FAILED] Error occurred during program execution: {e}')
 		sys.exit(1)
+	finally:
+		if profiler:
+			profiler.stop()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,184 @@
+"""
+常驻运行模式
+
+python daemon.py 启动常驻进程，每个账号按 ANYROUTER_DAEMON_INTERVAL 周期签到，
+WAF cookies 和各站点的连接池在整个进程中复用。
+
+设置 ANYROUTER_ACCOUNTS_FILE 后监听账号文件，修改后增量生效，无需重启：
+- 新增的账号立即安排签到
+- 删除的账号取消调度，正在进行的签到也会被取消
+- cookies 等字段变化的账号重新安排调度，其他账号不受影响：上次签到成功的账号按上次签到时间
+  等到下一个周期，避免重复签到；上次失败或还没有签到过的账号立即签到
+"""
+
+import asyncio
+import os
+import signal
+import sys
+import time
+
+import checkin
+from account_source import FileWatcher, diff_accounts, index_accounts
+from deadline import RunDeadline
+from lease import RunLease
+
+
+class AccountScheduler:
+	"""每个账号一个调度任务，按账号标识增量增删"""
+
+	def __init__(self, ctx, interval: float, retry_interval: float, on_result=None):
+		self.ctx = ctx
+		self.interval = interval
+		self.retry_interval = retry_interval
+		self.on_result = on_result
+		self.accounts: dict[str, dict] = {}
+		self.tasks: dict[str, asyncio.Task] = {}
+		# 每个账号上次的结果 (状态, 通知内容, 完成时间)
+		self.last: dict[str, tuple] = {}
+		self.running = 0
+
+	def apply(self, accounts):
+		"""应用新的账号列表，返回与当前账号的差异"""
+		new = index_accounts(accounts)
+		diff = diff_accounts(self.accounts, new)
+		for key in diff.removed + diff.changed:
+			self._cancel(key)
+		for key in diff.removed:
+			self.last.pop(key, None)
+		self.accounts = new
+		for key in diff.added:
+			self.tasks[key] = asyncio.create_task(self._run(key))
+		for key in diff.changed:
+			self.tasks[key] = asyncio.create_task(self._run(key, self._next_due(key)))
+		return diff
+
+	def _cancel(self, key):
+		task = self.tasks.pop(key, None)
+		if task:
+			task.cancel()
+
+	def _next_due(self, key) -> float:
+		"""配置变化的账号距下次签到的秒数，上次签到成功时保持原来的周期"""
+		last = self.last.get(key)
+		if not last or last[0] != 'success':
+			return 0.0
+		return max(0.0, last[2] + self.interval - time.time())
+
+	async def _run(self, key, delay: float = 0.0):
+		if delay:
+			await asyncio.sleep(delay)
+		while True:
+			account = self.accounts[key]
+			index = list(self.accounts).index(key)
+			self.running += 1
+			try:
+				status, line = await checkin.process_account(self.ctx, index, account, checkin.account_label(index))
+			finally:
+				self.running -= 1
+			self.last[key] = (status, line, time.time())
+			if self.on_result:
+				await self.on_result(key, status, line)
+			await asyncio.sleep(self.interval if status == 'success' else self.retry_interval)
+
+	async def close(self):
+		tasks = list(self.tasks.values())
+		for task in tasks:
+			task.cancel()
+		await asyncio.gather(*tasks, return_exceptions=True)
+		self.tasks.clear()
+
+
+async def serve(stop: asyncio.Event | None = None):
+	"""常驻运行，直到收到 SIGTERM/SIGINT 或 stop 被设置"""
+	print('[SYSTEM] AnyRouter check-in daemon started')
+	accounts = checkin.load_accounts()
+	if not accounts:
+		print('[FAILED] Unable to load account configuration, program exits')
+		sys.exit(1)
+
+	# 常驻进程在整个运行期间持有租约，期间触发的单次签到直接退出，不会重复签到
+	lease = RunLease.from_env()
+	if lease:
+		holder = await lease.acquire(float(os.getenv('ANYROUTER_LEASE_WAIT', '0')))
+		if holder:
+			print(f'[LEASE] Another run is in progress ({RunLease.describe(holder)}), exiting')
+			sys.exit(0)
+		lease.start_heartbeat()
+
+	stop = stop or asyncio.Event()
+	loop = asyncio.get_running_loop()
+	for sig in (signal.SIGTERM, signal.SIGINT):
+		try:
+			loop.add_signal_handler(sig, stop.set)
+		except (NotImplementedError, RuntimeError):
+			pass
+
+	ctx = checkin.create_run_context(RunDeadline.from_env(with_total=False))
+	pending: list[str] = []
+	# 各通道的熔断状态不是线程安全的，通知逐条发送
+	sending = asyncio.Lock()
+
+	async def on_result(key, status, line):
+		# 同一批签到全部完成后合并发送一次通知
+		pending.append(line)
+		if scheduler.running == 0:
+			content = '\n'.join(pending)
+			pending.clear()
+			# 通知通道是同步请求，放到线程中发送，慢的 webhook 不会阻塞其他账号
+			async with sending:
+				await asyncio.to_thread(checkin.notify.push_message, 'AnyRouter Check-in Results', content, 'text')
+
+	scheduler = AccountScheduler(
+		ctx,
+		interval=float(os.getenv('ANYROUTER_DAEMON_INTERVAL', '86400')),
+		retry_interval=float(os.getenv('ANYROUTER_DAEMON_RETRY', '1800')),
+		on_result=on_result,
+	)
+	scheduler.apply(accounts)
+	print(f'[INFO] Scheduled {len(scheduler.accounts)} accounts')
+
+	def reload():
+		accounts = checkin.load_accounts()
+		if accounts is None:
+			print('[WARNING] Account file is invalid, keeping the current accounts')
+			return
+		diff = scheduler.apply(accounts)
+		if diff:
+			print(
+				f'[RELOAD] Accounts updated: {len(diff.added)} added, '
+				f'{len(diff.removed)} removed, {len(diff.changed)} changed'
+			)
+
+	watcher = None
+	accounts_file = os.getenv('ANYROUTER_ACCOUNTS_FILE')
+	if accounts_file:
+		watcher = FileWatcher(accounts_file, reload, poll_interval=float(os.getenv('ANYROUTER_WATCH_POLL', '2')))
+		watcher.start()
+	else:
+		print('[INFO] ANYROUTER_ACCOUNTS_FILE not set, account hot reload is disabled')
+
+	try:
+		await stop.wait()
+	finally:
+		if watcher:
+			watcher.stop()
+		await scheduler.close()
+		await ctx.sites.aclose()
+		if ctx.sink:
+			ctx.sink.close()
+		if lease:
+			await lease.close()
+		print('[SYSTEM] AnyRouter check-in daemon stopped')
+
+
+def run_daemon():
+	checkin.load_env()
+	try:
+		asyncio.run(serve())
+	except Exception as e:
+		print(f'\n[FAILED] Error occurred during daemon execution: {e}')
+		sys.exit(1)
+
+
+if __name__ == '__main__':
+	run_daemon()
@@ -0,0 +1,87 @@
+"""
+运行截止时间与分阶段时间预算
+
+整个运行有一个总截止时间，并为发送通知预留一段时间；账号和阶段的预算
+都不会超过剩余时间。所有预算基于 asyncio.timeout，到期时取消正在进行的
+Playwright 和 httpx 调用。
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+
+def _env_seconds(name: str, default: float | None) -> float | None:
+	value = os.getenv(name)
+	if not value:
+		return default
+	seconds = float(value)
+	return seconds if seconds > 0 else None
+
+
+class RunDeadline:
+	def __init__(
+		self,
+		total: float | None = None,
+		reserve: float = 0,
+		account_timeout: float | None = None,
+		waf_timeout: float | None = None,
+		http_timeout: float | None = None,
+		clock=time.monotonic,
+	):
+		self.clock = clock
+		self.reserve = reserve
+		self.deadline = clock() + max(0.0, total - reserve) if total else None
+		self.account_timeout = account_timeout
+		self.waf_timeout = waf_timeout
+		self.http_timeout = http_timeout
+		self._scopes = set()
+
+	@classmethod
+	def from_env(cls, with_total: bool = True):
+		"""从环境变量读取运行总时长、通知预留时间和各阶段预算，常驻运行时不设总时长"""
+		return cls(
+			total=_env_seconds('ANYROUTER_RUN_TIMEOUT', None) if with_total else None,
+			reserve=_env_seconds('ANYROUTER_NOTIFY_RESERVE', 60) or 0,
+			account_timeout=_env_seconds('ANYROUTER_ACCOUNT_TIMEOUT', 240),
+			waf_timeout=_env_seconds('ANYROUTER_WAF_TIMEOUT', 120),
+			http_timeout=_env_seconds('ANYROUTER_HTTP_TIMEOUT', 60),
+		)
+
+	def remaining(self) -> float | None:
+		"""距截止时间的剩余秒数，未设置截止时间时返回 None"""
+		if self.deadline is None:
+			return None
+		return max(0.0, self.deadline - self.clock())
+
+	def expired(self) -> bool:
+		remaining = self.remaining()
+		return remaining is not None and remaining <= 0
+
+	def budget(self, cap: float | None = None) -> float | None:
+		"""返回不超过剩余时间的预算"""
+		remaining = self.remaining()
+		if remaining is None:
+			return cap
+		if cap is None:
+			return remaining
+		return min(cap, remaining)
+
+	@asynccontextmanager
+	async def scope(self, cap: float | None = None):
+		"""在预算内执行代码块，超时抛出 TimeoutError"""
+		async with asyncio.timeout(self.budget(cap)) as cm:
+			self._scopes.add(cm)
+			try:
+				yield cm
+			finally:
+				self._scopes.discard(cm)
+
+	def expire_now(self):
+		"""立即到期，用于收到 SIGTERM 时取消所有进行中的工作"""
+		self.deadline = self.clock()
+		now = asyncio.get_running_loop().time()
+		for cm in list(self._scopes):
+			if not cm.expired():
+				cm.reschedule(now)
@@ -0,0 +1,131 @@
+"""
+账号余额的流式统计
+
+账号很多时逐个列出余额没人能看完。每个账号完成时把余额和已用额度加入累加器，一次遍历得到总额、均值、
+分位数（对数分桶的 DDSketch，相对误差 1%）以及余额和用量的前 N 名、后 N 名，内存占用与账号数无关。
+"""
+
+import heapq
+import math
+
+
+class QuantileSketch:
+	"""对数分桶的分位数草图，返回值的相对误差不超过 relative_accuracy"""
+
+	def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048, min_value: float = 1e-4):
+		self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+		self._log_gamma = math.log(self.gamma)
+		self.max_bins = max_bins
+		self.min_value = min_value
+		self.bins: dict[int, int] = {}
+		# 小于 min_value 的值（余额为 0 或负数）单独计数
+		self.low = 0
+		self.count = 0
+
+	def add(self, value: float):
+		self.count += 1
+		if value < self.min_value:
+			self.low += 1
+			return
+		key = math.ceil(math.log(value) / self._log_gamma)
+		self.bins[key] = self.bins.get(key, 0) + 1
+		if len(self.bins) > self.max_bins:
+			# 合并最低的两个桶，牺牲低分位的精度换取固定内存
+			lowest, second = sorted(self.bins)[:2]
+			self.bins[second] += self.bins.pop(lowest)
+
+	def quantile(self, q: float) -> float | None:
+		if not self.count:
+			return None
+		rank = q * (self.count - 1)
+		seen = self.low
+		if rank < seen:
+			return 0.0
+		for key in sorted(self.bins):
+			seen += self.bins[key]
+			if rank < seen:
+				return 2 * self.gamma**key / (self.gamma + 1)
+		return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+
+class TopN:
+	"""保留最大和最小的 n 个值"""
+
+	def __init__(self, n: int):
+		self.n = n
+		self._largest: list[tuple[float, int, str]] = []
+		self._smallest: list[tuple[float, int, str]] = []
+		self._seq = 0
+
+	def add(self, value: float, label: str):
+		if self.n <= 0:
+			return
+		self._seq += 1
+		# 相同值时先加入的账号排在前面
+		for heap, item in ((self._largest, (value, -self._seq, label)), (self._smallest, (-value, -self._seq, label))):
+			if len(heap) < self.n:
+				heapq.heappush(heap, item)
+			elif item > heap[0]:
+				heapq.heapreplace(heap, item)
+
+	def largest(self) -> list[tuple[str, float]]:
+		return [(label, value) for value, _, label in sorted(self._largest, reverse=True)]
+
+	def smallest(self) -> list[tuple[str, float]]:
+		return [(label, -value) for value, _, label in sorted(self._smallest, reverse=True)]
+
+
+class Metric:
+	def __init__(self, top: int):
+		self.count = 0
+		self.total = 0.0
+		self.sketch = QuantileSketch()
+		self.top = TopN(top)
+
+	def add(self, value: float, label: str):
+		self.count += 1
+		self.total += value
+		self.sketch.add(value)
+		self.top.add(value, label)
+
+	@property
+	def mean(self) -> float:
+		return self.total / self.count if self.count else 0.0
+
+
+class FleetStats:
+	"""余额（balance）和已用额度（used）的流式统计"""
+
+	QUANTILES = (0.5, 0.9, 0.99)
+
+	def __init__(self, top: int = 3):
+		self.balance = Metric(top)
+		self.used = Metric(top)
+
+	def add(self, label: str, balance: float | None, used: float | None = None):
+		if balance is not None:
+			self.balance.add(balance, label)
+		if used is not None:
+			self.used.add(used, label)
+
+	@property
+	def count(self) -> int:
+		return self.balance.count
+
+	def summary_lines(self) -> list[str]:
+		if not self.balance.count:
+			return []
+		lines = [
+			f'[BALANCE] {self.balance.count} accounts, total ${self.balance.total:.2f}, mean ${self.balance.mean:.2f}, '
+			f'total used ${self.used.total:.2f}',
+		]
+		for name, metric in (('Balance', self.balance), ('Used', self.used)):
+			if not metric.count:
+				continue
+			quantiles = ', '.join(f'p{round(q * 100)} ${metric.sketch.quantile(q):.2f}' for q in self.QUANTILES)
+			lines.append(f'[BALANCE] {name} {quantiles}')
+			for order, ranked in (('Top', metric.top.largest()), ('Bottom', metric.top.smallest())):
+				if ranked:
+					accounts = ', '.join(f'{label} ${value:.2f}' for label, value in ranked)
+					lines.append(f'[BALANCE] {order} {len(ranked)} by {name.lower()}: {accounts}')
+		return lines
@@ -0,0 +1,179 @@
+"""
+签到检查点日志
+
+main() 每完成一个账号就向日志追加一行 JSON 记录，进程中途被杀（Chromium OOM、青龙超时、
+runner 取消）时已完成的结果不会丢失。通过 --resume 参数或 ANYROUTER_RESUME=1 恢复运行时，
+跳过上次已完成的账号，最后发送一份合并的通知。
+
+每条记录写入后立即 flush 到操作系统，进程崩溃也不会丢失；fsync 按条数或时间间隔批量执行，
+避免并发运行时每个账号都等待磁盘。
+
+签到按天计算，开始于其他日期（本地时区）或超过 ANYROUTER_JOURNAL_MAX_AGE 秒的日志不再恢复，
+直接删除，避免把前一天已签到的账号当作今天已完成而跳过。
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sites import account_base_url
+from state import state_path
+
+# 运行结束且没有因截止时间跳过的账号时写入，之后不再恢复
+DONE = 'done'
+
+
+def resume_requested(argv=None) -> bool:
+	argv = sys.argv[1:] if argv is None else argv
+	return '--resume' in argv or os.getenv('ANYROUTER_RESUME', '').lower() in ('1', 'true', 'yes')
+
+
+def account_keys(accounts) -> list[str]:
+	"""账号的稳定标识（站点 + api_user），账号顺序变化后仍能对应；重复的账号追加序号"""
+	keys = []
+	seen: dict[str, int] = {}
+	for account in accounts:
+		identity = f'{account_base_url(account)}|{account.get("api_user", "")}'
+		key = hashlib.sha1(identity.encode('utf-8')).hexdigest()[:16]
+		seen[key] = seen.get(key, 0) + 1
+		keys.append(key if seen[key] == 1 else f'{key}#{seen[key]}')
+	return keys
+
+
+class CheckpointJournal:
+	def __init__(
+		self,
+		path,
+		fsync_interval: float = 1.0,
+		fsync_batch: int = 50,
+		clock=time.monotonic,
+		max_age: float | None = 86400,
+		now=datetime.now,
+	):
+		self.path = Path(path)
+		self.max_age = max_age
+		self.now = now
+		self.fsync_interval = fsync_interval
+		self.fsync_batch = max(1, fsync_batch)
+		self.clock = clock
+		self.fsync_count = 0
+		self._file = None
+		self._pending = 0
+		self._last_sync = 0.0
+
+	@classmethod
+	def from_env(cls):
+		return cls(
+			os.getenv('ANYROUTER_JOURNAL_FILE') or state_path('checkpoint.jsonl'),
+			fsync_interval=float(os.getenv('ANYROUTER_JOURNAL_FSYNC_INTERVAL', '1')),
+			fsync_batch=int(os.getenv('ANYROUTER_JOURNAL_FSYNC_BATCH', '50')),
+			max_age=float(os.getenv('ANYROUTER_JOURNAL_MAX_AGE', '86400')) or None,
+		)
+
+	def _expired(self, started: str | None) -> bool:
+		"""运行开始于其他日期或超过最大有效期时，已完成的结果不能算作今天的签到"""
+		try:
+			started_at = datetime.fromisoformat(started)
+		except (TypeError, ValueError):
+			return True
+		now = self.now()
+		if started_at.date() != now.date():
+			return True
+		return self.max_age is not None and (now - started_at).total_seconds() > self.max_age
+
+	def load(self) -> dict[str, dict]:
+		"""读取未结束运行中已完成的账号结果，日志不存在、上次运行已结束或已过期时返回空"""
+		completed: dict[str, dict] = {}
+		started = None
+		try:
+			with open(self.path, encoding='utf-8') as f:
+				lines = f.readlines()
+		except OSError:
+			return completed
+
+		for line in lines:
+			try:
+				record = json.loads(line)
+			except ValueError:
+				# 进程在写入中途被杀时最后一行可能不完整
+				continue
+			if record.get('type') == DONE:
+				completed.clear()
+				started = None
+			elif record.get('type') == 'run':
+				# 恢复运行会追加新的 run 记录，以第一次运行的开始时间为准
+				started = started or record.get('started')
+			elif record.get('type') == 'result':
+				completed[record['key']] = record
+
+		if completed and self._expired(started):
+			print(f'[INFO] Checkpoint journal from {started or "an unknown time"} is out of date, starting a new run')
+			try:
+				self.path.unlink()
+			except OSError:
+				pass
+			return {}
+		return completed
+
+	def open(self, resume: bool = False, accounts: int = 0) -> dict[str, dict]:
+		"""开始写入日志；resume 时返回上次已完成的结果并在原日志后追加，否则清空日志
+
+		日志文件无法写入时不记录本次运行，签到照常进行。
+		"""
+		completed = self.load() if resume else {}
+		try:
+			self.path.parent.mkdir(parents=True, exist_ok=True)
+			self._file = open(self.path, 'a' if completed else 'w', encoding='utf-8')
+		except OSError as e:
+			# 日志只用于中途退出后恢复，写不了时照常签到
+			print(f'[WARNING] Unable to open checkpoint journal {self.path}: {e}, continuing without it')
+			return completed
+		self._last_sync = self.clock()
+		self._write(
+			{
+				'type': 'run',
+				'started': self.now().isoformat(timespec='seconds'),
+				'accounts': accounts,
+				'resumed': len(completed),
+			}
+		)
+		return completed
+
+	def record(
+		self, key: str, index: int, status: str, line: str, balance: float | None = None, used: float | None = None
+	):
+		"""追加一个账号的结果，余额一并保存，恢复运行时用于余额统计"""
+		record = {'type': 'result', 'key': key, 'index': index, 'status': status, 'line': line}
+		if balance is not None:
+			record.update(balance=balance, used=used)
+		self._write(record)
+
+	def finish(self, complete: bool = True):
+		"""关闭日志；complete 时写入结束标记，下次 --resume 不再恢复这次运行"""
+		if self._file is None:
+			return
+		if complete:
+			self._write({'type': DONE})
+		self._sync()
+		self._file.close()
+		self._file = None
+
+	def _write(self, record: dict):
+		if self._file is None:
+			return
+		self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+		self._file.flush()
+		self._pending += 1
+		if self._pending >= self.fsync_batch or self.clock() - self._last_sync >= self.fsync_interval:
+			self._sync()
+
+	def _sync(self):
+		if self._pending:
+			os.fsync(self._file.fileno())
+			self.fsync_count += 1
+			self._pending = 0
+		self._last_sync = self.clock()
@@ -0,0 +1,192 @@
+"""
+防止重复运行的租约
+
+定时任务重叠、手动触发和青龙重试可能同时启动多个签到进程，重复启动浏览器、重复签到。main() 开始前
+获取租约：租约文件记录持有者和过期时间，持有期间定期续期（心跳）。持有者崩溃或卡死后租约过期，
+其他进程可以接管；持有者在同一台机器上且进程已退出时立即接管，不必等到过期。
+
+读写租约文件时用 mkdir 创建的锁目录互斥，mkdir 在 NFS 等共享目录上也是原子的，
+ANYROUTER_LEASE_DIR 指向多台机器共享的目录即可跨机器互斥。等待锁目录是阻塞的，异步代码中
+通过 asyncio.to_thread 调用，不会卡住事件循环。
+"""
+
+import asyncio
+import hashlib
+import os
+import socket
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from state import load_json, save_json, state_path
+
+# 锁目录存在超过这么多秒视为持有者在读写租约文件时崩溃，直接删除
+GUARD_STALE = 30.0
+
+
+def pid_alive(pid: int) -> bool:
+	if sys.platform == 'win32':
+		# Windows 上 os.kill 会结束进程，只依赖租约过期
+		return True
+	try:
+		os.kill(pid, 0)
+	except ProcessLookupError:
+		return False
+	except PermissionError:
+		return True
+	return True
+
+
+def accounts_digest(keys) -> str:
+	return hashlib.sha1('\n'.join(keys).encode('utf-8')).hexdigest()[:16]
+
+
+class RunLease:
+	def __init__(self, path, ttl: float = 300.0, local: bool = True, clock=time.time, owner: str | None = None):
+		"""local 表示租约文件只在本机使用，此时可以通过进程号判断持有者是否已退出"""
+		self.path = Path(path)
+		self.local = local
+		self.guard = self.path.with_name(f'{self.path.name}.lock')
+		self.ttl = ttl
+		self.clock = clock
+		self.host = socket.gethostname()
+		self.owner = owner or f'{self.host}:{os.getpid()}:{os.urandom(3).hex()}'
+		self.meta: dict = {}
+		# 获取租约时文件中原有的记录，以及等待期间看到的持有者
+		self.previous: dict | None = None
+		self.waited_for: dict | None = None
+		# 运行是否完整结束，释放时写入租约文件，等待中的进程据此决定是否还需要运行
+		self.complete = False
+		self.lost = False
+		self._heartbeat_task = None
+
+	@classmethod
+	def from_env(cls):
+		"""ANYROUTER_LEASE 设为 0 时不使用租约"""
+		if os.getenv('ANYROUTER_LEASE', '1').strip().lower() in ('0', 'false', 'off'):
+			return None
+		directory = os.getenv('ANYROUTER_LEASE_DIR')
+		path = Path(directory) / 'run.lease' if directory else state_path('run.lease')
+		# 共享目录中其他机器或容器的进程号在本机没有意义，只依赖租约过期
+		return cls(path, ttl=float(os.getenv('ANYROUTER_LEASE_TTL', '300')), local=not directory)
+
+	@contextmanager
+	def _locked(self, timeout: float = 10.0):
+		self.path.parent.mkdir(parents=True, exist_ok=True)
+		deadline = time.monotonic() + timeout
+		while True:
+			try:
+				os.mkdir(self.guard)
+				break
+			except FileExistsError:
+				try:
+					if time.time() - os.stat(self.guard).st_mtime > GUARD_STALE:
+						os.rmdir(self.guard)
+						continue
+				except OSError:
+					continue
+				if time.monotonic() >= deadline:
+					raise TimeoutError(f'Lease guard {self.guard} is busy') from None
+				time.sleep(0.05)
+		try:
+			yield
+		finally:
+			try:
+				os.rmdir(self.guard)
+			except OSError:
+				pass
+
+	def read(self) -> dict | None:
+		return load_json(self.path)
+
+	def held_by_other(self, record: dict | None) -> bool:
+		"""租约是否被其他仍在运行的进程持有"""
+		if not record or record.get('released') or record.get('owner') == self.owner:
+			return False
+		if record.get('expires', 0) <= self.clock():
+			return False
+		if self.local and record.get('host') == self.host and not pid_alive(record.get('pid', 0)):
+			return False
+		return True
+
+	def _write(self, **extra):
+		now = self.clock()
+		record = {'owner': self.owner, 'host': self.host, 'pid': os.getpid(), 'acquired': now, **self.meta}
+		if self.path.exists():
+			current = self.read() or {}
+			if current.get('owner') == self.owner:
+				record['acquired'] = current.get('acquired', now)
+		record.update(expires=now + self.ttl, **extra)
+		save_json(self.path, record)
+
+	def try_acquire(self) -> dict | None:
+		"""获取租约，成功返回 None，被其他进程持有时返回持有者的记录"""
+		with self._locked():
+			record = self.read()
+			if self.held_by_other(record):
+				return record
+			self.previous = record
+			self._write()
+		return None
+
+	def renew(self) -> bool:
+		"""续期，租约已被其他进程接管时返回 False"""
+		with self._locked():
+			record = self.read()
+			if not record or record.get('owner') != self.owner or record.get('released'):
+				return False
+			self._write()
+		return True
+
+	def release(self):
+		with self._locked():
+			record = self.read()
+			if record and record.get('owner') == self.owner:
+				self._write(released=self.clock(), complete=self.complete)
+
+	async def acquire(self, wait: float = 0.0, poll: float = 1.0) -> dict | None:
+		"""获取租约，被占用时最多等待 wait 秒；成功返回 None，否则返回持有者的记录"""
+		deadline = time.monotonic() + wait
+		while True:
+			holder = await asyncio.to_thread(self.try_acquire)
+			if holder is None:
+				return None
+			self.waited_for = self.waited_for or holder
+			remaining = deadline - time.monotonic()
+			if remaining <= 0:
+				return holder
+			await asyncio.sleep(min(poll, remaining))
+
+	def start_heartbeat(self):
+		self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+	async def _heartbeat(self):
+		while True:
+			await asyncio.sleep(self.ttl / 3)
+			try:
+				renewed = await asyncio.to_thread(self.renew)
+			except (OSError, TimeoutError) as e:
+				print(f'[LEASE] Failed to renew run lease: {e}')
+				continue
+			if not renewed:
+				self.lost = True
+				print('[LEASE] Run lease was taken over by another run')
+				return
+
+	async def close(self):
+		"""停止心跳并释放租约"""
+		if self._heartbeat_task:
+			self._heartbeat_task.cancel()
+			await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+			self._heartbeat_task = None
+		if not self.lost:
+			try:
+				await asyncio.to_thread(self.release)
+			except (OSError, TimeoutError) as e:
+				print(f'[LEASE] Failed to release run lease: {e}')
+
+	@staticmethod
+	def describe(record: dict) -> str:
+		expires = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record.get('expires', 0)))
+		return f'{record.get("owner", "unknown")}, lease expires at {expires}'
@@ -1,27 +1,59 @@
 import os
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
 from typing import Literal
 
-import httpx
+from breaker import CircuitBreaker
+from state import state_path
+
+
+def _post(url: str, data: dict):
+	"""发送 JSON 请求，httpx 在真正发送通知时才导入"""
+	import httpx
+
+	with httpx.Client(timeout=30.0) as client:
+		client.post(url, json=data).raise_for_status()
+
+
+# 通知通道：名称、所需的配置项（与环境变量同名）和发送方法
+CHANNELS = [
+	(
+		'Email',
+		('EMAIL_USER', 'EMAIL_PASS', 'EMAIL_TO'),
+		lambda kit, title, content, msg_type: kit.send_email(title, content, msg_type),
+	),
+	('PushPlus', ('PUSHPLUS_TOKEN',), lambda kit, title, content, msg_type: kit.send_pushplus(title, content)),
+	('Server Push', ('SERVERPUSHKEY',), lambda kit, title, content, msg_type: kit.send_serverPush(title, content)),
+	('DingTalk', ('DINGDING_WEBHOOK',), lambda kit, title, content, msg_type: kit.send_dingtalk(title, content)),
+	('Feishu', ('FEISHU_WEBHOOK',), lambda kit, title, content, msg_type: kit.send_feishu(title, content)),
+	('WeChat Work', ('WEIXIN_WEBHOOK',), lambda kit, title, content, msg_type: kit.send_wecom(title, content)),
+]
 
 
 class NotificationKit:
-	def __init__(self):
-		self.email_user: str = os.getenv('EMAIL_USER', '')
-		self.email_pass: str = os.getenv('EMAIL_PASS', '')
-		self.email_to: str = os.getenv('EMAIL_TO', '')
-		self.pushplus_token = os.getenv('PUSHPLUS_TOKEN')
-		self.server_push_key = os.getenv('SERVERPUSHKEY')
-		self.dingding_webhook = os.getenv('DINGDING_WEBHOOK')
-		self.feishu_webhook = os.getenv('FEISHU_WEBHOOK')
-		self.weixin_webhook = os.getenv('WEIXIN_WEBHOOK')
+	def __init__(self, config: dict | None = None, breaker_file=None, breaker: CircuitBreaker | None = None):
+		"""config 为通知配置，键与通知环境变量同名；未提供时读取环境变量。breaker 可以在多个实例间共用"""
+		setting = os.getenv if config is None else config.get
+		self.email_user: str = setting('EMAIL_USER', '')
+		self.email_pass: str = setting('EMAIL_PASS', '')
+		self.email_to: str = setting('EMAIL_TO', '')
+		self.pushplus_token = setting('PUSHPLUS_TOKEN')
+		self.server_push_key = setting('SERVERPUSHKEY')
+		self.dingding_webhook = setting('DINGDING_WEBHOOK')
+		self.feishu_webhook = setting('FEISHU_WEBHOOK')
+		self.weixin_webhook = setting('WEIXIN_WEBHOOK')
+		self.breaker = breaker or CircuitBreaker(
+			breaker_file or os.getenv('NOTIFY_BREAKER_FILE') or state_path('notify_breaker.json'),
+			failure_threshold=int(os.getenv('NOTIFY_BREAKER_THRESHOLD', '3')),
+			cooldown=float(os.getenv('NOTIFY_BREAKER_COOLDOWN', str(6 * 3600))),
+		)
 
 	def send_email(self, title: str, content: str, msg_type: Literal['text', 'html'] = 'text'):
 		if not self.email_user or not self.email_pass or not self.email_to:
 			raise ValueError('Email configuration not set')
 
+		import smtplib
+		from email.mime.multipart import MIMEMultipart
+		from email.mime.text import MIMEText
+
 		msg = MIMEMultipart()
 		msg['From'] = f'AnyRouter Assistant <{self.email_user}>'
 		msg['To'] = self.email_to
@@ -40,24 +72,21 @@ class NotificationKit:
 			raise ValueError('PushPlus Token not configured')
 
 		data = {'token': self.pushplus_token, 'title': title, 'content': content, 'template': 'html'}
-		with httpx.Client(timeout=30.0) as client:
-			client.post('http://www.pushplus.plus/send', json=data)
+		_post('http://www.pushplus.plus/send', data)
 
 	def send_serverPush(self, title: str, content: str):
 		if not self.server_push_key:
 			raise ValueError('Server Push key not configured')
 
 		data = {'title': title, 'desp': content}
-		with httpx.Client(timeout=30.0) as client:
-			client.post(f'https://sctapi.ftqq.com/{self.server_push_key}.send', json=data)
+		_post(f'https://sctapi.ftqq.com/{self.server_push_key}.send', data)
 
 	def send_dingtalk(self, title: str, content: str):
 		if not self.dingding_webhook:
 			raise ValueError('DingTalk Webhook not configured')
 
 		data = {'msgtype': 'text', 'text': {'content': f'{title}\n{content}'}}
-		with httpx.Client(timeout=30.0) as client:
-			client.post(self.dingding_webhook, json=data)
+		_post(self.dingding_webhook, data)
 
 	def send_feishu(self, title: str, content: str):
 		if not self.feishu_webhook:
@@ -70,33 +99,56 @@ class NotificationKit:
 				'header': {'template': 'blue', 'title': {'content': title, 'tag': 'plain_text'}},
 			},
 		}
-		with httpx.Client(timeout=30.0) as client:
-			client.post(self.feishu_webhook, json=data)
+		_post(self.feishu_webhook, data)
 
 	def send_wecom(self, title: str, content: str):
 		if not self.weixin_webhook:
 			raise ValueError('WeChat Work Webhook not configured')
 
 		data = {'msgtype': 'text', 'text': {'content': f'{title}\n{content}'}}
-		with httpx.Client(timeout=30.0) as client:
-			client.post(self.weixin_webhook, json=data)
+		_post(self.weixin_webhook, data)
 
 	def push_message(self, title: str, content: str, msg_type: Literal['text', 'html'] = 'text'):
-		notifications = [
-			('Email', lambda: self.send_email(title, content, msg_type)),
-			('PushPlus', lambda: self.send_pushplus(title, content)),
-			('Server Push', lambda: self.send_serverPush(title, content)),
-			('DingTalk', lambda: self.send_dingtalk(title, content)),
-			('Feishu', lambda: self.send_feishu(title, content)),
-			('WeChat Work', lambda: self.send_wecom(title, content)),
-		]
+		notifications = [(name, lambda send=send: send(self, title, content, msg_type)) for name, _, send in CHANNELS]
+
+		# 熔断中的通道直接跳过，冷却结束的通道在这里转为半开探测
+		allowed = {name: self.breaker.allow(name) for name, _ in notifications}
+		breaker_lines = self.breaker.report_lines()
+		if breaker_lines:
+			content = content + '\n\n' + '\n'.join(breaker_lines)
 
 		for name, func in notifications:
+			if not allowed[name]:
+				print(f'[{name}]: Circuit open, message push skipped')
+				continue
 			try:
 				func()
 				print(f'[{name}]: Message push successful!')
+				self.breaker.record_success(name)
+			except ValueError as e:
+				# 未配置的通道不计入熔断统计
+				print(f'[{name}]: Message push failed! Reason: {str(e)}')
 			except Exception as e:
 				print(f'[{name}]: Message push failed! Reason: {str(e)}')
+				self.breaker.record_failure(name, str(e))
+
+		self.breaker.save()
+		return self.breaker.transitions
+
+
+class _DeferredNotificationKit:
+	"""第一次使用时才创建 NotificationKit
+
+	导入模块时不读取通知配置和熔断状态文件，入口加载 .env 之后的配置也能生效。
+	"""
+
+	def __init__(self):
+		self._kit = None
+
+	def __getattr__(self, name):
+		if self._kit is None:
+			self._kit = NotificationKit()
+		return getattr(self._kit, name)
 
 
-notify = NotificationKit()
+notify = _DeferredNotificationKit()
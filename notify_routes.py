@@ -0,0 +1,89 @@
+"""
+按账号路由的通知
+
+账号配置中可以加 notify 字段（键与通知环境变量同名），该账号的结果除了发送到全局通知，还会发送到
+这些目标。通道和配置都相同的目标视为同一个目标，一次运行中每个目标只收到一条合并了所有相关账号的
+消息；各目标并行发送，同时进行的请求数不超过 ANYROUTER_NOTIFY_CONCURRENCY。
+"""
+
+import asyncio
+import hashlib
+import os
+from datetime import datetime
+
+from breaker import CircuitBreaker
+from notify import CHANNELS, NotificationKit
+from state import state_path
+
+_SENDERS = {name: send for name, _, send in CHANNELS}
+
+
+def account_targets(config: dict | None) -> list[tuple]:
+	"""账号通知配置中的目标，每个目标为 (通道名, ((配置项, 值), ...))，配置不完整的通道忽略"""
+	targets = []
+	for name, keys, _ in CHANNELS:
+		values = tuple((config or {}).get(key) for key in keys)
+		if all(values):
+			targets.append((name, tuple(zip(keys, values))))
+	return targets
+
+
+def target_id(target: tuple) -> str:
+	"""日志和熔断状态中使用的目标标识，不包含 webhook 地址等敏感配置"""
+	name, settings = target
+	digest = hashlib.sha1(repr(settings).encode('utf-8')).hexdigest()[:8]
+	return f'{name} #{digest}'
+
+
+def route_content(lines: list[str], statuses: list[str]) -> str:
+	time_info = f'[TIME] Execution time: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
+	summary = f'[STATS] Success: {statuses.count("success")}/{len(statuses)}'
+	return '\n\n'.join([time_info, '\n'.join(lines), summary])
+
+
+async def deliver_routes(
+	results, title: str, concurrency: int | None = None, breaker: CircuitBreaker | None = None
+) -> dict[str, bool]:
+	"""results 为 (账号通知配置, 状态, 通知内容)，每个目标发送一条合并消息，返回各目标是否发送成功"""
+	groups: dict[tuple, list[tuple[str, str]]] = {}
+	for config, status, line in results:
+		for target in account_targets(config):
+			groups.setdefault(target, []).append((status, line))
+	if not groups:
+		return {}
+
+	if concurrency is None:
+		concurrency = int(os.getenv('ANYROUTER_NOTIFY_CONCURRENCY', '8'))
+	semaphore = asyncio.Semaphore(max(1, concurrency))
+	breaker = breaker or CircuitBreaker(
+		os.getenv('NOTIFY_ROUTE_BREAKER_FILE') or state_path('notify_breaker_routes.json'),
+		failure_threshold=int(os.getenv('NOTIFY_BREAKER_THRESHOLD', '3')),
+		cooldown=float(os.getenv('NOTIFY_BREAKER_COOLDOWN', str(6 * 3600))),
+	)
+	delivered: dict[str, bool] = {}
+
+	async def send(target, entries):
+		name = target_id(target)
+		if not breaker.allow(name):
+			print(f'[NOTIFY] {name}: Circuit open, message push skipped')
+			delivered[name] = False
+			return
+		kit = NotificationKit(dict(target[1]), breaker=breaker)
+		content = route_content([line for _, line in entries], [status for status, _ in entries])
+		async with semaphore:
+			try:
+				# 通知通道是同步请求，放到线程中并行发送
+				await asyncio.to_thread(_SENDERS[target[0]], kit, title, content, 'text')
+			except Exception as e:
+				print(f'[NOTIFY] {name}: Message push failed! Reason: {e}')
+				breaker.record_failure(name, str(e))
+				delivered[name] = False
+				return
+		breaker.record_success(name)
+		delivered[name] = True
+
+	await asyncio.gather(*(send(target, entries) for target, entries in groups.items()))
+	breaker.save()
+	sent = sum(delivered.values())
+	print(f'[NOTIFY] Per-account notifications: {sent}/{len(groups)} targets delivered')
+	return delivered
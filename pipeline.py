@@ -0,0 +1,92 @@
+"""
+分阶段的签到流水线
+
+每个阶段有独立的 worker 数，阶段之间用有界队列连接：上一阶段处理完的账号放入下一阶段的队列，
+队列满时上一阶段等待，避免某个阶段堆积过多账号。运行结束后报告各阶段的利用率
+（worker 忙碌时间占比）和队列深度，用于调整各阶段的 worker 数。
+"""
+
+import asyncio
+import time
+
+
+class Stage:
+	def __init__(self, name: str, handler, workers: int = 1, queue_size: int = 0):
+		"""handler(item) 处理一个条目并返回交给下一阶段的条目，不应抛出异常"""
+		self.name = name
+		self.handler = handler
+		self.workers = max(1, workers)
+		self.queue: asyncio.Queue = asyncio.Queue(max(0, queue_size))
+		self.processed = 0
+		self.busy = 0.0
+		self.max_depth = 0
+		self._depth_total = 0
+		self._depth_samples = 0
+
+	async def put(self, item):
+		await self.queue.put(item)
+		depth = self.queue.qsize()
+		self.max_depth = max(self.max_depth, depth)
+		self._depth_total += depth
+		self._depth_samples += 1
+
+	@property
+	def mean_depth(self) -> float:
+		return self._depth_total / self._depth_samples if self._depth_samples else 0.0
+
+	def utilization(self, elapsed: float) -> float:
+		return self.busy / (self.workers * elapsed) if elapsed > 0 else 0.0
+
+
+class Pipeline:
+	def __init__(self, stages: list[Stage]):
+		self.stages = stages
+		self.elapsed = 0.0
+
+	async def _work(self, index: int):
+		stage = self.stages[index]
+		following = self.stages[index + 1] if index + 1 < len(self.stages) else None
+		while True:
+			item = await stage.queue.get()
+			started = time.perf_counter()
+			try:
+				item = await stage.handler(item)
+			except Exception as e:
+				print(f'[WARNING] Pipeline stage {stage.name} failed: {e}')
+				item = None
+			finally:
+				stage.busy += time.perf_counter() - started
+				stage.processed += 1
+			try:
+				if following and item is not None:
+					await following.put(item)
+			finally:
+				stage.queue.task_done()
+
+	async def run(self, items):
+		"""依次送入所有条目，等待全部阶段处理完成"""
+		started = time.perf_counter()
+		workers = [
+			asyncio.create_task(self._work(index))
+			for index, stage in enumerate(self.stages)
+			for _ in range(stage.workers)
+		]
+		try:
+			for item in items:
+				await self.stages[0].put(item)
+			# 前一阶段的队列清空后，它产生的条目都已进入下一阶段的队列
+			for stage in self.stages:
+				await stage.queue.join()
+		finally:
+			for worker in workers:
+				worker.cancel()
+			await asyncio.gather(*workers, return_exceptions=True)
+			self.elapsed = time.perf_counter() - started
+
+	def report_lines(self) -> list[str]:
+		return [
+			f'[PIPELINE] {stage.name}: {stage.workers} workers, {stage.processed} accounts, '
+			f'utilization {stage.utilization(self.elapsed):.0%}, '
+			f'queue depth max {stage.max_depth}, mean {stage.mean_depth:.1f}'
+			for stage in self.stages
+		]
@@ -0,0 +1,179 @@
+"""
+运行性能分析
+
+通过 --profile 参数或 ANYROUTER_PROFILE=1 开启，开启后：
+- 使用 cProfile 记录整个运行，输出 profile.pstats
+- 在各阶段边界记录 tracemalloc 快照，汇总分配最多的代码位置
+- 后台采样 asyncio 事件循环延迟
+- 记录各阶段协程耗时，列出最慢的部分
+
+结果写入 ANYROUTER_PROFILE_DIR（默认 profiles/<时间>-<pid>）下的 summary.txt。
+未开启时 mark() 和 span() 不做任何事。
+"""
+
+import asyncio
+import io
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+	import tracemalloc
+
+_active = None
+
+
+def profiling_requested(argv=None) -> bool:
+	argv = sys.argv[1:] if argv is None else argv
+	return '--profile' in argv or os.getenv('ANYROUTER_PROFILE', '').lower() in ('1', 'true', 'yes')
+
+
+def default_output_dir() -> Path:
+	base = os.getenv('ANYROUTER_PROFILE_DIR')
+	if base:
+		return Path(base)
+	return Path('profiles') / f'{datetime.now().strftime("%Y%m%d-%H%M%S")}-{os.getpid()}'
+
+
+class RunProfiler:
+	def __init__(self, output_dir=None, lag_interval: float = 0.05, top: int = 15):
+		self.output_dir = Path(output_dir) if output_dir else default_output_dir()
+		self.lag_interval = lag_interval
+		self.top = top
+		# 分析相关的标准库只在开启性能分析时导入
+		import cProfile
+
+		self.profile = cProfile.Profile()
+		self.snapshots: list[tuple[str, float, 'tracemalloc.Snapshot']] = []
+		self.spans: list[tuple[str, float]] = []
+		self.lags: list[float] = []
+		self._lag_task = None
+		self._started_at = None
+
+	def start(self):
+		global _active
+		_active = self
+		self._started_at = time.perf_counter()
+		import tracemalloc
+
+		tracemalloc.start(10)
+		self.mark('start')
+		self.profile.enable()
+
+	def mark(self, phase: str):
+		"""在阶段边界记录内存快照"""
+		import tracemalloc
+
+		if tracemalloc.is_tracing():
+			self.snapshots.append((phase, time.perf_counter(), tracemalloc.take_snapshot()))
+
+	@asynccontextmanager
+	async def span(self, name: str):
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.spans.append((name, time.perf_counter() - start))
+
+	async def _sample_lag(self):
+		loop = asyncio.get_running_loop()
+		while True:
+			expected = loop.time() + self.lag_interval
+			await asyncio.sleep(self.lag_interval)
+			self.lags.append(max(0.0, loop.time() - expected))
+
+	def start_lag_sampler(self):
+		"""在事件循环中启动延迟采样任务，需在 asyncio.run 内调用"""
+		if self._lag_task is None:
+			self._lag_task = asyncio.get_running_loop().create_task(self._sample_lag())
+
+	def stop_lag_sampler(self):
+		if self._lag_task is not None:
+			self._lag_task.cancel()
+			self._lag_task = None
+
+	def stop(self) -> Path:
+		"""停止分析并写出结果，返回输出目录"""
+		global _active
+		self.profile.disable()
+		self.mark('end')
+		import tracemalloc
+
+		tracemalloc.stop()
+		_active = None
+
+		self.output_dir.mkdir(parents=True, exist_ok=True)
+		self.profile.dump_stats(self.output_dir / 'profile.pstats')
+		summary = self.summary()
+		(self.output_dir / 'summary.txt').write_text(summary, encoding='utf-8')
+		print(f'[PROFILE] Profile written to {self.output_dir}')
+		return self.output_dir
+
+	def summary(self) -> str:
+		import pstats
+		import statistics
+
+		elapsed = time.perf_counter() - self._started_at if self._started_at else 0
+		lines = [f'Total wall time: {elapsed:.3f}s', '']
+
+		lines.append('== Phases ==')
+		for phase, at, snapshot in self.snapshots:
+			traced = sum(stat.size for stat in snapshot.statistics('filename'))
+			lines.append(f'{phase:<24} +{at - self._started_at:8.3f}s  traced {traced / 1024:10.1f} KiB')
+
+		if len(self.snapshots) >= 2:
+			lines += ['', f'== Top allocators ({self.snapshots[0][0]} -> {self.snapshots[-1][0]}) ==']
+			diff = self.snapshots[-1][2].compare_to(self.snapshots[0][2], 'lineno')
+			for stat in diff[: self.top]:
+				lines.append(str(stat))
+
+		lines += ['', '== Slowest coroutines ==']
+		for name, duration in sorted(self.spans, key=lambda s: s[1], reverse=True)[: self.top]:
+			lines.append(f'{duration:8.3f}s  {name}')
+
+		lines += ['', '== Event loop lag ==']
+		if self.lags:
+			ordered = sorted(self.lags)
+			p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+			lines.append(
+				f'samples {len(ordered)}, mean {statistics.mean(ordered) * 1000:.1f}ms, '
+				f'p95 {p95 * 1000:.1f}ms, max {ordered[-1] * 1000:.1f}ms'
+			)
+		else:
+			lines.append('no samples')
+
+		lines += ['', '== Top functions by cumulative time ==']
+		stream = io.StringIO()
+		pstats.Stats(self.profile, stream=stream).sort_stats('cumulative').print_stats(self.top)
+		lines.append(stream.getvalue())
+		return '\n'.join(lines)
+
+
+def mark(phase: str):
+	"""记录阶段边界，未开启性能分析时不做任何事"""
+	if _active is not None:
+		_active.mark(phase)
+
+
+@asynccontextmanager
+async def span(name: str):
+	"""记录代码块耗时，未开启性能分析时不做任何事"""
+	if _active is None:
+		yield
+		return
+	async with _active.span(name):
+		yield
+
+
+def start_lag_sampler():
+	if _active is not None:
+		_active.start_lag_sampler()
+
+
+def stop_lag_sampler():
+	if _active is not None:
+		_active.stop_lag_sampler()
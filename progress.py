@@ -0,0 +1,122 @@
+"""
+运行进度通知
+
+账号很多的运行可能持续几十分钟，开启后每完成 ANYROUTER_PROGRESS_EVERY 个账号或每隔
+ANYROUTER_PROGRESS_INTERVAL 秒，通过已配置的通知通道发送一次进度。发送在后台线程中进行，
+不会阻塞签到；运行结束时仍然发送完整的汇总通知。
+
+防刷屏规则：两次进度通知至少间隔 ANYROUTER_PROGRESS_MIN_INTERVAL 秒（期间完成的账号合并到
+下一条），一次运行最多发送 ANYROUTER_PROGRESS_MAX 条进度通知。
+"""
+
+import asyncio
+import os
+import time
+
+
+class ProgressReporter:
+	def __init__(
+		self,
+		notifier,
+		total: int,
+		every: int = 0,
+		interval: float = 0,
+		min_interval: float = 60,
+		max_messages: int = 10,
+		clock=time.monotonic,
+		title: str = 'AnyRouter Check-in Progress',
+	):
+		self.notifier = notifier
+		self.title = title
+		self.total = total
+		self.every = every
+		self.interval = interval
+		self.min_interval = min_interval
+		self.max_messages = max_messages
+		self.clock = clock
+		self.done = 0
+		self.succeeded = 0
+		self.sent = 0
+		self._batch: list[str] = []
+		self._last_flush = clock()
+		self._last_sent = None
+		self._wake = asyncio.Event()
+		self._sending = False
+		self._closed = False
+		self._task = None
+
+	@classmethod
+	def from_env(cls, notifier, total: int, title: str = 'AnyRouter Check-in Progress'):
+		"""未设置 ANYROUTER_PROGRESS_EVERY 和 ANYROUTER_PROGRESS_INTERVAL 时返回 None"""
+		every = int(os.getenv('ANYROUTER_PROGRESS_EVERY', '0'))
+		interval = float(os.getenv('ANYROUTER_PROGRESS_INTERVAL', '0'))
+		if every <= 0 and interval <= 0:
+			return None
+		return cls(
+			notifier,
+			total,
+			every=max(0, every),
+			interval=max(0.0, interval),
+			min_interval=float(os.getenv('ANYROUTER_PROGRESS_MIN_INTERVAL', '60')),
+			max_messages=int(os.getenv('ANYROUTER_PROGRESS_MAX', '10')),
+			title=title,
+		)
+
+	def start(self):
+		self._task = asyncio.create_task(self._run())
+
+	def add(self, status: str, line: str):
+		"""记录一个完成的账号，立即返回"""
+		self.done += 1
+		if status == 'success':
+			self.succeeded += 1
+		self._batch.append(line)
+		if self.every and len(self._batch) >= self.every:
+			self._wake.set()
+
+	async def close(self):
+		"""停止发送进度；正在发送的通知会等待完成，未发送的批次由最终汇总覆盖"""
+		self._closed = True
+		if self._task is None:
+			return
+		if not self._sending:
+			self._task.cancel()
+		await asyncio.gather(self._task, return_exceptions=True)
+
+	def _due(self) -> bool:
+		if not self._batch:
+			return False
+		if self.every and len(self._batch) >= self.every:
+			return True
+		return bool(self.interval) and self.clock() - self._last_flush >= self.interval
+
+	async def _run(self):
+		while not self._closed:
+			try:
+				await asyncio.wait_for(self._wake.wait(), self.interval or None)
+			except TimeoutError:
+				pass
+			self._wake.clear()
+			if not self._due():
+				continue
+			if self.sent >= self.max_messages:
+				# 已达上限，之后的结果只在最终汇总中出现
+				self._batch.clear()
+				continue
+
+			if self._last_sent is not None:
+				wait = self.min_interval - (self.clock() - self._last_sent)
+				if wait > 0:
+					await asyncio.sleep(wait)
+
+			lines, self._batch = self._batch, []
+			self._last_flush = self._last_sent = self.clock()
+			self.sent += 1
+			header = f'[PROGRESS] {self.done}/{self.total} accounts done, {self.succeeded} successful'
+			self._sending = True
+			try:
+				await asyncio.to_thread(self.notifier.push_message, self.title, '\n'.join([header, *lines]), 'text')
+			except Exception as e:
+				print(f'[WARNING] Failed to send progress notification: {e}')
+			finally:
+				self._sending = False
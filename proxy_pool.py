@@ -0,0 +1,98 @@
+"""
+代理池
+
+ANYROUTER_PROXIES 配置代理列表（逗号或换行分隔，支持 http://、https://、socks5://），
+账号可通过 proxy 字段固定使用某个代理，未固定的账号轮流使用健康的代理。
+每个代理记录延迟（指数移动平均）和连续失败次数，连续失败达到阈值后被移出轮换。
+"""
+
+import os
+from urllib.parse import urlsplit
+
+
+class Proxy:
+	def __init__(self, url: str):
+		self.url = url
+		self.latency: float | None = None
+		self.failures = 0
+		self.successes = 0
+		self.total_failures = 0
+		self.evicted = False
+
+	@property
+	def label(self) -> str:
+		"""去掉认证信息的代理地址，用于日志"""
+		parts = urlsplit(self.url)
+		return f'{parts.scheme}://{parts.hostname}:{parts.port}' if parts.port else f'{parts.scheme}://{parts.hostname}'
+
+	def score(self) -> float:
+		"""越小越好：平均延迟乘以失败惩罚"""
+		return (self.latency or 1.0) * (1 + self.failures)
+
+	def playwright_proxy(self) -> dict:
+		"""转换为 Playwright launch 的 proxy 参数"""
+		parts = urlsplit(self.url)
+		server = f'{parts.scheme}://{parts.hostname}'
+		if parts.port:
+			server += f':{parts.port}'
+		proxy = {'server': server}
+		if parts.username:
+			proxy['username'] = parts.username
+			proxy['password'] = parts.password or ''
+		return proxy
+
+
+class ProxyPool:
+	def __init__(self, urls, max_failures: int = 3, alpha: float = 0.3):
+		self.proxies: dict[str, Proxy] = {url: Proxy(url) for url in urls}
+		# 账号固定的私人代理单独记录，不参与轮换，也不会分给其他账号
+		self.pinned: dict[str, Proxy] = {}
+		self.max_failures = max(1, max_failures)
+		self.alpha = alpha
+		self._cursor = 0
+
+	@classmethod
+	def from_env(cls):
+		"""从 ANYROUTER_PROXIES 创建代理池，未配置时返回 None"""
+		value = os.getenv('ANYROUTER_PROXIES', '')
+		urls = [url.strip() for url in value.replace('\n', ',').split(',') if url.strip()]
+		if not urls:
+			return None
+		return cls(urls, max_failures=int(os.getenv('ANYROUTER_PROXY_MAX_FAILURES', '3')))
+
+	def healthy(self) -> list[Proxy]:
+		return [proxy for proxy in self.proxies.values() if not proxy.evicted]
+
+	def choose(self, pinned: str | None = None) -> Proxy | None:
+		"""选择代理：固定代理直接使用，否则在健康代理中轮换；全部被移除时返回 None 直连"""
+		if pinned:
+			return self.proxies.get(pinned) or self.pinned.setdefault(pinned, Proxy(pinned))
+
+		candidates = self.healthy()
+		if not candidates:
+			return None
+		proxy = candidates[self._cursor % len(candidates)]
+		self._cursor += 1
+		return proxy
+
+	def record_success(self, proxy: Proxy, latency: float):
+		proxy.failures = 0
+		proxy.successes += 1
+		proxy.latency = latency if proxy.latency is None else self.alpha * latency + (1 - self.alpha) * proxy.latency
+
+	def record_failure(self, proxy: Proxy, error: str = ''):
+		proxy.failures += 1
+		proxy.total_failures += 1
+		if not proxy.evicted and proxy.failures >= self.max_failures:
+			proxy.evicted = True
+			print(f'[PROXY] {proxy.label} evicted after {proxy.failures} consecutive failures: {error[:80]}')
+
+	def report_lines(self) -> list[str]:
+		lines = []
+		for proxy in sorted(self.proxies.values(), key=Proxy.score):
+			latency = f'{proxy.latency * 1000:.0f}ms' if proxy.latency is not None else 'n/a'
+			status = 'evicted' if proxy.evicted else 'healthy'
+			lines.append(
+				f'[PROXY] {proxy.label}: {status}, latency {latency}, ok {proxy.successes}, failed {proxy.total_failures}'
+			)
+		return lines
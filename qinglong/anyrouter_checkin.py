@@ -7,11 +7,17 @@ AnyRouter.top 自动签到青龙脚本
 import asyncio
 import json
 import os
+import shutil
+import signal
 import sys
+import time
 from datetime import datetime
 
-import httpx
-from playwright.async_api import async_playwright
+try:
+    # 可选：将仓库根目录的 profiling.py 放在脚本同目录下即可开启性能分析
+    import profiling
+except ImportError:
+    profiling = None
 
 
 def ql_log(level, message):
@@ -20,6 +26,51 @@ def ql_log(level, message):
     print(f"[{timestamp}] [{level}] {message}")
 
 
+def env_seconds(name, default):
+    """读取秒数配置，0 或负数表示不限制"""
+    value = os.getenv(name)
+    if not value:
+        return default
+    seconds = float(value)
+    return seconds if seconds > 0 else None
+
+
+class RunDeadline:
+    """运行截止时间，预留发送通知的时间，避免被青龙超时杀掉后收不到任何通知"""
+
+    def __init__(self):
+        total = env_seconds('ANYROUTER_RUN_TIMEOUT', None)
+        reserve = env_seconds('ANYROUTER_NOTIFY_RESERVE', 60) or 0
+        self.deadline = time.monotonic() + max(0.0, total - reserve) if total else None
+        self.account_timeout = env_seconds('ANYROUTER_ACCOUNT_TIMEOUT', 240)
+        self.waf_timeout = env_seconds('ANYROUTER_WAF_TIMEOUT', 120)
+        self.http_timeout = env_seconds('ANYROUTER_HTTP_TIMEOUT', 60)
+        self.current_task = None
+
+    def remaining(self):
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self):
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def budget(self, cap):
+        """返回不超过剩余时间的预算"""
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        return remaining if cap is None else min(cap, remaining)
+
+    def expire_now(self):
+        """收到 SIGTERM 时立即到期，并取消正在处理的账号"""
+        ql_log('WARNING', 'Received SIGTERM, stopping and sending partial results')
+        self.deadline = time.monotonic()
+        if self.current_task and not self.current_task.done():
+            self.current_task.cancel()
+
+
 def load_accounts():
     """从环境变量加载多账号配置"""
     accounts_str = os.getenv('ANYROUTER_ACCOUNTS')
@@ -65,37 +116,169 @@ def parse_cookies(cookies_data):
     return {}
 
 
+LAUNCH_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-dev-shm-usage',
+    '--disable-web-security',
+    '--disable-features=VizDisplayCompositor',
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-gpu',
+    '--disable-extensions',
+    '--disable-background-timer-throttling',
+    '--disable-renderer-backgrounding',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-ipc-flooding-protection',
+    '--memory-pressure-off'
+]
+
+CONTEXT_OPTIONS = {
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36',
+    'viewport': {'width': 1920, 'height': 1080},
+}
+
+ENGINES = ('chromium', 'firefox', 'webkit')
+
+
+def browser_engine():
+    """ANYROUTER_BROWSER_ENGINE 选择浏览器内核，默认 chromium"""
+    engine = os.getenv('ANYROUTER_BROWSER_ENGINE', '').strip().lower() or 'chromium'
+    if engine not in ENGINES:
+        ql_log('WARNING', f'Unknown ANYROUTER_BROWSER_ENGINE value {engine!r}, falling back to chromium')
+        return 'chromium'
+    return engine
+
+
+def engine_options(engine):
+    """启动参数和 Chrome 的 User-Agent 只用于 Chromium"""
+    if engine == 'chromium':
+        return {'args': LAUNCH_ARGS}, CONTEXT_OPTIONS
+    return {}, {'viewport': CONTEXT_OPTIONS['viewport']}
+
+
+# 本次运行中外部浏览器是否连接失败过，失败后直接本地启动
+_endpoint_unreachable = False
+
+
+async def open_browser(p, engine):
+    """连接 ANYROUTER_BROWSER_ENDPOINT 指定的常驻浏览器，未配置或无法连接时在本地启动
+
+    返回 (浏览器, 是否为外部浏览器)。地址为 http(s):// 或带 /devtools/ 路径时使用 CDP 连接，
+    其他 WebSocket 地址视为 Playwright 浏览器服务，可以用 ANYROUTER_BROWSER_PROTOCOL 指定。
+    """
+    global _endpoint_unreachable
+    endpoint = os.getenv('ANYROUTER_BROWSER_ENDPOINT', '').strip()
+    if endpoint and not _endpoint_unreachable:
+        protocol = os.getenv('ANYROUTER_BROWSER_PROTOCOL', '').strip().lower()
+        if protocol not in ('cdp', 'playwright'):
+            is_cdp = endpoint.startswith(('http://', 'https://')) or '/devtools/' in endpoint
+            protocol = 'cdp' if is_cdp else 'playwright'
+        timeout = (env_seconds('ANYROUTER_BROWSER_CONNECT_TIMEOUT', 5) or 5) * 1000
+        try:
+            if protocol == 'cdp':
+                browser = await p.chromium.connect_over_cdp(endpoint, timeout=timeout)
+            else:
+                browser = await getattr(p, engine).connect(endpoint, timeout=timeout)
+            ql_log('INFO', f'Connected to browser endpoint ({protocol})')
+            return browser, True
+        except Exception as e:
+            _endpoint_unreachable = True
+            ql_log('WARNING', f'Unable to connect to browser endpoint ({protocol}): {e}, launching a local browser')
+
+    # 青龙环境下使用headless模式
+    launch_options, _ = engine_options(engine)
+    browser = await getattr(p, engine).launch(headless=True, **launch_options)
+    return browser, False
+
+
+def browser_profile():
+    """ANYROUTER_BROWSER_PROFILE 开启持久化配置目录，设为 1 或 true 时使用脚本目录下的 .ql_browser_profile"""
+    value = os.getenv('ANYROUTER_BROWSER_PROFILE', '').strip()
+    if not value or value.lower() in ('0', 'false'):
+        return None
+    if value.lower() in ('1', 'true'):
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), '.ql_browser_profile')
+    return value
+
+
+def profile_max_bytes():
+    return int(float(os.getenv('ANYROUTER_BROWSER_PROFILE_MAX_MB', '200')) * 1024 * 1024)
+
+
+def trim_profile(profile):
+    """配置目录超过大小上限时整个删除，下次运行重新建立缓存"""
+    total = 0
+    for dirpath, _, filenames in os.walk(profile):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                continue
+    max_bytes = profile_max_bytes()
+    if total > max_bytes:
+        shutil.rmtree(profile, ignore_errors=True)
+        ql_log('INFO', f'Browser profile {total / 1024 / 1024:.0f} MB exceeds {max_bytes / 1024 / 1024:.0f} MB, removed')
+
+
+async def open_context(p):
+    """打开获取 WAF cookies 用的上下文，返回 (上下文, 关闭函数)
+
+    未连接外部浏览器且开启了持久化配置时，登录页的 JS 和挑战脚本保存在磁盘缓存中供下次运行复用，
+    cookies 在使用前后清空，不会带到其他账号。
+    """
+    engine = browser_engine()
+    launch_options, context_options = engine_options(engine)
+    profile = browser_profile()
+    endpoint = os.getenv('ANYROUTER_BROWSER_ENDPOINT', '').strip()
+    if profile and (not endpoint or _endpoint_unreachable):
+        if engine == 'chromium':
+            launch_options = {'args': LAUNCH_ARGS + [f'--disk-cache-size={profile_max_bytes()}']}
+        else:
+            # 不同内核的配置目录格式不同，不能共用
+            profile = os.path.join(profile, engine)
+        try:
+            context = await getattr(p, engine).launch_persistent_context(
+                profile,
+                headless=True,
+                **launch_options,
+                **context_options,
+            )
+            await context.clear_cookies()
+        except Exception as e:
+            ql_log('WARNING', f'Unable to launch browser with profile {profile}: {e}, using a fresh context')
+        else:
+            async def close_profile():
+                try:
+                    await context.clear_cookies()
+                    await context.close()
+                finally:
+                    trim_profile(profile)
+
+            return context, close_profile
+
+    browser, attached = await open_browser(p, engine)
+    context = await browser.new_context(**(CONTEXT_OPTIONS if browser.browser_type.name == 'chromium' else context_options))
+
+    async def close():
+        # 外部浏览器继续运行，只关闭本次创建的上下文并断开连接
+        if attached:
+            await context.close()
+        await browser.close()
+
+    return context, close
+
+
 async def get_waf_cookies_with_playwright(account_name: str):
     """使用 Playwright 获取 WAF cookies（青龙环境优化版）"""
     ql_log('INFO', f'{account_name}: Starting browser to get WAF cookies...')
 
+    # 延迟导入，只有真正需要浏览器时才加载 Playwright
+    from playwright.async_api import async_playwright
+
     try:
         async with async_playwright() as p:
-            # 青龙环境下使用headless模式
-            browser = await p.chromium.launch(
-                headless=True,
-                args=[
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-dev-shm-usage',
-                    '--disable-web-security',
-                    '--disable-features=VizDisplayCompositor',
-                    '--no-sandbox',
-                    '--disable-setuid-sandbox',
-                    '--disable-gpu',
-                    '--disable-extensions',
-                    '--disable-background-timer-throttling',
-                    '--disable-renderer-backgrounding',
-                    '--disable-backgrounding-occluded-windows',
-                    '--disable-ipc-flooding-protection',
-                    '--memory-pressure-off'
-                ]
-            )
-            
-            context = await browser.new_context(
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36',
-                viewport={'width': 1920, 'height': 1080},
-            )
-            
+            context, close = await open_context(p)
+
             page = await context.new_page()
 
             ql_log('INFO', f'{account_name}: Step 1: Access login page to get initial cookies...')
@@ -121,11 +304,11 @@ async def get_waf_cookies_with_playwright(account_name: str):
 
             if missing_cookies:
                 ql_log('ERROR', f'{account_name}: Missing WAF cookies: {missing_cookies}')
-                await browser.close()
+                await close()
                 return None
 
             ql_log('SUCCESS', f'{account_name}: Successfully got all WAF cookies')
-            await browser.close()
+            await close()
             return waf_cookies
 
     except Exception as e:
@@ -133,10 +316,10 @@ async def get_waf_cookies_with_playwright(account_name: str):
         return None
 
 
-def get_user_info(client, headers):
+async def get_user_info(client, headers):
     """获取用户信息"""
     try:
-        response = client.get('https://anyrouter.top/api/user/self', headers=headers, timeout=30)
+        response = await client.get('https://anyrouter.top/api/user/self', headers=headers, timeout=30)
 
         if response.status_code == 200:
             data = response.json()
@@ -150,8 +333,9 @@ def get_user_info(client, headers):
     return None
 
 
-async def check_in_account(account_info, account_index):
+async def check_in_account(account_info, account_index, deadline=None):
     """为单个账号执行签到操作"""
+    deadline = deadline or RunDeadline()
     account_name = f'Account {account_index + 1}'
     ql_log('INFO', f'Starting to process {account_name}')
 
@@ -170,77 +354,86 @@ async def check_in_account(account_info, account_index):
         return False, None
 
     # 步骤1：获取 WAF cookies
-    waf_cookies = await get_waf_cookies_with_playwright(account_name)
+    try:
+        async with asyncio.timeout(deadline.budget(deadline.waf_timeout)):
+            waf_cookies = await get_waf_cookies_with_playwright(account_name)
+    except TimeoutError:
+        ql_log('ERROR', f'{account_name}: Timed out while getting WAF cookies')
+        return False, None
     if not waf_cookies:
         ql_log('ERROR', f'{account_name}: Unable to get WAF cookies')
         return False, None
 
     # 步骤2：使用 httpx 进行 API 请求
-    client = httpx.Client(http2=True, timeout=30.0)
-
-    try:
-        # 合并 WAF cookies 和用户 cookies
-        all_cookies = {**waf_cookies, **user_cookies}
-        client.cookies.update(all_cookies)
-
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36',
-            'Accept': 'application/json, text/plain, */*',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br, zstd',
-            'Referer': 'https://anyrouter.top/console',
-            'Origin': 'https://anyrouter.top',
-            'Connection': 'keep-alive',
-            'Sec-Fetch-Dest': 'empty',
-            'Sec-Fetch-Mode': 'cors',
-            'Sec-Fetch-Site': 'same-origin',
-            'new-api-user': api_user,
-        }
-
-        user_info_text = None
-
-        user_info = get_user_info(client, headers)
-        if user_info:
-            ql_log('INFO', f'{account_name}: {user_info}')
-            user_info_text = user_info
-
-        ql_log('INFO', f'{account_name}: Executing check-in')
+    import httpx
 
-        # 更新签到请求头
-        checkin_headers = headers.copy()
-        checkin_headers.update({'Content-Type': 'application/json', 'X-Requested-With': 'XMLHttpRequest'})
-
-        response = client.post('https://anyrouter.top/api/user/sign_in', headers=checkin_headers, timeout=30)
-
-        ql_log('INFO', f'{account_name}: Response status code {response.status_code}')
-
-        if response.status_code == 200:
-            try:
-                result = response.json()
-                if result.get('ret') == 1 or result.get('code') == 0 or result.get('success'):
-                    ql_log('SUCCESS', f'{account_name}: Check-in successful!')
-                    return True, user_info_text
-                else:
-                    error_msg = result.get('msg', result.get('message', 'Unknown error'))
-                    ql_log('ERROR', f'{account_name}: Check-in failed - {error_msg}')
-                    return False, user_info_text
-            except json.JSONDecodeError:
-                # 如果不是 JSON 响应，检查是否包含成功标识
-                if 'success' in response.text.lower():
-                    ql_log('SUCCESS', f'{account_name}: Check-in successful!')
-                    return True, user_info_text
-                else:
-                    ql_log('ERROR', f'{account_name}: Check-in failed - Invalid response format')
-                    return False, user_info_text
-        else:
-            ql_log('ERROR', f'{account_name}: Check-in failed - HTTP {response.status_code}')
-            return False, user_info_text
+    client = httpx.AsyncClient(http2=True, timeout=30.0)
+    user_info_text = None
 
+    try:
+        async with asyncio.timeout(deadline.budget(deadline.http_timeout)):
+            # 合并 WAF cookies 和用户 cookies
+            all_cookies = {**waf_cookies, **user_cookies}
+            client.cookies.update(all_cookies)
+
+            headers = {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36',
+                'Accept': 'application/json, text/plain, */*',
+                'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+                'Accept-Encoding': 'gzip, deflate, br, zstd',
+                'Referer': 'https://anyrouter.top/console',
+                'Origin': 'https://anyrouter.top',
+                'Connection': 'keep-alive',
+                'Sec-Fetch-Dest': 'empty',
+                'Sec-Fetch-Mode': 'cors',
+                'Sec-Fetch-Site': 'same-origin',
+                'new-api-user': api_user,
+            }
+
+            user_info = await get_user_info(client, headers)
+            if user_info:
+                ql_log('INFO', f'{account_name}: {user_info}')
+                user_info_text = user_info
+
+            ql_log('INFO', f'{account_name}: Executing check-in')
+
+            # 更新签到请求头
+            checkin_headers = headers.copy()
+            checkin_headers.update({'Content-Type': 'application/json', 'X-Requested-With': 'XMLHttpRequest'})
+
+            response = await client.post('https://anyrouter.top/api/user/sign_in', headers=checkin_headers, timeout=30)
+
+            ql_log('INFO', f'{account_name}: Response status code {response.status_code}')
+
+            if response.status_code == 200:
+                try:
+                    result = response.json()
+                    if result.get('ret') == 1 or result.get('code') == 0 or result.get('success'):
+                        ql_log('SUCCESS', f'{account_name}: Check-in successful!')
+                        return True, user_info_text
+                    else:
+                        error_msg = result.get('msg', result.get('message', 'Unknown error'))
+                        ql_log('ERROR', f'{account_name}: Check-in failed - {error_msg}')
+                        return False, user_info_text
+                except json.JSONDecodeError:
+                    # 如果不是 JSON 响应，检查是否包含成功标识
+                    if 'success' in response.text.lower():
+                        ql_log('SUCCESS', f'{account_name}: Check-in successful!')
+                        return True, user_info_text
+                    else:
+                        ql_log('ERROR', f'{account_name}: Check-in failed - Invalid response format')
+                        return False, user_info_text
+            else:
+                ql_log('ERROR', f'{account_name}: Check-in failed - HTTP {response.status_code}')
+                return False, user_info_text
+    except TimeoutError:
+        ql_log('ERROR', f'{account_name}: Timed out during check-in requests')
+        return False, user_info_text
     except Exception as e:
         ql_log('ERROR', f'{account_name}: Error occurred during check-in process - {str(e)[:50]}...')
         return False, user_info_text
     finally:
-        client.close()
+        await client.aclose()
 
 
 def send_notification(content):
@@ -260,10 +453,66 @@ def send_notification(content):
         ql_log('ERROR', f'Failed to send notification: {e}')
 
 
+async def acquire_run_lock(started):
+    """同一时间只运行一个签到进程，青龙重试与定时任务重叠时后启动的进程退出或等待
+
+    使用 fcntl.flock，进程退出（包括被杀）时内核自动释放锁，不会残留。成功时返回需要保持打开的锁文件，
+    其他进程正在运行或在等待期间已完成签到时返回 None，不支持 flock 时返回 False。
+    """
+    try:
+        import fcntl
+    except ImportError:
+        # Windows 没有 flock，不做互斥
+        return False
+    path = os.getenv('ANYROUTER_LEASE_FILE') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), '.ql_run.lock'
+    )
+    wait = float(os.getenv('ANYROUTER_LEASE_WAIT', '0'))
+    lock_file = open(path, 'a+')
+    waited = False
+    while True:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            break
+        except BlockingIOError:
+            if time.time() - started >= wait:
+                lock_file.close()
+                ql_log('WARNING', 'Another check-in run is in progress, exiting')
+                return None
+            waited = True
+            await asyncio.sleep(min(5, max(0.1, wait - (time.time() - started))))
+
+    lock_file.seek(0)
+    state = lock_file.read().split()
+    # 等待期间前一个运行已完整结束，不再重复签到
+    if waited and len(state) == 2 and state[0] == 'finished' and float(state[1]) >= started:
+        ql_log('INFO', 'The other check-in run finished while waiting, nothing left to do')
+        lock_file.close()
+        return None
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(f'running {os.getpid()}\n')
+    lock_file.flush()
+    return lock_file
+
+
+def finish_run_lock(lock_file, complete):
+    """记录本次运行是否完整结束，供等待中的进程判断"""
+    if not lock_file:
+        return
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(f'finished {time.time()}\n' if complete else f'stopped {time.time()}\n')
+    lock_file.flush()
+
+
 async def main():
     """主函数"""
+    started = time.time()
     ql_log('INFO', 'AnyRouter.top multi-account auto check-in script started (Qinglong Version)')
     ql_log('INFO', f'Execution time: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
+    if profiling:
+        profiling.start_lag_sampler()
 
     # 加载账号配置
     accounts = load_accounts()
@@ -273,14 +522,37 @@ async def main():
 
     ql_log('INFO', f'Found {len(accounts)} account configurations')
 
+    # 同一时间只运行一个签到进程，避免重复启动浏览器和重复签到
+    lock_file = False
+    if os.getenv('ANYROUTER_LEASE', '1').strip().lower() not in ('0', 'false', 'off'):
+        lock_file = await acquire_run_lock(started)
+        if lock_file is None:
+            sys.exit(0)
+
+    # 运行截止时间，收到 SIGTERM 时立即到期，保证部分结果也能发出通知
+    deadline = RunDeadline()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, deadline.expire_now)
+    except (NotImplementedError, RuntimeError):
+        pass
+
     # 为每个账号执行签到
     success_count = 0
+    skipped_count = 0
     total_count = len(accounts)
     notification_content = []
 
     for i, account in enumerate(accounts):
+        if deadline.expired():
+            skipped_count += 1
+            ql_log('WARNING', f'Account {i + 1}: Run deadline reached, skipped')
+            notification_content.append(f'⏭️ SKIP Account {i + 1} skipped (deadline)')
+            continue
+
         try:
-            success, user_info = await check_in_account(account, i)
+            deadline.current_task = asyncio.ensure_future(check_in_account(account, i, deadline))
+            async with asyncio.timeout(deadline.budget(deadline.account_timeout)):
+                success, user_info = await deadline.current_task
             if success:
                 success_count += 1
             # 收集通知内容
@@ -289,6 +561,13 @@ async def main():
             if user_info:
                 account_result += f'\n{user_info}'
             notification_content.append(account_result)
+        except (TimeoutError, asyncio.CancelledError) as e:
+            # 只吞掉截止时间触发的取消，其他取消继续向上抛出
+            if isinstance(e, asyncio.CancelledError) and not deadline.expired():
+                raise
+            reason = 'run deadline reached' if deadline.expired() else 'account time budget exceeded'
+            ql_log('ERROR', f'Account {i + 1}: Timed out, {reason}')
+            notification_content.append(f'❌ FAIL Account {i + 1} timed out ({reason})')
         except Exception as e:
             ql_log('ERROR', f'Account {i + 1} processing exception: {e}')
             notification_content.append(f'❌ FAIL Account {i + 1} exception: {str(e)[:50]}...')
@@ -297,8 +576,10 @@ async def main():
     summary = [
         '📊 Check-in result statistics:',
         f'✅ Success: {success_count}/{total_count}',
-        f'❌ Failed: {total_count - success_count}/{total_count}',
+        f'❌ Failed: {total_count - success_count - skipped_count}/{total_count}',
     ]
+    if skipped_count:
+        summary.append(f'⏭️ Skipped (deadline): {skipped_count}/{total_count}')
 
     if success_count == total_count:
         summary.append('🎉 All accounts check-in successful!')
@@ -314,8 +595,15 @@ async def main():
 
     notify_content = '\n\n'.join([time_info, '\n'.join(notification_content), '\n'.join(summary)])
 
+    if profiling:
+        profiling.mark('checkins_done')
+
     # 发送通知
     send_notification(notify_content)
+    finish_run_lock(lock_file, skipped_count == 0)
+    if profiling:
+        profiling.stop_lag_sampler()
+        profiling.mark('notified')
 
     # 设置退出码
     sys.exit(0 if success_count > 0 else 1)
@@ -323,6 +611,14 @@ async def main():
 
 def run_main():
     """运行主函数的包装函数"""
+    profiler = None
+    if '--profile' in sys.argv or os.getenv('ANYROUTER_PROFILE', '').lower() in ('1', 'true', 'yes'):
+        if profiling:
+            profiler = profiling.RunProfiler()
+            profiler.start()
+        else:
+            ql_log('WARNING', 'profiling.py not found next to the script, profiling disabled')
+
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -331,6 +627,9 @@ def run_main():
     except Exception as e:
         ql_log('ERROR', f'Error occurred during program execution: {e}')
         sys.exit(1)
+    finally:
+        if profiler:
+            profiler.stop()
 
 
 if __name__ == '__main__':
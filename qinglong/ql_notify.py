@@ -3,7 +3,9 @@
 支持青龙面板常用的通知方式
 """
 
+import json
 import os
+import time
 from datetime import datetime
 import httpx
 
@@ -14,6 +16,72 @@ def ql_log(level, message):
     print(f"[{timestamp}] [{level}] {message}")
 
 
+class ChannelBreaker:
+    """通知通道熔断器，状态保存在脚本目录下，跨运行生效"""
+
+    def __init__(self, path, failure_threshold=3, cooldown=6 * 3600):
+        self.path = path
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.transitions = []
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.channels = json.load(f)
+        except (OSError, ValueError):
+            self.channels = {}
+
+    def _channel(self, name):
+        return self.channels.setdefault(name, {'state': 'closed', 'failures': 0, 'opened_at': None})
+
+    def _transition(self, name, channel, new_state, reason):
+        if channel['state'] == new_state:
+            return
+        message = f"{name}: {channel['state']} -> {new_state} ({reason})"
+        channel['state'] = new_state
+        self.transitions.append(message)
+        ql_log('WARNING', f'熔断状态变化 {message}')
+
+    def allow(self, name):
+        """熔断中返回 False，冷却结束后转为半开放行一次探测"""
+        channel = self._channel(name)
+        if channel['state'] != 'open':
+            return True
+        if time.time() - (channel['opened_at'] or 0) >= self.cooldown:
+            self._transition(name, channel, 'half_open', '冷却结束，探测中')
+            return True
+        return False
+
+    def record(self, name, success):
+        channel = self._channel(name)
+        if success:
+            channel['failures'] = 0
+            self._transition(name, channel, 'closed', '探测成功')
+            return
+        channel['failures'] += 1
+        if channel['state'] == 'half_open' or channel['failures'] >= self.failure_threshold:
+            channel['opened_at'] = time.time()
+            self._transition(name, channel, 'open', f"连续失败 {channel['failures']} 次")
+
+    def report_lines(self):
+        lines = []
+        for name, channel in self.channels.items():
+            if channel['state'] == 'open':
+                retry_at = datetime.fromtimestamp(channel['opened_at'] + self.cooldown).strftime("%Y-%m-%d %H:%M:%S")
+                lines.append(f"🔌 {name}: 已熔断（连续失败 {channel['failures']} 次），下次探测 {retry_at}")
+            elif channel['state'] == 'half_open':
+                lines.append(f"🔌 {name}: 半开探测中")
+        return lines
+
+    def save(self):
+        try:
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.channels, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            ql_log('ERROR', f'熔断状态保存失败: {e}')
+
+
 class QinglongNotifier:
     """青龙专用通知器"""
     
@@ -31,6 +99,13 @@ class QinglongNotifier:
         # Telegram通知
         self.telegram_bot_token = os.getenv('TG_BOT_TOKEN')
         self.telegram_user_id = os.getenv('TG_USER_ID')
+        # 通道熔断器
+        self.breaker = ChannelBreaker(
+            os.getenv('QL_NOTIFY_BREAKER_FILE')
+            or os.path.join(os.path.dirname(os.path.abspath(__file__)), '.ql_notify_breaker.json'),
+            failure_threshold=int(os.getenv('NOTIFY_BREAKER_THRESHOLD', '3')),
+            cooldown=float(os.getenv('NOTIFY_BREAKER_COOLDOWN', str(6 * 3600))),
+        )
 
     def send_wecom(self, title: str, content: str):
         """发送企业微信通知"""
@@ -171,19 +246,33 @@ class QinglongNotifier:
         success_count = 0
         total_configured = 0
 
+        # 熔断中的通道直接跳过，避免每次运行都等满超时
+        allowed = {name: self.breaker.allow(name) for name, _ in notifications}
+        breaker_lines = self.breaker.report_lines()
+        if breaker_lines:
+            content = content + "\n\n" + "\n".join(breaker_lines)
+
         for name, send_func in notifications:
+            if not allowed[name]:
+                total_configured += 1
+                ql_log('WARNING', f'{name}: 通道已熔断，跳过发送')
+                continue
             try:
                 success, message = send_func(title, content)
-                if "未配置" not in message:
+                if "未配置" not in message and "配置不完整" not in message:
                     total_configured += 1
+                    self.breaker.record(name, success)
                     if success:
                         success_count += 1
                         ql_log('SUCCESS', f'{name}: {message}')
                     else:
                         ql_log('ERROR', f'{name}: {message}')
             except Exception as e:
+                self.breaker.record(name, False)
                 ql_log('ERROR', f'{name}: 发送异常 - {e}')
 
+        self.breaker.save()
+
         if total_configured == 0:
             ql_log('WARNING', '未配置任何通知方式，仅控制台输出')
             print("\n" + "="*60)
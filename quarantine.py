@@ -0,0 +1,124 @@
+"""
+长期失败账号的隔离
+
+每个账号的健康状态保存在状态目录的 account_health.json 中：健康分（成功率的指数移动平均）、
+连续失败次数和最近一次失败类别。同一类别连续失败 ANYROUTER_QUARANTINE_AFTER 次后隔离该账号，
+之后的运行直接跳过，只按指数退避的间隔（ANYROUTER_QUARANTINE_PROBE 起，每次探测失败翻倍，
+最长 ANYROUTER_QUARANTINE_MAX_PROBE）放行一次探测，探测成功即解除隔离。
+
+WAF、网络和截止时间这类站点或运行环境的问题不计入连续失败。账号的 cookies 等配置变化后
+（例如更新了 session）隔离立即解除。
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from results import Failure
+from state import load_json, save_json, state_path
+
+# 不针对单个账号的失败类别
+IGNORED_CATEGORIES = {Failure.WAF, Failure.NETWORK, Failure.DEADLINE}
+
+
+def account_fingerprint(account_info: dict) -> str:
+	return hashlib.sha1(json.dumps(account_info, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+class AccountQuarantine:
+	def __init__(
+		self,
+		path=None,
+		threshold: int = 5,
+		probe_interval: float = 2 * 86400,
+		max_probe_interval: float = 30 * 86400,
+		clock=time.time,
+	):
+		self.path = path
+		self.threshold = threshold
+		self.probe_interval = probe_interval
+		self.max_probe_interval = max_probe_interval
+		self.clock = clock
+		self.accounts: dict[str, dict] = (load_json(path, {}) or {}) if path else {}
+		self.transitions: list[str] = []
+
+	@classmethod
+	def from_env(cls):
+		"""ANYROUTER_QUARANTINE_AFTER 设为 0 时关闭隔离，ANYROUTER_QUARANTINE_FILE 设为空时不保存状态"""
+		path = os.getenv('ANYROUTER_QUARANTINE_FILE')
+		if path is None:
+			path = state_path('account_health.json')
+		return cls(
+			path or None,
+			threshold=int(os.getenv('ANYROUTER_QUARANTINE_AFTER', '5')),
+			probe_interval=float(os.getenv('ANYROUTER_QUARANTINE_PROBE', str(2 * 86400))),
+			max_probe_interval=float(os.getenv('ANYROUTER_QUARANTINE_MAX_PROBE', str(30 * 86400))),
+		)
+
+	def _entry(self, key: str, account_info: dict) -> dict:
+		fingerprint = account_fingerprint(account_info)
+		entry = self.accounts.get(key)
+		if entry is None or entry.get('fingerprint') != fingerprint:
+			# 新账号或配置已变化，重新开始统计
+			entry = {
+				'fingerprint': fingerprint,
+				'score': 1.0,
+				'streak': 0,
+				'category': None,
+				'last_error': None,
+				'quarantined_at': None,
+				'probes': 0,
+				'next_probe': None,
+			}
+			self.accounts[key] = entry
+		return entry
+
+	def check(self, key: str, account_info: dict) -> dict | None:
+		"""账号处于隔离期时返回其健康记录，到了探测时间或未隔离时返回 None"""
+		if self.threshold <= 0:
+			return None
+		entry = self._entry(key, account_info)
+		if entry['quarantined_at'] is None or self.clock() >= entry['next_probe']:
+			return None
+		return entry
+
+	def record(self, key: str, account_info: dict, name: str, success: bool, category: str = '', error: str = ''):
+		entry = self._entry(key, account_info)
+		entry['score'] = round(entry['score'] + 0.3 * ((1.0 if success else 0.0) - entry['score']), 4)
+		if success:
+			if entry['quarantined_at'] is not None:
+				self.transitions.append(f'[QUARANTINE] {name}: probe succeeded, released')
+			entry.update(streak=0, category=None, last_error=None, quarantined_at=None, probes=0, next_probe=None)
+			return
+		if category in IGNORED_CATEGORIES:
+			return
+
+		entry['streak'] = entry['streak'] + 1 if category == entry['category'] else 1
+		entry['category'] = category
+		entry['last_error'] = error[:100] if error else None
+		now = self.clock()
+		if entry['quarantined_at'] is not None:
+			# 探测失败，下一次探测的间隔翻倍
+			entry['probes'] += 1
+			entry['next_probe'] = now + self.backoff(entry['probes'])
+		elif self.threshold > 0 and entry['streak'] >= self.threshold:
+			entry.update(quarantined_at=now, probes=0, next_probe=now + self.backoff(0))
+			self.transitions.append(
+				f'[QUARANTINE] {name}: quarantined after {entry["streak"]} consecutive {category} failures'
+			)
+
+	def backoff(self, probes: int) -> float:
+		return min(self.max_probe_interval, self.probe_interval * 2**probes)
+
+	def describe(self, entry: dict) -> str:
+		next_probe = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['next_probe']))
+		return f'{entry["streak"]} consecutive {entry["category"]} failures, next probe at {next_probe}'
+
+	def save(self):
+		if not self.path:
+			return
+		try:
+			save_json(self.path, self.accounts)
+		except OSError as e:
+			print(f'[QUARANTINE] Failed to save account health: {e}')
@@ -0,0 +1,112 @@
+"""
+结构化签到结果导出
+
+设置 ANYROUTER_RESULTS_FILE 后，每个账号完成时立即向文件追加一条记录（NDJSON 或 CSV），
+包含状态、失败类别、各阶段耗时和余额，下游工具可以 tail 实时读取。记录写入后不在内存中保留。
+"""
+
+import csv
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+
+class Failure:
+	"""失败类别"""
+
+	CONFIG = 'config'
+	WAF = 'waf'
+	NETWORK = 'network'
+	TIMEOUT = 'timeout'
+	REJECTED = 'rejected'
+	EXCEPTION = 'exception'
+	DEADLINE = 'deadline'
+	LEASE = 'lease_lost'
+	SESSION = 'session_expired'
+
+
+PHASES = ('waf', 'http', 'total')
+FIELDS = (
+	['finished_at', 'index', 'account', 'site', 'status', 'category', 'error']
+	+ [f'{phase}_ms' for phase in PHASES]
+	+ ['balance', 'used', 'reward']
+)
+
+
+@dataclass
+class AccountResult:
+	index: int
+	account: str
+	site: str = ''
+	status: str = ''
+	category: str = ''
+	error: str = ''
+	timings: dict[str, float] = field(default_factory=dict)
+	balance: float | None = None
+	used: float | None = None
+	reward: float | None = None
+
+	def fail(self, category: str, error: str = ''):
+		"""记录失败类别，已有类别时保留最先发生的原因"""
+		if not self.category:
+			self.category = category
+			self.error = error[:200]
+
+	def add_timing(self, phase: str, seconds: float):
+		self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+	def to_record(self) -> dict:
+		record = {
+			'finished_at': datetime.now().isoformat(timespec='seconds'),
+			'index': self.index,
+			'account': self.account,
+			'site': self.site,
+			'status': self.status,
+			'category': self.category,
+			'error': self.error,
+		}
+		for phase in PHASES:
+			seconds = self.timings.get(phase)
+			record[f'{phase}_ms'] = round(seconds * 1000) if seconds is not None else None
+		record.update({'balance': self.balance, 'used': self.used, 'reward': self.reward})
+		return record
+
+
+class ResultSink:
+	def __init__(self, path, fmt: str | None = None):
+		self.path = Path(path)
+		self.format = (fmt or ('csv' if self.path.suffix.lower() == '.csv' else 'ndjson')).lower()
+		if self.format not in ('csv', 'ndjson'):
+			raise ValueError(f'Unknown result format: {self.format}')
+		self.count = 0
+		self.path.parent.mkdir(parents=True, exist_ok=True)
+		new_file = not self.path.exists() or self.path.stat().st_size == 0
+		self._file = open(self.path, 'a', encoding='utf-8', newline='')
+		self._writer = None
+		if self.format == 'csv':
+			self._writer = csv.DictWriter(self._file, fieldnames=FIELDS)
+			if new_file:
+				self._writer.writeheader()
+
+	@classmethod
+	def from_env(cls):
+		"""ANYROUTER_RESULTS_FILE 未设置时返回 None，格式由 ANYROUTER_RESULTS_FORMAT 或文件后缀决定"""
+		path = os.getenv('ANYROUTER_RESULTS_FILE')
+		if not path:
+			return None
+		return cls(path, os.getenv('ANYROUTER_RESULTS_FORMAT') or None)
+
+	def write(self, result: AccountResult):
+		record = result.to_record()
+		if self._writer:
+			self._writer.writerow({key: '' if value is None else value for key, value in record.items()})
+		else:
+			self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+		self._file.flush()
+		self.count += 1
+
+	def close(self):
+		if not self._file.closed:
+			self._file.close()
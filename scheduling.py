@@ -0,0 +1,86 @@
+"""
+按历史耗时安排账号签到顺序
+
+每个账号完成后记录本次耗时和是否失败（指数移动平均），保存在状态目录的
+account_history.json 中。下次运行时按预计耗时从长到短开始签到（LPT），慢账号不会
+在最后拖长整次运行；没有历史的账号按已知账号耗时的中位数估计。
+
+账号配置中 "priority": true 的账号排在最前面；站点并发大于 1 时还可以通过
+ANYROUTER_PRIORITY_SLOTS 为它们保留并发槽位，不必排在长耗时的普通账号后面。
+"""
+
+import heapq
+import os
+import time
+
+from state import load_json, save_json, state_path
+
+# 预计耗时的比较精度（秒），差别小于它的账号保持配置中的顺序
+RESOLUTION = 0.1
+
+
+def is_priority(account_info: dict) -> bool:
+	return bool(account_info.get('priority'))
+
+
+class AccountHistory:
+	def __init__(self, path=None, alpha: float = 0.3):
+		self.path = path
+		self.alpha = alpha
+		self.entries: dict[str, dict] = (load_json(path, {}) or {}) if path else {}
+
+	@classmethod
+	def from_env(cls):
+		"""ANYROUTER_HISTORY_FILE 默认为状态目录下的 account_history.json，设为空时不保存历史"""
+		path = os.getenv('ANYROUTER_HISTORY_FILE')
+		if path is None:
+			path = state_path('account_history.json')
+		return cls(path or None)
+
+	def record(self, key: str, duration: float, success: bool):
+		entry = self.entries.get(key)
+		failed = 0.0 if success else 1.0
+		if entry is None:
+			entry = {'duration': duration, 'failure_rate': failed, 'runs': 0}
+		else:
+			entry['duration'] += self.alpha * (duration - entry['duration'])
+			entry['failure_rate'] += self.alpha * (failed - entry['failure_rate'])
+		entry['runs'] += 1
+		entry['updated_at'] = time.time()
+		self.entries[key] = entry
+
+	def expected(self, key: str) -> float | None:
+		"""预计耗时，经常失败的账号可能需要重试，按失败率放大"""
+		entry = self.entries.get(key)
+		if entry is None:
+			return None
+		return entry['duration'] * (1 + entry['failure_rate'])
+
+	def save(self):
+		if not self.path:
+			return
+		try:
+			save_json(self.path, self.entries)
+		except OSError as e:
+			print(f'[SCHEDULE] Failed to save account history: {e}')
+
+
+def estimate(history: AccountHistory, keys: list[str]) -> tuple[list[float], int]:
+	"""返回每个账号的预计耗时和有历史的账号数，没有历史的账号取已知耗时的中位数"""
+	known = [history.expected(key) for key in keys]
+	values = [value for value in known if value is not None]
+	default = sorted(values)[len(values) // 2] if values else 0.0
+	return [default if value is None else value for value in known], len(values)
+
+
+def schedule_order(indices: list[int], expected: dict[int, float], priority: set[int]) -> list[int]:
+	"""优先账号在前，同类账号按预计耗时从长到短排列，耗时接近时保持原顺序"""
+	return sorted(indices, key=lambda i: (i not in priority, -round(expected[i] / RESOLUTION)))
+
+
+def predict_makespan(durations: list[float], slots: int) -> float:
+	"""按顺序把账号分配给最先空闲的槽位，返回预计的完成时间"""
+	finish = [0.0] * max(1, slots)
+	for duration in durations:
+		heapq.heappush(finish, heapq.heappop(finish) + duration)
+	return max(finish)
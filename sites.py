@@ -0,0 +1,131 @@
+"""
+多站点支持
+
+账号可以通过 base_url 字段指向其他基于 new-api 的站点（默认 ANYROUTER_BASE_URL 或
+https://anyrouter.top）。账号按站点分组，每个站点有独立的连接池、并发限制和请求速率限制，
+不同站点之间并行处理。
+"""
+
+import asyncio
+import os
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+	import httpx
+
+DEFAULT_BASE_URL = 'https://anyrouter.top'
+
+
+def default_base_url() -> str:
+	return (os.getenv('ANYROUTER_BASE_URL') or DEFAULT_BASE_URL).rstrip('/')
+
+
+def account_base_url(account_info: dict) -> str:
+	"""账号所属站点的地址"""
+	return (account_info.get('base_url') or default_base_url()).rstrip('/')
+
+
+def host_of(base_url: str) -> str:
+	return urlsplit(base_url).netloc
+
+
+class RateLimiter:
+	"""按固定间隔放行请求，rate 为每秒请求数，0 表示不限制"""
+
+	def __init__(self, rate: float = 0):
+		self.interval = 1 / rate if rate > 0 else 0
+		self._next = 0.0
+
+	async def wait(self):
+		if not self.interval:
+			return
+		now = asyncio.get_running_loop().time()
+		delay = self._next - now
+		self._next = max(now, self._next) + self.interval
+		if delay > 0:
+			await asyncio.sleep(delay)
+
+
+class Site:
+	def __init__(self, base_url: str, concurrency: int = 1, rate: float = 0, max_connections: int = 20):
+		self.base_url = base_url
+		self.host = host_of(base_url)
+		self.concurrency = max(1, concurrency)
+		self.semaphore = asyncio.Semaphore(self.concurrency)
+		self.priority_semaphore = None
+		self.reserved = 0
+		self.limiter = RateLimiter(rate)
+		self.max_connections = max_connections
+		self._clients: dict[str | None, 'httpx.AsyncClient'] = {}
+
+	def reserve(self, slots: int) -> int:
+		"""从站点并发中为优先账号保留 slots 个槽位，至少留一个给普通账号，返回实际保留数"""
+		self.reserved = min(max(0, slots), self.concurrency - 1)
+		if self.reserved:
+			self.semaphore = asyncio.Semaphore(self.concurrency - self.reserved)
+			self.priority_semaphore = asyncio.Semaphore(self.reserved)
+		return self.reserved
+
+	def slot(self, priority: bool = False) -> asyncio.Semaphore:
+		"""账号使用的并发槽位，有保留槽位时优先账号只使用保留槽位"""
+		if priority and self.priority_semaphore:
+			return self.priority_semaphore
+		return self.semaphore
+
+	def client(self, proxy_url: str | None = None) -> 'httpx.AsyncClient':
+		"""站点在某个出口上的共享连接池
+
+		账号之间共享连接，所以 cookies 不放在客户端里，而是每个请求单独带上 Cookie 请求头，
+		客户端的 cookie jar 拒绝保存任何 cookie。httpx 在第一次创建客户端时才导入。
+		"""
+		client = self._clients.get(proxy_url)
+		if client is None:
+			from http.cookiejar import CookieJar, DefaultCookiePolicy
+
+			import httpx
+
+			client = httpx.AsyncClient(
+				http2=True,
+				timeout=30.0,
+				proxy=proxy_url,
+				cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+				limits=httpx.Limits(
+					max_connections=self.max_connections, max_keepalive_connections=self.max_connections
+				),
+			)
+			self._clients[proxy_url] = client
+		return client
+
+	async def aclose(self):
+		for client in self._clients.values():
+			await client.aclose()
+		self._clients.clear()
+
+
+class SitePools:
+	def __init__(self, concurrency: int = 1, rate: float = 0, max_connections: int = 20):
+		self.concurrency = concurrency
+		self.rate = rate
+		self.max_connections = max_connections
+		self.sites: dict[str, Site] = {}
+
+	@classmethod
+	def from_env(cls):
+		"""ANYROUTER_CONCURRENCY 为每个站点的并发账号数，ANYROUTER_HOST_RPS 为每个站点每秒请求数"""
+		return cls(
+			concurrency=max(1, int(os.getenv('ANYROUTER_CONCURRENCY', '1'))),
+			rate=float(os.getenv('ANYROUTER_HOST_RPS', '0')),
+			max_connections=max(1, int(os.getenv('ANYROUTER_HOST_MAX_CONNECTIONS', '20'))),
+		)
+
+	def get(self, base_url: str) -> Site:
+		site = self.sites.get(base_url)
+		if site is None:
+			site = Site(base_url, self.concurrency, self.rate, self.max_connections)
+			self.sites[base_url] = site
+		return site
+
+	async def aclose(self):
+		for site in self.sites.values():
+			await site.aclose()
@@ -0,0 +1,36 @@
+"""
+跨运行持久化状态的存储工具
+"""
+
+import json
+import os
+from pathlib import Path
+
+
+def state_dir() -> Path:
+	"""返回状态目录，可通过 ANYROUTER_STATE_DIR 覆盖"""
+	return Path(os.getenv('ANYROUTER_STATE_DIR', '.anyrouter'))
+
+
+def state_path(name: str) -> Path:
+	"""返回状态目录下指定文件的路径"""
+	return state_dir() / name
+
+
+def load_json(path, default=None):
+	"""读取 JSON 状态文件，文件不存在或损坏时返回默认值"""
+	try:
+		with open(path, encoding='utf-8') as f:
+			return json.load(f)
+	except (OSError, ValueError):
+		return default
+
+
+def save_json(path, data):
+	"""原子写入 JSON 状态文件，避免进程中途退出留下半个文件"""
+	path = Path(path)
+	path.parent.mkdir(parents=True, exist_ok=True)
+	tmp_path = path.with_name(f'{path.name}.tmp')
+	with open(tmp_path, 'w', encoding='utf-8') as f:
+		json.dump(data, f, ensure_ascii=False, indent=2)
+	os.replace(tmp_path, path)
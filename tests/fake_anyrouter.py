@@ -0,0 +1,298 @@
+"""
+进程内的假 AnyRouter 服务和 webhook 接收端，供基准测试使用
+
+- GET /login: 下发 WAF cookies（代替浏览器过 WAF 挑战）；challenge_rounds 大于 0 时先返回 JS 挑战页，
+  浏览器执行这么多轮哈希算出 acw_sc__v2 写入 cookie，再请求 /login/verify 换取 cdn_sec_tc
+- GET /assets/app.js: 登录页引用的静态资源（asset_size 大于 0 时），允许浏览器长期缓存
+- GET /api/user/self, POST /api/user/sign_in: 校验 WAF cookies 和 session
+- POST /webhook/<name>: 记录收到的通知
+
+waf_rotate_every 大于 0 时，每接受这么多个 API 请求就轮换一次 WAF cookies（模拟 cookies 过期），
+持有旧 cookies 的请求会收到 WAF 挑战页面。
+"""
+
+import asyncio
+import http.client
+import json
+import os
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import httpx
+
+
+class _Server(ThreadingHTTPServer):
+	# 默认的 listen 队列只有 5，并发连接多时 SYN 被丢弃，客户端要等 1 秒重传
+	request_queue_size = 128
+	daemon_threads = True
+
+
+CHALLENGE_HTML = '<html><script>var arg1="3F1A";document.cookie="acw_sc__v2="+arg1</script></html>'
+
+
+class FakeAnyRouter:
+	def __init__(
+		self,
+		latency: float = 0.0,
+		waf_rotate_every: int = 0,
+		expired_sessions=(),
+		asset_size: int = 0,
+		challenge_rounds: int = 0,
+	):
+		self.latency = latency
+		self.challenge_rounds = challenge_rounds
+		self._answers: dict[int, str] = {}
+		self.asset_size = asset_size
+		self.asset_bytes = 0
+		self.waf_rotate_every = waf_rotate_every
+		self.expired_sessions = set(expired_sessions)
+		self.lock = threading.Lock()
+		self.waf_generation = 0
+		self.api_requests = 0
+		self.logins = 0
+		self.sign_ins = 0
+		# 按到达顺序记录的 API 请求，例如 'POST /api/user/sign_in'
+		self.api_calls: list[str] = []
+		self.challenges = 0
+		self.challenge_pages = 0
+		self.webhooks: list[tuple[str, dict]] = []
+		self.balances: dict[str, int] = {}
+		self._server = None
+		self._thread = None
+
+	@property
+	def base_url(self) -> str:
+		host, port = self._server.server_address[:2]
+		return f'http://{host}:{port}'
+
+	def start(self):
+		self._server = _Server(('127.0.0.1', 0), _make_handler(self))
+		self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self._server.shutdown()
+		self._server.server_close()
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc):
+		self.stop()
+
+	def waf_cookies(self) -> dict:
+		gen = self.waf_generation
+		v2 = self.challenge_answer(gen) if self.challenge_rounds else f'v2-{gen}'
+		return {'acw_tc': f'tc-{gen}', 'cdn_sec_tc': f'sec-{gen}', 'acw_sc__v2': v2}
+
+	def challenge_answer(self, gen: int) -> str:
+		"""JS 挑战的答案，与 challenge_page 中的脚本算法一致（32 位 FNV-1a 变体）"""
+		if gen not in self._answers:
+			h = 2166136261
+			for i in range(self.challenge_rounds):
+				h = ((h ^ (gen + i)) * 16777619) & 0xFFFFFFFF
+			self._answers[gen] = format(h, 'x')
+		return self._answers[gen]
+
+	def challenge_page(self, gen: int) -> str:
+		script = (
+			f'var h=2166136261,s={gen};for(var i=0;i<{self.challenge_rounds};i++){{h=Math.imul(h^(s+i),16777619)>>>0}}'
+			'document.cookie="acw_sc__v2="+h.toString(16)+"; path=/";fetch("/login/verify")'
+		)
+		return f'<html><script>{script}</script></html>'
+
+	def check_api_request(self, cookies: dict):
+		"""返回 (状态码, 内容类型, 响应体)，WAF cookies 过期时返回挑战页面"""
+		with self.lock:
+			if any(cookies.get(name) != value for name, value in self.waf_cookies().items()):
+				self.challenges += 1
+				return 200, 'text/html', CHALLENGE_HTML
+			self.api_requests += 1
+			if self.waf_rotate_every and self.api_requests % self.waf_rotate_every == 0:
+				self.waf_generation += 1
+		session = cookies.get('session')
+		if not session or session in self.expired_sessions:
+			return 401, 'application/json', json.dumps({'success': False, 'message': 'unauthorized'})
+		return None
+
+
+def _make_handler(server: FakeAnyRouter):
+	class Handler(BaseHTTPRequestHandler):
+		protocol_version = 'HTTP/1.1'
+
+		def log_message(self, format, *args):
+			pass
+
+		def _cookies(self):
+			cookie = SimpleCookie(self.headers.get('Cookie', ''))
+			return {key: morsel.value for key, morsel in cookie.items()}
+
+		def _send(self, status, content_type, body, cookies=None, headers=None):
+			data = body.encode('utf-8')
+			self.send_response(status)
+			self.send_header('Content-Type', content_type)
+			self.send_header('Content-Length', str(len(data)))
+			for name, value in (cookies or {}).items():
+				self.send_header('Set-Cookie', f'{name}={value}; Path=/')
+			for name, value in (headers or {}).items():
+				self.send_header(name, value)
+			self.end_headers()
+			self.wfile.write(data)
+
+		def _read_body(self):
+			length = int(self.headers.get('Content-Length') or 0)
+			return self.rfile.read(length) if length else b''
+
+		def _log_api_call(self):
+			if self.path.startswith('/api/'):
+				with server.lock:
+					server.api_calls.append(f'{self.command} {self.path}')
+
+		def do_GET(self):
+			self._log_api_call()
+			if server.latency:
+				time.sleep(server.latency)
+			if server.challenge_rounds and self.path.startswith('/login'):
+				with server.lock:
+					expected = server.waf_cookies()
+					gen = server.waf_generation
+				solved = self._cookies().get('acw_sc__v2') == expected['acw_sc__v2']
+				if self.path.startswith('/login/verify'):
+					if solved:
+						self._send(200, 'text/plain', 'ok', {'cdn_sec_tc': expected['cdn_sec_tc']})
+					else:
+						self._send(403, 'text/plain', 'challenge failed')
+					return
+				if not solved:
+					with server.lock:
+						server.logins += 1
+						server.challenge_pages += 1
+					cookies = {'acw_tc': expected['acw_tc']}
+					self._send(200, 'text/html', server.challenge_page(gen), cookies, {'Cache-Control': 'no-store'})
+					return
+			if self.path.startswith('/login'):
+				with server.lock:
+					server.logins += 1
+					cookies = server.waf_cookies()
+				script = '<script src="/assets/app.js"></script>' if server.asset_size else ''
+				self._send(200, 'text/html', f'<html>login{script}</html>', cookies, {'Cache-Control': 'no-store'})
+				return
+			if self.path.startswith('/assets/') and server.asset_size:
+				body = '/*' + 'x' * max(0, server.asset_size - 4) + '*/'
+				with server.lock:
+					server.asset_bytes += len(body)
+				self._send(200, 'application/javascript', body, headers={'Cache-Control': 'public, max-age=31536000'})
+				return
+			if self.path.startswith('/api/user/self'):
+				rejected = server.check_api_request(self._cookies())
+				if rejected:
+					self._send(*rejected)
+					return
+				user = self.headers.get('new-api-user', '')
+				quota = server.balances.get(user, 2500000)
+				body = {'success': True, 'data': {'quota': quota, 'used_quota': 500000}}
+				self._send(200, 'application/json', json.dumps(body))
+				return
+			self._send(404, 'text/plain', 'not found')
+
+		def do_POST(self):
+			body = self._read_body()
+			self._log_api_call()
+			if server.latency:
+				time.sleep(server.latency)
+			if self.path.startswith('/api/user/sign_in'):
+				rejected = server.check_api_request(self._cookies())
+				if rejected:
+					self._send(*rejected)
+					return
+				with server.lock:
+					server.sign_ins += 1
+					user = self.headers.get('new-api-user', '')
+					server.balances[user] = server.balances.get(user, 2500000) + 12500000
+				self._send(200, 'application/json', json.dumps({'success': True, 'message': ''}))
+				return
+			if self.path.startswith('/webhook/'):
+				with server.lock:
+					server.webhooks.append((self.path, json.loads(body or b'{}')))
+				self._send(200, 'application/json', '{"errcode": 0}')
+				return
+			self._send(404, 'text/plain', 'not found')
+
+	return Handler
+
+
+def make_waf_fetcher(launch_delay: float = 0.0):
+	"""代替 Playwright 的 WAF cookies 获取：模拟浏览器启动耗时后访问 /login"""
+
+	async def fetch(account_name, base_url=None, proxy=None, *args, **kwargs):
+		if launch_delay:
+			await asyncio.sleep(launch_delay)
+		base_url = base_url or os.environ['ANYROUTER_BASE_URL']
+		async with httpx.AsyncClient(proxy=proxy.url if proxy else None) as client:
+			response = await client.get(f'{base_url}/login')
+		return dict(response.cookies)
+
+	return fetch
+
+
+class FakeProxy:
+	"""最简单的 HTTP 正向代理，只转发 http:// 请求并统计经过的请求数"""
+
+	def __init__(self):
+		self.requests = 0
+		self._server = None
+
+	@property
+	def url(self) -> str:
+		host, port = self._server.server_address[:2]
+		return f'http://{host}:{port}'
+
+	def start(self):
+		proxy = self
+
+		class Handler(BaseHTTPRequestHandler):
+			protocol_version = 'HTTP/1.1'
+
+			def log_message(self, format, *args):
+				pass
+
+			def _forward(self):
+				proxy.requests += 1
+				target = urlsplit(self.path)
+				length = int(self.headers.get('Content-Length') or 0)
+				body = self.rfile.read(length) if length else None
+				headers = {k: v for k, v in self.headers.items() if k.lower() not in ('proxy-connection', 'connection')}
+				upstream = http.client.HTTPConnection(target.hostname, target.port, timeout=10)
+				path = target.path + (f'?{target.query}' if target.query else '')
+				upstream.request(self.command, path, body=body, headers=headers)
+				response = upstream.getresponse()
+				data = response.read()
+				self.send_response(response.status)
+				for key, value in response.getheaders():
+					if key.lower() not in ('content-length', 'connection', 'transfer-encoding'):
+						self.send_header(key, value)
+				self.send_header('Content-Length', str(len(data)))
+				self.end_headers()
+				self.wfile.write(data)
+				upstream.close()
+
+			do_GET = _forward
+			do_POST = _forward
+
+		self._server = _Server(('127.0.0.1', 0), Handler)
+		threading.Thread(target=self._server.serve_forever, daemon=True).start()
+		return self
+
+	def stop(self):
+		self._server.shutdown()
+		self._server.server_close()
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc):
+		self.stop()
@@ -0,0 +1,97 @@
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from notify import NotificationKit
+
+
+class FakeClock:
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+
+@pytest.fixture
+def clock():
+	return FakeClock()
+
+
+@pytest.fixture
+def breaker(tmp_path, clock):
+	return CircuitBreaker(tmp_path / 'breaker.json', failure_threshold=2, cooldown=60, clock=clock)
+
+
+def test_opens_after_consecutive_failures(breaker):
+	breaker.record_failure('Feishu', 'timeout')
+	assert breaker.state('Feishu') == CLOSED
+	assert breaker.allow('Feishu')
+
+	breaker.record_failure('Feishu', 'timeout')
+	assert breaker.state('Feishu') == OPEN
+	assert not breaker.allow('Feishu')
+	assert breaker.transitions == ['Feishu: closed -> open (2 consecutive failures)']
+
+
+def test_success_resets_failure_count(breaker):
+	breaker.record_failure('Feishu')
+	breaker.record_success('Feishu')
+	breaker.record_failure('Feishu')
+	assert breaker.state('Feishu') == CLOSED
+
+
+def test_half_open_probe(breaker, clock):
+	breaker.record_failure('PushPlus')
+	breaker.record_failure('PushPlus')
+
+	clock.now += 61
+	assert breaker.allow('PushPlus')
+	assert breaker.state('PushPlus') == HALF_OPEN
+
+	# 半开探测失败立即重新熔断
+	breaker.record_failure('PushPlus')
+	assert breaker.state('PushPlus') == OPEN
+	assert not breaker.allow('PushPlus')
+
+	clock.now += 61
+	assert breaker.allow('PushPlus')
+	breaker.record_success('PushPlus')
+	assert breaker.state('PushPlus') == CLOSED
+
+
+def test_state_persisted_between_runs(breaker, tmp_path, clock):
+	breaker.record_failure('Feishu')
+	breaker.record_failure('Feishu')
+	breaker.save()
+
+	reloaded = CircuitBreaker(tmp_path / 'breaker.json', failure_threshold=2, cooldown=60, clock=clock)
+	assert reloaded.state('Feishu') == OPEN
+	assert not reloaded.allow('Feishu')
+	assert reloaded.report_lines()[0].startswith('[BREAKER] Feishu: open after 2 failures')
+
+
+def test_push_message_skips_open_channel(tmp_path, monkeypatch):
+	monkeypatch.setenv('NOTIFY_BREAKER_FILE', str(tmp_path / 'breaker.json'))
+	monkeypatch.setenv('NOTIFY_BREAKER_THRESHOLD', '1')
+	kit = NotificationKit()
+
+	with patch.object(kit, 'send_feishu', side_effect=RuntimeError('timeout')) as mock_feishu:
+		transitions = kit.push_message('标题', '内容')
+		assert mock_feishu.call_count == 1
+		assert transitions == ['Feishu: closed -> open (1 consecutive failures)']
+
+	kit = NotificationKit()
+	with (
+		patch.object(kit, 'send_feishu') as mock_feishu,
+		patch.object(kit, 'send_dingtalk') as mock_dingtalk,
+	):
+		kit.push_message('标题', '内容')
+		assert not mock_feishu.called
+		assert '[BREAKER] Feishu: open' in mock_dingtalk.call_args[0][1]
@@ -0,0 +1,303 @@
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fake_anyrouter import FakeAnyRouter
+
+import browser
+import checkin
+from browser import DEFAULT_ARGS, HEADFUL, HEADLESS_SHELL, LEAN_ARGS, NEW_HEADLESS, headless_mode, launch_options
+
+
+@pytest.mark.parametrize(
+	'value, expected',
+	[('false', HEADFUL), ('true', NEW_HEADLESS), ('new', NEW_HEADLESS), ('shell', HEADLESS_SHELL)],
+)
+def test_headless_mode_from_env(monkeypatch, value, expected):
+	monkeypatch.setenv('ANYROUTER_HEADLESS', value)
+	assert headless_mode() == expected
+
+
+def test_auto_mode_uses_display(monkeypatch):
+	monkeypatch.delenv('ANYROUTER_HEADLESS', raising=False)
+	monkeypatch.setattr(browser, 'has_display', lambda: False)
+	assert headless_mode() == NEW_HEADLESS
+
+	monkeypatch.setattr(browser, 'has_display', lambda: True)
+	assert headless_mode() == HEADFUL
+
+
+def test_launch_options(monkeypatch):
+	monkeypatch.delenv('ANYROUTER_BROWSER_ARGS', raising=False)
+
+	assert launch_options(HEADFUL) == {'headless': False, 'args': DEFAULT_ARGS}
+	assert launch_options(NEW_HEADLESS) == {'headless': True, 'args': LEAN_ARGS, 'channel': 'chromium'}
+	assert launch_options(HEADLESS_SHELL) == {'headless': True, 'args': LEAN_ARGS}
+
+	monkeypatch.setenv('ANYROUTER_BROWSER_ARGS', 'default')
+	assert launch_options(HEADLESS_SHELL)['args'] == DEFAULT_ARGS
+
+
+def test_engine_specific_options(monkeypatch):
+	monkeypatch.setenv('ANYROUTER_BROWSER_ENGINE', 'Firefox')
+	assert browser.browser_engine() == browser.FIREFOX
+	monkeypatch.setenv('ANYROUTER_BROWSER_ENGINE', 'edge')
+	assert browser.browser_engine() == browser.CHROMIUM
+
+	# Chromium 的启动参数和 User-Agent 不用于其他内核
+	assert launch_options(NEW_HEADLESS, engine=browser.WEBKIT) == {'headless': True}
+	assert launch_options(HEADFUL, engine=browser.FIREFOX) == {'headless': False}
+	assert 'user_agent' not in browser.context_options(browser.FIREFOX)
+	assert browser.context_options()['user_agent'] == browser.USER_AGENT
+
+
+@pytest.mark.parametrize(
+	'endpoint, protocol',
+	[
+		('http://127.0.0.1:9222', browser.CDP),
+		('ws://127.0.0.1:9222/devtools/browser/abc', browser.CDP),
+		('ws://127.0.0.1:3000/', browser.PLAYWRIGHT_SERVER),
+	],
+)
+def test_browser_endpoint_protocol(monkeypatch, endpoint, protocol):
+	monkeypatch.delenv('ANYROUTER_BROWSER_PROTOCOL', raising=False)
+	monkeypatch.setenv('ANYROUTER_BROWSER_ENDPOINT', endpoint)
+	assert browser.browser_endpoint() == (endpoint, protocol)
+
+
+class FakeChromium:
+	def __init__(self):
+		self.connects = 0
+		self.launches = 0
+
+	async def connect_over_cdp(self, endpoint, timeout=None):
+		self.connects += 1
+		raise ConnectionRefusedError('connection refused')
+
+	async def launch(self, **options):
+		self.launches += 1
+		return 'local-browser'
+
+
+def test_unreachable_endpoint_falls_back_to_local_launch(monkeypatch):
+	monkeypatch.setenv('ANYROUTER_BROWSER_ENDPOINT', 'http://127.0.0.1:9')
+	monkeypatch.setattr(browser, '_unreachable', {})
+	playwright = type('FakePlaywright', (), {'chromium': FakeChromium()})()
+
+	async def run():
+		return [await browser.open_browser(playwright, NEW_HEADLESS) for _ in range(2)]
+
+	assert asyncio.run(run()) == [('local-browser', False)] * 2
+	# 连接失败一次后不再等待连接超时
+	assert (playwright.chromium.connects, playwright.chromium.launches) == (1, 2)
+
+	# 超过重试间隔后重新尝试连接，外部浏览器重启后可以恢复使用
+	browser._unreachable['http://127.0.0.1:9'] -= 301
+	assert asyncio.run(run()) == [('local-browser', False)] * 2
+	assert (playwright.chromium.connects, playwright.chromium.launches) == (2, 4)
+
+
+class FakeProfileContext:
+	def __init__(self):
+		self.cleared = 0
+		self.closed = False
+
+	async def clear_cookies(self):
+		self.cleared += 1
+
+	async def close(self):
+		self.closed = True
+
+
+class FakeLocalBrowser:
+	async def new_context(self, **options):
+		return FakeProfileContext()
+
+	async def close(self):
+		pass
+
+
+class FakeProfileChromium:
+	def __init__(self, fail=False):
+		self.fail = fail
+		self.profiles = []
+		self.args = []
+
+	async def launch_persistent_context(self, user_data_dir, **options):
+		self.profiles.append(Path(user_data_dir).name)
+		self.args = options['args']
+		if self.fail:
+			raise RuntimeError('profile is in use')
+		return FakeProfileContext()
+
+	async def launch(self, **options):
+		return FakeLocalBrowser()
+
+
+def test_profile_contexts_get_separate_slots_and_clear_cookies(monkeypatch, tmp_path):
+	monkeypatch.delenv('ANYROUTER_BROWSER_ENDPOINT', raising=False)
+	monkeypatch.setenv('ANYROUTER_BROWSER_PROFILE', str(tmp_path))
+	monkeypatch.setattr(browser, '_profiles', browser.ProfilePool())
+	playwright = type('FakePlaywright', (), {'chromium': FakeProfileChromium()})()
+
+	async def run():
+		(first, close_first), (second, close_second) = [
+			await browser.open_context(playwright, NEW_HEADLESS) for _ in range(2)
+		]
+		await close_first()
+		await close_second()
+		await (await browser.open_context(playwright, NEW_HEADLESS))[1]()
+		return first, second
+
+	first, second = asyncio.run(run())
+	# 同时运行的浏览器使用不同的配置目录，空闲后复用
+	assert playwright.chromium.profiles == ['slot-0', 'slot-1', 'slot-0']
+	assert any(arg.startswith('--disk-cache-size=') for arg in playwright.chromium.args)
+	# 使用前后都清空 cookies
+	assert (first.cleared, first.closed) == (2, True)
+	assert not browser._profiles.busy
+
+	playwright.chromium.fail = True
+	context, close = asyncio.run(browser.open_context(playwright, NEW_HEADLESS))
+	assert context.cleared == 0
+	assert not browser._profiles.busy
+
+
+def test_engine_selects_browser_type_and_profile_directory(monkeypatch, tmp_path):
+	monkeypatch.delenv('ANYROUTER_BROWSER_ENDPOINT', raising=False)
+	monkeypatch.setenv('ANYROUTER_BROWSER_ENGINE', 'firefox')
+	monkeypatch.setenv('ANYROUTER_BROWSER_PROFILE', str(tmp_path))
+	monkeypatch.setattr(browser, '_profiles', browser.ProfilePool())
+	firefox = FakeProfileChromium()
+	playwright = type('FakePlaywright', (), {'chromium': FakeChromium(), 'firefox': firefox})()
+
+	calls = {}
+
+	async def launch_persistent_context(user_data_dir, **options):
+		calls.update(options, user_data_dir=user_data_dir)
+		return FakeProfileContext()
+
+	firefox.launch_persistent_context = launch_persistent_context
+	context, close = asyncio.run(browser.open_context(playwright, NEW_HEADLESS))
+	asyncio.run(close())
+
+	assert Path(calls['user_data_dir']) == tmp_path / 'firefox' / 'slot-0'
+	assert 'args' not in calls and 'user_agent' not in calls
+	assert calls['firefox_user_prefs']['browser.cache.disk.capacity'] == browser.profile_max_bytes() // 1024
+	assert playwright.chromium.launches == 0
+
+
+def test_profile_pool_trims_least_recently_used(tmp_path):
+	pool = browser.ProfilePool()
+	for index, size in enumerate([300, 300, 300]):
+		slot = tmp_path / f'slot-{index}'
+		(slot / 'Default' / 'Cache').mkdir(parents=True)
+		(slot / 'Default' / 'Cache' / 'data_1').write_bytes(b'x' * size)
+		os.utime(slot, (1000 + index, 1000 + index))
+	pool.busy.add(tmp_path / 'slot-0')
+
+	assert pool.trim(tmp_path, 1000) == []
+	# slot-0 最久未用但正在使用，先删除 slot-1
+	assert pool.trim(tmp_path, 500) == [tmp_path / 'slot-1', tmp_path / 'slot-2']
+	assert sorted(path.name for path in tmp_path.iterdir()) == ['slot-0']
+
+
+def browser_executable(engine: str = 'chromium') -> str:
+	"""返回 Playwright 浏览器的路径，未安装时跳过测试"""
+	from playwright.sync_api import sync_playwright
+
+	with sync_playwright() as p:
+		executable = getattr(p, engine).executable_path
+	if not os.path.exists(executable):
+		pytest.skip(f'{engine} is not installed (run playwright install {engine})')
+	return executable
+
+
+def test_challenge_stand_in_requires_the_computed_cookie():
+	import httpx
+
+	with FakeAnyRouter(challenge_rounds=1000) as server:
+		with httpx.Client(base_url=server.base_url) as client:
+			page = client.get('/login')
+			assert 'Math.imul' in page.text and set(page.cookies) == {'acw_tc'}
+			client.cookies.set('acw_sc__v2', 'guess')
+			assert client.get('/login/verify').status_code == 403
+
+			client.cookies.set('acw_sc__v2', server.challenge_answer(server.waf_generation))
+			assert client.get('/login/verify').status_code == 200
+			assert dict(client.cookies) == server.waf_cookies()
+		assert server.challenge_pages == 1
+
+
+@pytest.mark.parametrize('engine', browser.ENGINES)
+def test_each_engine_passes_the_js_challenge(monkeypatch, engine):
+	browser_executable(engine)
+	monkeypatch.delenv('ANYROUTER_BROWSER_ENDPOINT', raising=False)
+	monkeypatch.delenv('ANYROUTER_BROWSER_PROFILE', raising=False)
+	monkeypatch.setenv('ANYROUTER_HEADLESS', 'new')
+	monkeypatch.setenv('ANYROUTER_BROWSER_ENGINE', engine)
+
+	with FakeAnyRouter(challenge_rounds=10000) as server:
+		cookies = asyncio.run(checkin.get_waf_cookies_with_playwright('Account 1', server.base_url))
+		assert cookies == server.waf_cookies()
+
+
+def test_profile_keeps_login_assets_cached(monkeypatch, tmp_path):
+	browser_executable()
+	monkeypatch.delenv('ANYROUTER_BROWSER_ENDPOINT', raising=False)
+	monkeypatch.setenv('ANYROUTER_HEADLESS', 'new')
+	monkeypatch.setenv('ANYROUTER_BROWSER_PROFILE', str(tmp_path))
+	monkeypatch.setattr(browser, '_profiles', browser.ProfilePool())
+
+	with FakeAnyRouter(asset_size=64 * 1024) as server:
+		for generation in range(2):
+			cookies = asyncio.run(checkin.get_waf_cookies_with_playwright('Account 1', server.base_url))
+			assert cookies == server.waf_cookies()
+			server.waf_generation += 1
+		# 第二次运行的脚本来自磁盘缓存
+		assert server.asset_bytes == 64 * 1024
+	assert (tmp_path / 'slot-0').is_dir()
+
+
+def start_cdp_browser(tmp_path):
+	"""在本地启动一个开启远程调试的 Chromium，代替常驻浏览器，返回 (进程, CDP 地址)"""
+	executable = browser_executable()
+	proc = subprocess.Popen(
+		[executable, '--headless=new', '--no-sandbox', '--remote-debugging-port=0', f'--user-data-dir={tmp_path}'],
+		stdout=subprocess.DEVNULL,
+		stderr=subprocess.PIPE,
+		text=True,
+	)
+	for line in proc.stderr:
+		if 'DevTools listening on' in line:
+			return proc, line.split('DevTools listening on', 1)[1].strip()
+	proc.kill()
+	pytest.skip('Chromium did not start with remote debugging')
+
+
+def test_waf_cookies_from_attached_browser(monkeypatch, tmp_path):
+	proc, endpoint = start_cdp_browser(tmp_path / 'profile')
+	try:
+		monkeypatch.setenv('ANYROUTER_BROWSER_ENDPOINT', endpoint)
+		monkeypatch.setattr(browser, '_unreachable', {})
+
+		async def no_launch(*args, **kwargs):
+			raise AssertionError('local browser must not be launched')
+
+		monkeypatch.setattr(browser, 'launch_browser', no_launch)
+		with FakeAnyRouter() as server:
+			for _ in range(2):
+				cookies = asyncio.run(checkin.get_waf_cookies_with_playwright('Account 1', server.base_url))
+				assert set(cookies) == {'acw_tc', 'cdn_sec_tc', 'acw_sc__v2'}
+		# 外部浏览器在签到结束后继续运行
+		assert proc.poll() is None
+	finally:
+		proc.kill()
+		proc.wait()
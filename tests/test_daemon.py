@@ -0,0 +1,177 @@
+import asyncio
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import checkin
+import daemon
+from account_source import FileWatcher, diff_accounts, index_accounts
+
+
+def account(api_user, session='s'):
+	return {'cookies': {'session': session}, 'api_user': api_user}
+
+
+def test_diff_accounts():
+	old = index_accounts([account('1'), account('2'), account('3')])
+	new = index_accounts([account('2', session='new'), account('3'), account('4')])
+	diff = diff_accounts(old, new)
+	assert [old[key]['api_user'] for key in diff.removed] == ['1']
+	assert [new[key]['api_user'] for key in diff.changed] == ['2']
+	assert [new[key]['api_user'] for key in diff.added] == ['4']
+	assert not diff_accounts(new, index_accounts([account('2', session='new'), account('3'), account('4')]))
+
+
+@pytest.mark.parametrize('use_inotify', [True, False])
+def test_file_watcher_detects_atomic_replace(tmp_path, use_inotify):
+	path = tmp_path / 'accounts.json'
+	path.write_text('[]')
+
+	async def run():
+		changed = asyncio.Event()
+		watcher = FileWatcher(path, changed.set, poll_interval=0.05, debounce=0.05, use_inotify=use_inotify)
+		watcher.start()
+		try:
+			await asyncio.sleep(0.1)
+			# 编辑器常用的保存方式：写临时文件再改名
+			tmp = tmp_path / 'accounts.json.tmp'
+			tmp.write_text('[{}]')
+			tmp.replace(path)
+			await asyncio.wait_for(changed.wait(), 2)
+			return watcher.mode
+		finally:
+			watcher.stop()
+
+	mode = asyncio.run(run())
+	assert mode in (('inotify', 'poll') if use_inotify else ('poll',))
+
+
+def test_scheduler_applies_incremental_changes(monkeypatch):
+	calls = []
+
+	async def fake_process(ctx, index, account_info, name):
+		calls.append((account_info['api_user'], account_info['cookies']['session']))
+		if account_info['api_user'] == 'slow':
+			await asyncio.sleep(10)
+		return 'success', f'[SUCCESS] {name}'
+
+	monkeypatch.setattr(checkin, 'process_account', fake_process)
+
+	async def run():
+		scheduler = daemon.AccountScheduler(ctx=None, interval=60, retry_interval=60)
+		scheduler.apply([account('1'), account('2'), account('slow')])
+		await asyncio.sleep(0.05)
+		slow_task = next(task for key, task in scheduler.tasks.items() if scheduler.accounts[key]['api_user'] == 'slow')
+		first = dict(scheduler.last)
+
+		diff = scheduler.apply([account('1'), account('2', session='new'), account('3')])
+		await asyncio.sleep(0.05)
+		assert (len(diff.added), len(diff.removed), len(diff.changed)) == (1, 1, 1)
+		assert slow_task.cancelled()
+		# 未变化的账号保留缓存结果，不重新签到
+		key_1 = next(key for key, value in scheduler.accounts.items() if value['api_user'] == '1')
+		assert scheduler.last[key_1] == first[key_1]
+		await scheduler.close()
+
+	asyncio.run(run())
+	assert calls[:3] == [('1', 's'), ('2', 's'), ('slow', 's')]
+	# 账号 2 刚签到成功，修改 cookies 后等到下一个周期
+	assert calls[3:] == [('3', 's')]
+
+
+def test_changed_account_keeps_its_schedule(monkeypatch):
+	calls = []
+
+	async def fake_process(ctx, index, account_info, name):
+		calls.append((account_info['api_user'], account_info['cookies']['session'], time.monotonic()))
+		status = 'failed' if account_info['cookies']['session'] == 'expired' else 'success'
+		return status, f'[{status.upper()}] {name}'
+
+	monkeypatch.setattr(checkin, 'process_account', fake_process)
+
+	async def run():
+		scheduler = daemon.AccountScheduler(ctx=None, interval=0.3, retry_interval=60)
+		scheduler.apply([account('1'), account('2', session='expired')])
+		await asyncio.sleep(0.1)
+		# 修复失效 cookies 的账号立即重新签到，刚成功的账号按原周期
+		scheduler.apply([account('1', session='new'), account('2', session='fixed')])
+		await asyncio.sleep(0.05)
+		assert [call[:2] for call in calls[2:]] == [('2', 'fixed')]
+		await asyncio.sleep(0.2)
+		await scheduler.close()
+
+	asyncio.run(run())
+	assert [call[:2] for call in calls[:2]] == [('1', 's'), ('2', 'expired')]
+	assert calls[3][:2] == ('1', 'new')
+	assert calls[3][2] - calls[0][2] >= 0.29
+
+
+def test_serve_reloads_account_file(monkeypatch, tmp_path):
+	path = tmp_path / 'accounts.json'
+	path.write_text(json.dumps([account('1')]))
+	monkeypatch.setenv('ANYROUTER_ACCOUNTS_FILE', str(path))
+	monkeypatch.setenv('ANYROUTER_WATCH_POLL', '0.05')
+	seen = []
+
+	async def fake_process(ctx, index, account_info, name):
+		seen.append(account_info['api_user'])
+		return 'success', f'[SUCCESS] {name}'
+
+	monkeypatch.setattr(checkin, 'process_account', fake_process)
+
+	async def run():
+		stop = asyncio.Event()
+		task = asyncio.create_task(daemon.serve(stop))
+		await asyncio.sleep(0.2)
+		path.write_text(json.dumps([account('1'), account('2')]))
+		for _ in range(40):
+			if '2' in seen:
+				break
+			await asyncio.sleep(0.05)
+		stop.set()
+		await task
+
+	with patch.object(checkin.notify, 'push_message') as mock_push:
+		asyncio.run(run())
+	assert seen == ['1', '2']
+	assert mock_push.call_count == 2
+
+
+def test_slow_notification_does_not_block_other_accounts(monkeypatch, tmp_path):
+	path = tmp_path / 'accounts.json'
+	path.write_text(json.dumps([account('1')]))
+	monkeypatch.setenv('ANYROUTER_ACCOUNTS_FILE', str(path))
+	monkeypatch.setenv('ANYROUTER_DAEMON_INTERVAL', '0.01')
+	started = threading.Event()
+	release = threading.Event()
+	released = []
+
+	async def fake_process(ctx, index, account_info, name):
+		return 'success', f'[SUCCESS] {name}'
+
+	def slow_push(title, content, msg_type='text'):
+		started.set()
+		released.append(release.wait(5))
+
+	monkeypatch.setattr(checkin, 'process_account', fake_process)
+
+	async def run():
+		stop = asyncio.Event()
+		task = asyncio.create_task(daemon.serve(stop))
+		# 通知发送期间事件循环仍在运行
+		assert await asyncio.to_thread(started.wait, 5)
+		release.set()
+		stop.set()
+		await task
+
+	with patch.object(checkin.notify, 'push_message', side_effect=slow_push):
+		asyncio.run(run())
+	assert released[0] is True
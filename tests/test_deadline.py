@@ -0,0 +1,85 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import checkin
+from deadline import RunDeadline
+
+
+class FakeClock:
+	def __init__(self):
+		self.now = 100.0
+
+	def __call__(self):
+		return self.now
+
+
+def test_budget_respects_remaining_time():
+	clock = FakeClock()
+	deadline = RunDeadline(total=100, reserve=20, clock=clock)
+
+	assert deadline.remaining() == 80
+	assert deadline.budget(30) == 30
+	clock.now += 70
+	assert deadline.budget(30) == 10
+	clock.now += 10
+	assert deadline.expired()
+
+
+def test_unlimited_deadline():
+	deadline = RunDeadline()
+	assert deadline.remaining() is None
+	assert deadline.budget(30) == 30
+	assert not deadline.expired()
+
+
+def test_scope_cancels_slow_work():
+	async def run():
+		deadline = RunDeadline()
+		with pytest.raises(TimeoutError):
+			async with deadline.scope(0.05):
+				await asyncio.sleep(5)
+
+	asyncio.run(run())
+
+
+def test_expire_now_cancels_active_scopes():
+	async def run():
+		deadline = RunDeadline(total=60)
+		asyncio.get_running_loop().call_later(0.05, deadline.expire_now)
+		with pytest.raises(TimeoutError):
+			async with deadline.scope(30):
+				await asyncio.sleep(5)
+		assert deadline.expired()
+
+	asyncio.run(run())
+
+
+def test_main_skips_remaining_accounts_after_deadline(monkeypatch):
+	accounts = [{'cookies': {'session': f's{i}'}, 'api_user': str(i)} for i in range(4)]
+	monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps(accounts))
+	monkeypatch.setenv('ANYROUTER_RUN_TIMEOUT', '0.3')
+	monkeypatch.setenv('ANYROUTER_NOTIFY_RESERVE', '0.1')
+	monkeypatch.setenv('ANYROUTER_PRECHECK', '0')
+	monkeypatch.setenv('ANYROUTER_HISTORY_FILE', '')
+	monkeypatch.setenv('ANYROUTER_QUARANTINE_FILE', '')
+
+	async def slow_check_in(account_info, account_index, *args):
+		await asyncio.sleep(0.15)
+		return True, None
+
+	monkeypatch.setattr(checkin, 'check_in_account', slow_check_in)
+	with patch.object(checkin.notify, 'push_message') as mock_push, pytest.raises(SystemExit):
+		asyncio.run(checkin.main())
+
+	content = mock_push.call_args[0][1]
+	assert '[SUCCESS] Account 1' in content
+	assert 'Account 2 timed out (run deadline reached)' in content
+	assert '[SKIP] Account 4 skipped (deadline)' in content
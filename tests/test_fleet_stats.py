@@ -0,0 +1,80 @@
+import asyncio
+import json
+import random
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fake_anyrouter import FakeAnyRouter, make_waf_fetcher
+
+import checkin
+from fleet_stats import FleetStats, QuantileSketch, TopN
+
+
+def test_sketch_quantiles_stay_within_relative_error():
+	rng = random.Random(7)
+	values = [rng.lognormvariate(3, 1.5) for _ in range(100_000)] + [0.0] * 1000
+	sketch = QuantileSketch(relative_accuracy=0.01)
+	for value in values:
+		sketch.add(value)
+
+	ordered = sorted(values)
+	for q in (0.5, 0.9, 0.99):
+		exact = ordered[int(q * (len(ordered) - 1))]
+		assert abs(sketch.quantile(q) - exact) <= 0.02 * exact
+	assert sketch.quantile(0.001) == 0.0
+	# 桶数只取决于数值范围，与账号数无关
+	assert len(sketch.bins) < 2048
+
+
+def test_top_n_keeps_only_n_items():
+	top = TopN(3)
+	for label, value in [('a', 5), ('b', 1), ('c', 9), ('d', 5), ('e', 0), ('f', 7)]:
+		top.add(value, label)
+	assert top.largest() == [('c', 9), ('f', 7), ('a', 5)]
+	assert top.smallest() == [('e', 0), ('b', 1), ('a', 5)]
+	assert len(top._largest) == len(top._smallest) == 3
+
+	stats = FleetStats(top=2)
+	for i in range(1, 5):
+		stats.add(f'Account {i}', i * 10.0, float(i))
+	lines = stats.summary_lines()
+	assert lines[0] == '[BALANCE] 4 accounts, total $100.00, mean $25.00, total used $10.00'
+	assert '[BALANCE] Top 2 by balance: Account 4 $40.00, Account 3 $30.00' in lines
+	assert '[BALANCE] Bottom 2 by used: Account 1 $1.00, Account 2 $2.00' in lines
+
+
+def test_large_runs_report_summary_and_write_details(monkeypatch, tmp_path):
+	monkeypatch.setenv('ANYROUTER_STATE_DIR', str(tmp_path))
+	monkeypatch.setenv('ANYROUTER_PRECHECK', '0')
+	monkeypatch.setenv('ANYROUTER_REPORT_DETAIL_LIMIT', '3')
+	monkeypatch.setenv('ANYROUTER_BALANCE_TOP', '2')
+	monkeypatch.delenv('ANYROUTER_TENANTS', raising=False)
+	monkeypatch.setattr(checkin, 'get_waf_cookies_with_playwright', make_waf_fetcher())
+
+	with FakeAnyRouter(expired_sessions={'s6'}) as server:
+		for i in range(1, 7):
+			server.balances[str(i)] = i * 500000
+		accounts = [
+			{'cookies': {'session': f's{i}'}, 'api_user': str(i), 'base_url': server.base_url} for i in range(1, 7)
+		]
+		monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps(accounts))
+		with patch.object(checkin.notify, 'push_message') as mock_push, pytest.raises(SystemExit):
+			asyncio.run(checkin.main())
+
+	content = mock_push.call_args[0][1]
+	assert '[SUCCESS] Account 1' not in content
+	assert '[FAIL] Account 6' in content
+	# 签到后余额 = 原余额 + $25
+	assert '[BALANCE] 5 accounts, total $140.00, mean $28.00, total used $5.00' in content
+	assert '[BALANCE] Top 2 by balance: Account 5 $30.00, Account 4 $29.00' in content
+	assert '[BALANCE] Bottom 2 by balance: Account 1 $26.00, Account 2 $27.00' in content
+	detail = tmp_path / 'report_details.txt'
+	assert f'[INFO] Per-account results for 6 accounts: {detail}' in content
+	lines = detail.read_text(encoding='utf-8').splitlines()
+	assert sum(1 for line in lines if line.startswith('[SUCCESS] Account')) == 5
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fake_anyrouter import FakeAnyRouter, make_waf_fetcher
+
+import checkin
+from journal import CheckpointJournal, account_keys
+
+
+class FakeClock:
+	def __init__(self):
+		self.now = 0.0
+
+	def __call__(self):
+		return self.now
+
+
+def test_fsync_is_batched(tmp_path):
+	clock = FakeClock()
+	journal = CheckpointJournal(tmp_path / 'journal.jsonl', fsync_interval=10, fsync_batch=4, clock=clock)
+	journal.open(accounts=7)
+	for i in range(7):
+		journal.record(f'k{i}', i, 'success', f'[SUCCESS] Account {i + 1}')
+	# run 记录加 7 条结果，每 4 条 fsync 一次
+	assert journal.fsync_count == 2
+
+	clock.now += 11
+	journal.record('k7', 7, 'failed', '[FAIL] Account 8')
+	assert journal.fsync_count == 3
+	journal.finish()
+	assert journal.fsync_count == 4
+
+
+def test_load_ignores_finished_runs_and_torn_lines(tmp_path):
+	path = tmp_path / 'journal.jsonl'
+	journal = CheckpointJournal(path)
+	journal.open(accounts=2)
+	journal.record('a', 0, 'success', 'line a')
+	journal.finish(complete=True)
+	assert journal.load() == {}
+
+	journal.open(accounts=2)
+	journal.record('b', 1, 'failed', 'line b')
+	journal.finish(complete=False)
+	with open(path, 'a', encoding='utf-8') as f:
+		f.write('{"type": "result", "key": "c"')
+	assert set(journal.load()) == {'b'}
+
+
+def test_journals_from_another_day_are_not_resumed(tmp_path):
+	path = tmp_path / 'journal.jsonl'
+	now = datetime(2026, 5, 2, 0, 5)
+	writer = CheckpointJournal(path, now=lambda: datetime(2026, 5, 1, 23, 50))
+	writer.open(accounts=2)
+	writer.record('a', 0, 'success', 'line a')
+	writer.finish(complete=False)
+
+	# 前一天被中断的运行不能让今天跳过账号
+	journal = CheckpointJournal(path, now=lambda: now)
+	assert journal.load() == {}
+	assert not path.exists()
+
+	writer = CheckpointJournal(path, now=lambda: datetime(2026, 5, 2, 0, 1))
+	writer.open(accounts=2)
+	writer.record('a', 0, 'success', 'line a')
+	writer.finish(complete=False)
+	assert set(CheckpointJournal(path, now=lambda: now).load()) == {'a'}
+	assert CheckpointJournal(path, max_age=60, now=lambda: now).load() == {}
+
+
+def test_account_keys_are_stable_and_unique():
+	accounts = [{'api_user': '1'}, {'api_user': '2'}, {'api_user': '1'}]
+	keys = account_keys(accounts)
+	assert len(set(keys)) == 3
+	assert account_keys(list(reversed(accounts)))[1] == keys[1]
+
+
+def run_main(monkeypatch):
+	with patch.object(checkin.notify, 'push_message') as mock_push, pytest.raises(SystemExit):
+		asyncio.run(checkin.main())
+	return mock_push.call_args[0][1]
+
+
+def test_resume_skips_completed_accounts(monkeypatch, tmp_path):
+	accounts = [{'cookies': {'session': f's{i}'}, 'api_user': str(i)} for i in range(5)]
+	monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps(accounts))
+	monkeypatch.setenv('ANYROUTER_JOURNAL_FILE', str(tmp_path / 'checkpoint.jsonl'))
+	monkeypatch.setenv('ANYROUTER_RESUME', '1')
+	monkeypatch.setenv('ANYROUTER_PRECHECK', '0')
+	monkeypatch.setenv('ANYROUTER_HISTORY_FILE', '')
+	calls = []
+
+	async def crashing_check_in(account_info, account_index, *args):
+		calls.append(account_index)
+		if account_index == 3:
+			raise KeyboardInterrupt
+		return True, None
+
+	# 第一次运行在第 4 个账号时进程中断，前 3 个账号的结果已经写入日志
+	monkeypatch.setattr(checkin, 'check_in_account', crashing_check_in)
+	with pytest.raises(KeyboardInterrupt):
+		asyncio.run(checkin.main())
+	assert calls == [0, 1, 2, 3]
+
+	async def check_in(account_info, account_index, *args):
+		calls.append(account_index)
+		return True, None
+
+	calls.clear()
+	monkeypatch.setattr(checkin, 'check_in_account', check_in)
+	content = run_main(monkeypatch)
+	assert calls == [3, 4]
+	assert all(f'[SUCCESS] Account {i + 1}' in content for i in range(5))
+	assert '[INFO] Resumed from checkpoint: 3/5' in content
+
+	# 上次运行已完整结束，再次恢复时重新处理所有账号
+	calls.clear()
+	run_main(monkeypatch)
+	assert calls == [0, 1, 2, 3, 4]
+
+
+def test_unwritable_state_dir_does_not_stop_the_run(monkeypatch, tmp_path):
+	blocker = tmp_path / 'blocker'
+	blocker.write_text('')
+	monkeypatch.setenv('ANYROUTER_STATE_DIR', str(blocker / 'state'))
+	for name in ('ANYROUTER_JOURNAL_FILE', 'ANYROUTER_RESUME', 'ANYROUTER_TENANTS', 'ANYROUTER_TENANTS_FILE'):
+		monkeypatch.delenv(name, raising=False)
+	monkeypatch.setenv('ANYROUTER_PRECHECK', '0')
+	monkeypatch.setattr(checkin, 'get_waf_cookies_with_playwright', make_waf_fetcher())
+
+	with FakeAnyRouter() as server:
+		accounts = [
+			{'cookies': {'session': f's{i}'}, 'api_user': str(i), 'base_url': server.base_url} for i in range(2)
+		]
+		monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps(accounts))
+		with patch.object(checkin.notify, 'push_message') as mock_push, pytest.raises(SystemExit) as exit_info:
+			asyncio.run(checkin.main())
+
+	assert exit_info.value.code == 0
+	assert server.sign_ins == 2
+	assert '[SUCCESS] Success: 2/2' in mock_push.call_args[0][1]
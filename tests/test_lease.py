@@ -0,0 +1,164 @@
+import asyncio
+import json
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import checkin
+from journal import account_keys
+from lease import RunLease, accounts_digest
+
+
+class FakeClock:
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+
+def test_lease_expires_without_heartbeat_and_can_be_taken_over(tmp_path):
+	clock = FakeClock()
+	path = tmp_path / 'run.lease'
+	first = RunLease(path, ttl=60, clock=clock, owner='first')
+	second = RunLease(path, ttl=60, clock=clock, owner='second')
+
+	assert first.try_acquire() is None
+	assert second.try_acquire()['owner'] == 'first'
+
+	# 心跳续期后过期时间顺延
+	clock.now += 30
+	assert first.renew()
+	clock.now += 59
+	assert second.try_acquire() is not None
+
+	clock.now += 2
+	assert second.try_acquire() is None
+	assert second.previous['owner'] == 'first'
+	# 被接管的持有者续期失败，不会覆盖新的租约
+	assert not first.renew()
+
+	second.complete = True
+	second.release()
+	assert first.try_acquire() is None
+	assert first.previous['complete'] is True
+	assert not (tmp_path / 'run.lease.lock').exists()
+
+
+def test_exited_local_holder_is_taken_over_immediately(tmp_path):
+	path = tmp_path / 'run.lease'
+	dead = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+	RunLease(path, owner='dead').try_acquire()
+	record = json.loads(path.read_text(encoding='utf-8'))
+	path.write_text(json.dumps({**record, 'pid': int(dead.stdout)}), encoding='utf-8')
+
+	# 共享目录中的租约只能等待过期
+	assert RunLease(path, local=False).try_acquire()['owner'] == 'dead'
+	assert RunLease(path).try_acquire() is None
+
+
+def test_main_exits_while_another_run_holds_the_lease(monkeypatch, tmp_path):
+	monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps([{'cookies': {'session': 's'}, 'api_user': '1'}]))
+	monkeypatch.setenv('ANYROUTER_STATE_DIR', str(tmp_path))
+	monkeypatch.delenv('ANYROUTER_LEASE_DIR', raising=False)
+	RunLease.from_env().try_acquire()
+
+	async def check_in(*args, **kwargs):
+		raise AssertionError('accounts must not be processed twice')
+
+	monkeypatch.setattr(checkin, 'check_in_account', check_in)
+	with patch.object(checkin.notify, 'push_message') as mock_push, pytest.raises(SystemExit) as exit_info:
+		asyncio.run(checkin.main())
+	assert exit_info.value.code == 0
+	mock_push.assert_not_called()
+
+
+@pytest.mark.parametrize('complete', [True, False])
+def test_waiting_run_follows_the_previous_run(monkeypatch, tmp_path, complete):
+	monkeypatch.setenv('ANYROUTER_LEASE_WAIT', '10')
+	keys = account_keys([{'cookies': {'session': 's'}, 'api_user': '1'}])
+	holder = RunLease(tmp_path / 'run.lease', owner='holder')
+	holder.meta = {'accounts': accounts_digest(keys)}
+	holder.try_acquire()
+
+	async def run():
+		waiter = RunLease(tmp_path / 'run.lease')
+		task = asyncio.create_task(checkin.acquire_run_lease(waiter, keys, resume=False))
+		await asyncio.sleep(0.2)
+		assert not task.done()
+		holder.complete = complete
+		holder.release()
+		try:
+			return await task
+		finally:
+			await waiter.close()
+
+	if complete:
+		# 前一个运行已经签到了同样的账号，不再重复
+		with pytest.raises(SystemExit) as exit_info:
+			asyncio.run(run())
+		assert exit_info.value.code == 0
+	else:
+		# 前一个运行没有完成，从它的检查点恢复
+		assert asyncio.run(run()) is True
+
+
+def test_busy_guard_does_not_block_the_event_loop(tmp_path):
+	lease = RunLease(tmp_path / 'run.lease')
+	lease.guard.mkdir(parents=True)
+	ticks = 0
+
+	async def tick():
+		nonlocal ticks
+		while True:
+			ticks += 1
+			await asyncio.sleep(0.01)
+
+	async def run():
+		ticker = asyncio.create_task(tick())
+		# 另一个进程持有锁目录 0.3 秒，等待期间其他协程照常运行
+		asyncio.get_running_loop().call_later(0.3, lease.guard.rmdir)
+		try:
+			return await lease.acquire()
+		finally:
+			ticker.cancel()
+			await lease.close()
+
+	assert asyncio.run(run()) is None
+	assert ticks >= 10
+
+
+def test_run_stops_dispatching_after_the_lease_is_taken_over(monkeypatch, tmp_path):
+	accounts = [{'cookies': {'session': f's{i}'}, 'api_user': str(i)} for i in range(3)]
+	monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps(accounts))
+	monkeypatch.setenv('ANYROUTER_STATE_DIR', str(tmp_path))
+	monkeypatch.setenv('ANYROUTER_LEASE_TTL', '0.3')
+	monkeypatch.setenv('ANYROUTER_PRECHECK', '0')
+	monkeypatch.delenv('ANYROUTER_LEASE_DIR', raising=False)
+	path = RunLease.from_env().path
+	calls = []
+
+	async def check_in(account_info, account_index, *args):
+		calls.append(account_index)
+		# 第一个账号签到期间，另一个运行接管了租约
+		record = json.loads(path.read_text(encoding='utf-8'))
+		path.write_text(json.dumps({**record, 'owner': 'other'}), encoding='utf-8')
+		await asyncio.sleep(0.3)
+		return True, None
+
+	monkeypatch.setattr(checkin, 'check_in_account', check_in)
+	with patch.object(checkin.notify, 'push_message') as mock_push, pytest.raises(SystemExit):
+		asyncio.run(checkin.main())
+
+	assert calls == [0]
+	content = mock_push.call_args[0][1]
+	assert '[SKIP] Account 2 skipped (run lease lost)' in content
+	assert '[SKIP] Account 3 skipped (run lease lost)' in content
+	# 被接管后不释放租约，不覆盖新持有者的记录
+	assert json.loads(path.read_text(encoding='utf-8'))['owner'] == 'other'
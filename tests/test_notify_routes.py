@@ -0,0 +1,87 @@
+import asyncio
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fake_anyrouter import FakeAnyRouter, make_waf_fetcher
+
+import checkin
+import notify
+from breaker import CircuitBreaker
+from notify_routes import account_targets, deliver_routes, target_id
+
+
+def test_account_targets_ignore_incomplete_channels():
+	config = {'DINGDING_WEBHOOK': 'https://ding/a', 'EMAIL_USER': 'bot@example.com', 'EMAIL_TO': 'me@example.com'}
+	assert account_targets(config) == [('DingTalk', (('DINGDING_WEBHOOK', 'https://ding/a'),))]
+	assert account_targets(None) == []
+	assert 'ding/a' not in target_id(account_targets(config)[0])
+
+
+def test_each_target_gets_one_batched_message_with_bounded_parallelism(monkeypatch, tmp_path, capsys):
+	lock = threading.Lock()
+	posts = []
+	in_flight = peak = 0
+
+	def fake_post(url, data):
+		nonlocal in_flight, peak
+		with lock:
+			in_flight += 1
+			peak = max(peak, in_flight)
+		time.sleep(0.01)
+		with lock:
+			in_flight -= 1
+			posts.append((url, data['text']['content']))
+		if url.endswith('/7'):
+			raise RuntimeError('webhook returned 500')
+
+	monkeypatch.setattr(notify, '_post', fake_post)
+	results = [
+		({'DINGDING_WEBHOOK': f'https://ding.example.com/{i % 50}'}, 'success', f'[SUCCESS] Account {i + 1}')
+		for i in range(1000)
+	]
+	breaker = CircuitBreaker(tmp_path / 'breaker.json')
+	delivered = asyncio.run(deliver_routes(results, 'AnyRouter Check-in Results', concurrency=4, breaker=breaker))
+
+	assert len(posts) == 50
+	assert peak <= 4
+	content = dict(posts)['https://ding.example.com/3']
+	assert content.count('[SUCCESS] Account') == 20
+	assert '[SUCCESS] Account 4\n' in content and '[STATS] Success: 20/20' in content
+	assert sum(delivered.values()) == 49
+	failed = target_id(account_targets(results[7][0])[0])
+	assert delivered[failed] is False and breaker.channels[failed]['failures'] == 1
+	output = capsys.readouterr().out
+	assert '[NOTIFY] Per-account notifications: 49/50 targets delivered' in output
+	assert 'ding.example.com' not in output
+
+
+def test_main_routes_account_results_to_their_own_targets(monkeypatch, tmp_path):
+	monkeypatch.setenv('ANYROUTER_STATE_DIR', str(tmp_path))
+	monkeypatch.setenv('ANYROUTER_PRECHECK', '0')
+	monkeypatch.delenv('ANYROUTER_TENANTS', raising=False)
+	monkeypatch.setattr(checkin, 'get_waf_cookies_with_playwright', make_waf_fetcher())
+
+	with FakeAnyRouter() as server:
+		shared = {'DINGDING_WEBHOOK': f'{server.base_url}/webhook/shared'}
+		accounts = [
+			{'cookies': {'session': 's1'}, 'api_user': '1', 'base_url': server.base_url, 'notify': shared},
+			{'cookies': {'session': 's2'}, 'api_user': '2', 'base_url': server.base_url},
+			{'cookies': {'session': 's3'}, 'api_user': '3', 'base_url': server.base_url, 'notify': shared},
+		]
+		monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps(accounts))
+		with patch.object(checkin.notify, 'push_message'), pytest.raises(SystemExit):
+			asyncio.run(checkin.main())
+
+	assert [path for path, _ in server.webhooks] == ['/webhook/shared']
+	content = server.webhooks[0][1]['text']['content']
+	assert '[SUCCESS] Account 1' in content and '[SUCCESS] Account 3' in content
+	assert 'Account 2' not in content
@@ -0,0 +1,135 @@
+"""
+性能回归门禁
+
+使用进程内的假 AnyRouter 服务和 webhook 接收端运行真实的签到流程，将吞吐量、
+单账号延迟和 RSS 增长与 tests/perf_baseline.json 中的基线比较，超出容忍范围即失败。
+
+- PERF_TOLERANCE_SCALE: 按比例放宽所有容忍范围，例如在较慢的 CI 机器上设为 2
+- PERF_UPDATE_BASELINE=1: 用本次结果重写基线文件
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fake_anyrouter import FakeAnyRouter, make_waf_fetcher
+
+import checkin
+from notify import NotificationKit
+
+BASELINE_FILE = Path(__file__).parent / 'perf_baseline.json'
+
+SCENARIOS = {
+	'single_account': {'accounts': 1, 'concurrency': 1, 'waf_rotate_every': 0},
+	'accounts_100': {'accounts': 100, 'concurrency': 10, 'waf_rotate_every': 0},
+	'waf_refresh_heavy': {'accounts': 100, 'concurrency': 10, 'waf_rotate_every': 25},
+}
+
+# 模拟网络往返和浏览器启动的耗时，使结果反映流程结构而不是本机 CPU
+SERVER_LATENCY = 0.01
+BROWSER_LAUNCH = 0.2
+
+
+def current_rss() -> int:
+	"""当前进程的 RSS，单位字节"""
+	try:
+		with open('/proc/self/statm') as f:
+			return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+	except OSError:
+		import resource
+
+		return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_scenario(monkeypatch, tmp_path, accounts, concurrency, waf_rotate_every):
+	with FakeAnyRouter(latency=SERVER_LATENCY, waf_rotate_every=waf_rotate_every) as server:
+		account_list = [{'cookies': {'session': f'session-{i}'}, 'api_user': str(10000 + i)} for i in range(accounts)]
+		monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps(account_list))
+		monkeypatch.setenv('ANYROUTER_BASE_URL', server.base_url)
+		monkeypatch.setenv('ANYROUTER_CONCURRENCY', str(concurrency))
+		monkeypatch.setenv('ANYROUTER_STATE_DIR', str(tmp_path))
+		monkeypatch.setenv('DINGDING_WEBHOOK', f'{server.base_url}/webhook/dingtalk')
+		monkeypatch.setenv('NOTIFY_BREAKER_FILE', str(tmp_path / 'breaker.json'))
+		monkeypatch.setattr(checkin, 'notify', NotificationKit())
+		monkeypatch.setattr(checkin, 'get_waf_cookies_with_playwright', make_waf_fetcher(BROWSER_LAUNCH))
+
+		latencies = []
+		real_check_in = checkin.check_in_account
+
+		async def timed_check_in(*args, **kwargs):
+			start = time.perf_counter()
+			try:
+				return await real_check_in(*args, **kwargs)
+			finally:
+				latencies.append(time.perf_counter() - start)
+
+		monkeypatch.setattr(checkin, 'check_in_account', timed_check_in)
+
+		rss_before = current_rss()
+		start = time.perf_counter()
+		with pytest.raises(SystemExit) as exit_info:
+			asyncio.run(checkin.main())
+		elapsed = time.perf_counter() - start
+		rss_after = current_rss()
+
+		assert exit_info.value.code == 0
+		assert server.sign_ins == accounts
+		assert len(server.webhooks) == 1
+
+		ordered = sorted(latencies)
+		return {
+			'throughput': accounts / elapsed,
+			'latency_p50': statistics.median(ordered),
+			'latency_p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+			'rss_growth_mb': max(0.0, (rss_after - rss_before) / 1024 / 1024),
+			'waf_fetches': server.logins,
+			'challenges': server.challenges,
+		}
+
+
+def check_against_baseline(name, metrics):
+	baseline = json.loads(BASELINE_FILE.read_text(encoding='utf-8'))
+	if os.getenv('PERF_UPDATE_BASELINE') == '1':
+		baseline['scenarios'][name] = {key: round(value, 4) for key, value in metrics.items()}
+		BASELINE_FILE.write_text(json.dumps(baseline, indent=2) + '\n', encoding='utf-8')
+		return
+
+	expected = baseline['scenarios'][name]
+	scale = float(os.getenv('PERF_TOLERANCE_SCALE', '1'))
+	tolerances = baseline['tolerances']
+
+	min_throughput = expected['throughput'] * max(0.0, 1 - tolerances['throughput_drop'] * scale)
+	max_latency = expected['latency_p95'] * (1 + tolerances['latency_growth'] * scale)
+	max_rss = expected['rss_growth_mb'] + tolerances['rss_growth_mb'] * scale
+
+	problems = []
+	if metrics['throughput'] < min_throughput:
+		problems.append(f'throughput {metrics["throughput"]:.2f}/s < {min_throughput:.2f}/s')
+	if metrics['latency_p95'] > max_latency:
+		problems.append(f'p95 latency {metrics["latency_p95"]:.3f}s > {max_latency:.3f}s')
+	if metrics['rss_growth_mb'] > max_rss:
+		problems.append(f'RSS growth {metrics["rss_growth_mb"]:.1f}MB > {max_rss:.1f}MB')
+	assert not problems, f'{name} regressed: ' + '; '.join(problems)
+
+
+@pytest.mark.perf
+@pytest.mark.parametrize('name', list(SCENARIOS))
+def test_perf_regression(name, monkeypatch, tmp_path, capsys):
+	metrics = run_scenario(monkeypatch, tmp_path, **SCENARIOS[name])
+	with capsys.disabled():
+		print(f'\n[PERF] {name}: ' + ', '.join(f'{key}={value:.3f}' for key, value in metrics.items()))
+	check_against_baseline(name, metrics)
+
+
+def test_waf_cookies_shared_across_accounts(monkeypatch, tmp_path):
+	metrics = run_scenario(monkeypatch, tmp_path, accounts=20, concurrency=5, waf_rotate_every=0)
+	assert metrics['waf_fetches'] == 1
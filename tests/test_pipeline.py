@@ -0,0 +1,119 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fake_anyrouter import FakeAnyRouter, make_waf_fetcher
+
+import checkin
+from pipeline import Pipeline, Stage
+
+
+def test_stages_overlap_through_bounded_queues():
+	done = []
+
+	async def slow(item):
+		await asyncio.sleep(0.02)
+		return item
+
+	async def fast(item):
+		await asyncio.sleep(0.001)
+		done.append(item)
+		return item
+
+	async def broken(item):
+		if item == 3:
+			raise ValueError('boom')
+		return item
+
+	async def run():
+		pipeline = Pipeline([Stage('slow', slow, workers=2, queue_size=2), Stage('fast', fast, queue_size=2)])
+		await pipeline.run(range(10))
+		return pipeline
+
+	pipeline = asyncio.run(run())
+	assert sorted(done) == list(range(10))
+	slow_stage, fast_stage = pipeline.stages
+	assert slow_stage.processed == fast_stage.processed == 10
+	assert slow_stage.max_depth <= 2 and fast_stage.max_depth <= 2
+	# 慢阶段的两个 worker 一直忙碌，快阶段大部分时间在等待
+	assert slow_stage.utilization(pipeline.elapsed) > 0.5
+	assert fast_stage.utilization(pipeline.elapsed) < slow_stage.utilization(pipeline.elapsed)
+	assert pipeline.report_lines()[0].startswith('[PIPELINE] slow: 2 workers, 10 accounts, utilization')
+
+	# 处理失败的条目被丢弃，不会让流水线卡住
+	failing = Pipeline([Stage('broken', broken), Stage('fast', fast)])
+	done.clear()
+	asyncio.run(failing.run(range(5)))
+	assert failing.stages[1].processed == 4
+
+
+def test_main_runs_accounts_through_pipeline(monkeypatch, tmp_path, capsys):
+	with FakeAnyRouter(latency=0.01, expired_sessions={'s4'}) as first, FakeAnyRouter(latency=0.01) as second:
+		accounts = [
+			{'cookies': {'session': f's{i}'}, 'api_user': str(i), 'base_url': server.base_url}
+			for i, server in enumerate([first, second] * 3)
+		]
+		monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps(accounts))
+		monkeypatch.setenv('ANYROUTER_STATE_DIR', str(tmp_path))
+		monkeypatch.setenv('ANYROUTER_PIPELINE', '1')
+		monkeypatch.setenv('ANYROUTER_PRECHECK', '0')
+		monkeypatch.setenv('ANYROUTER_CONCURRENCY', '2')
+		monkeypatch.setattr(checkin, 'get_waf_cookies_with_playwright', make_waf_fetcher(0.1))
+
+		with patch.object(checkin.notify, 'push_message') as mock_push, pytest.raises(SystemExit) as exit_info:
+			asyncio.run(checkin.main())
+
+	assert exit_info.value.code == 0
+	assert (first.logins, second.logins) == (1, 1)
+	assert (first.sign_ins, second.sign_ins) == (2, 3)
+
+	content = mock_push.call_args[0][1]
+	assert '[SUCCESS] Success: 5/6' in content
+	# 通知内容按配置顺序排列
+	assert content.index('Account 1 ') < content.index('Account 2 ') < content.index('Account 6 ')
+	output = capsys.readouterr().out
+	for stage in ('waf', 'http', 'sink'):
+		assert f'[PIPELINE] {stage}: ' in output
+	records = [json.loads(line) for line in (tmp_path / 'checkpoint.jsonl').read_text(encoding='utf-8').splitlines()]
+	assert sum(1 for record in records if record.get('type') == 'result') == 6
+
+
+def test_waf_refresh_in_http_stage_respects_waf_workers(monkeypatch, tmp_path):
+	fetch = make_waf_fetcher(0.05)
+	in_flight = peak = fetches = 0
+
+	async def counting_fetch(*args, **kwargs):
+		nonlocal in_flight, peak, fetches
+		in_flight += 1
+		fetches += 1
+		peak = max(peak, in_flight)
+		try:
+			return await fetch(*args, **kwargs)
+		finally:
+			in_flight -= 1
+
+	with FakeAnyRouter(waf_rotate_every=2) as first, FakeAnyRouter(waf_rotate_every=2) as second:
+		accounts = [
+			{'cookies': {'session': f's{i}'}, 'api_user': str(i), 'base_url': server.base_url}
+			for i, server in enumerate([first, second] * 3)
+		]
+		monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps(accounts))
+		monkeypatch.setenv('ANYROUTER_STATE_DIR', str(tmp_path))
+		monkeypatch.setenv('ANYROUTER_PIPELINE', '1')
+		monkeypatch.setenv('ANYROUTER_PRECHECK', '0')
+		monkeypatch.setenv('ANYROUTER_WAF_WORKERS', '1')
+		monkeypatch.setattr(checkin, 'get_waf_cookies_with_playwright', counting_fetch)
+
+		with patch.object(checkin.notify, 'push_message'), pytest.raises(SystemExit):
+			asyncio.run(checkin.main())
+
+	# 签到阶段刷新 WAF cookies 时也要等浏览器阶段的名额
+	assert fetches > 2
+	assert peak == 1
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fake_anyrouter import FakeAnyRouter, FakeProxy, make_waf_fetcher
+
+import checkin
+from proxy_pool import ProxyPool
+from waf_cache import DIRECT, WafCookieCache
+
+
+def run_main(monkeypatch, tmp_path, server, store_cookies):
+	accounts = [{'cookies': {'session': f's{i}'}, 'api_user': str(i)} for i in range(3)]
+	monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps(accounts))
+	monkeypatch.setenv('ANYROUTER_BASE_URL', server.base_url)
+	monkeypatch.setenv('ANYROUTER_STATE_DIR', str(tmp_path))
+	if store_cookies:
+		# 上一次运行保存的 WAF cookies
+		key = WafCookieCache._store_key([server.base_url, DIRECT])
+		store = {key: {'cookies': server.waf_cookies(), 'saved_at': time.time() - 30}}
+		(tmp_path / 'waf_cookies.json').write_text(json.dumps(store), encoding='utf-8')
+
+	launches = []
+	fetch = make_waf_fetcher()
+
+	async def counting_fetch(account_name, *args, **kwargs):
+		launches.append(account_name)
+		return await fetch(account_name, *args, **kwargs)
+
+	monkeypatch.setattr(checkin, 'get_waf_cookies_with_playwright', counting_fetch)
+	with patch.object(checkin.notify, 'push_message') as mock_push, pytest.raises(SystemExit):
+		asyncio.run(checkin.main())
+	return mock_push.call_args[0][1], launches
+
+
+def test_expired_session_reported_without_browser(monkeypatch, tmp_path):
+	with FakeAnyRouter(expired_sessions={'s1'}) as server:
+		content, launches = run_main(monkeypatch, tmp_path, server, store_cookies=True)
+
+	assert launches == []
+	assert server.sign_ins == 2
+	assert '[FAIL] Account 2: session expired, please refresh' in content
+	assert '[SUCCESS] Account 1' in content
+
+
+def test_precheck_is_skipped_without_waf_cookies(monkeypatch, tmp_path, capsys):
+	with FakeAnyRouter(expired_sessions={'s1'}) as server:
+		content, launches = run_main(monkeypatch, tmp_path, server, store_cookies=False)
+
+	# 没有可用的 WAF cookies 时预检必然遇到 WAF 挑战，不发送预检请求，所有账号照常签到
+	assert '[PRECHECK] Skipped, no WAF cookies cached yet' in capsys.readouterr().out
+	assert server.challenges == 0
+	assert len(launches) == 1
+	assert server.sign_ins == 2
+	assert '[FAIL] Account 2' in content
+	assert 'session expired' not in content
+	# 获取到的 WAF cookies 已保存，供下次运行预检和签到使用
+	assert json.loads((tmp_path / 'waf_cookies.json').read_text(encoding='utf-8'))
+
+
+def test_precheck_uses_the_proxy_pool(monkeypatch):
+	with FakeAnyRouter() as server, FakeProxy() as proxy:
+		monkeypatch.setenv('ANYROUTER_BASE_URL', server.base_url)
+
+		async def fetch(key, label):
+			return server.waf_cookies()
+
+		async def run():
+			ctx = checkin.RunContext(waf_cache=WafCookieCache(fetch), proxy_pool=ProxyPool([proxy.url]))
+			# 代理出口已有 WAF cookies，预检可以得出结论
+			await ctx.waf_cache.get((server.base_url, proxy.url))
+			try:
+				return await checkin.precheck_sessions(ctx, [{'cookies': {'session': 's'}, 'api_user': '1'}])
+			finally:
+				await ctx.sites.aclose()
+
+		statuses = asyncio.run(run())
+
+	assert statuses == [checkin.SESSION_VALID]
+	# 预检请求经过代理池中的代理，而不是从本机直接发出
+	assert proxy.requests == 1
+
+
+def test_precheck_and_check_in_share_the_proxy(monkeypatch, tmp_path):
+	with FakeAnyRouter() as server, FakeProxy() as first, FakeProxy() as second:
+		monkeypatch.setenv('ANYROUTER_PROXIES', f'{first.url},{second.url}')
+		# 上一次运行通过第一个代理保存的 WAF cookies
+		key = WafCookieCache._store_key([server.base_url, first.url])
+		store = {key: {'cookies': server.waf_cookies(), 'saved_at': time.time() - 30}}
+		(tmp_path / 'waf_cookies.json').write_text(json.dumps(store), encoding='utf-8')
+		monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps([{'cookies': {'session': 's'}, 'api_user': '1'}]))
+		monkeypatch.setenv('ANYROUTER_BASE_URL', server.base_url)
+		monkeypatch.setenv('ANYROUTER_STATE_DIR', str(tmp_path))
+		monkeypatch.setattr(checkin, 'get_waf_cookies_with_playwright', make_waf_fetcher())
+		with patch.object(checkin.notify, 'push_message'), pytest.raises(SystemExit):
+			asyncio.run(checkin.main())
+
+	assert server.sign_ins == 1
+	# 预检、签到和签到后的余额查询都经过同一个代理，另一个代理没有被占用
+	assert (first.requests, second.requests) == (3, 0)
+
+
+def test_persisted_cookies_respect_max_age(tmp_path):
+	store = tmp_path / 'waf_cookies.json'
+	key = WafCookieCache._store_key(DIRECT)
+	store.write_text(json.dumps({key: {'cookies': {'acw_tc': 'old'}, 'saved_at': time.time() - 120}}))
+
+	assert WafCookieCache(None, max_age=600, store=store).peek() == {'acw_tc': 'old'}
+	assert WafCookieCache(None, max_age=60, store=store).peek() is None
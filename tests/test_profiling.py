@@ -0,0 +1,53 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import checkin
+import profiling
+
+
+def test_profiling_requested(monkeypatch):
+	monkeypatch.delenv('ANYROUTER_PROFILE', raising=False)
+	assert not profiling.profiling_requested([])
+	assert profiling.profiling_requested(['--profile'])
+
+	monkeypatch.setenv('ANYROUTER_PROFILE', 'true')
+	assert profiling.profiling_requested([])
+
+
+def test_helpers_are_noops_when_disabled():
+	async def run():
+		async with profiling.span('noop'):
+			profiling.mark('noop')
+		profiling.start_lag_sampler()
+
+	asyncio.run(run())
+
+
+def test_run_main_writes_profile(tmp_path, monkeypatch):
+	accounts = [{'cookies': {'session': f's{i}'}, 'api_user': str(i)} for i in range(3)]
+	monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps(accounts))
+	monkeypatch.setenv('ANYROUTER_PROFILE', '1')
+	monkeypatch.setenv('ANYROUTER_PROFILE_DIR', str(tmp_path))
+
+	async def fake_check_in(account_info, account_index, *args):
+		await asyncio.sleep(0.01 * (account_index + 1))
+		return True, None
+
+	monkeypatch.setattr(checkin, 'check_in_account', fake_check_in)
+	with patch.object(checkin.notify, 'push_message'), pytest.raises(SystemExit):
+		checkin.run_main()
+
+	assert (tmp_path / 'profile.pstats').exists()
+	summary = (tmp_path / 'summary.txt').read_text(encoding='utf-8')
+	assert 'checkins_done' in summary
+	assert 'account Account 3' in summary
+	assert '== Event loop lag ==' in summary
+	assert profiling._active is None
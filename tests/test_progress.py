@@ -0,0 +1,107 @@
+import asyncio
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import checkin
+from progress import ProgressReporter
+
+
+class SlowNotifier:
+	def __init__(self, delay=0.0):
+		self.delay = delay
+		self.messages = []
+		self.threads = set()
+
+	def push_message(self, title, content, msg_type='text'):
+		self.threads.add(threading.get_ident())
+		time.sleep(self.delay)
+		self.messages.append((title, content))
+
+
+def run_reporter(reporter, feed):
+	async def run():
+		reporter.start()
+		await feed(reporter)
+		await reporter.close()
+
+	asyncio.run(run())
+
+
+def test_sends_every_n_accounts_in_background():
+	notifier = SlowNotifier(delay=0.2)
+	reporter = ProgressReporter(notifier, total=7, every=3, min_interval=0)
+	add_times = []
+
+	async def feed(reporter):
+		for i in range(7):
+			start = time.perf_counter()
+			reporter.add('success', f'[SUCCESS] Account {i + 1}')
+			add_times.append(time.perf_counter() - start)
+			await asyncio.sleep(0.1)
+		await asyncio.sleep(0.3)
+
+	run_reporter(reporter, feed)
+	assert max(add_times) < 0.01
+	assert threading.get_ident() not in notifier.threads
+	assert [content.splitlines()[0] for _, content in notifier.messages] == [
+		'[PROGRESS] 3/7 accounts done, 3 successful',
+		'[PROGRESS] 6/7 accounts done, 6 successful',
+	]
+
+
+def test_min_interval_merges_batches_and_cap_limits_messages():
+	notifier = SlowNotifier()
+	reporter = ProgressReporter(notifier, total=20, every=2, min_interval=0.3, max_messages=2)
+
+	async def feed(reporter):
+		for i in range(20):
+			reporter.add('failed' if i % 2 else 'success', f'line {i}')
+			await asyncio.sleep(0.02)
+		await asyncio.sleep(0.5)
+
+	run_reporter(reporter, feed)
+	assert len(notifier.messages) == 2
+	# 第二条在最小间隔之后发出，合并了期间完成的所有账号
+	assert len(notifier.messages[1][1].splitlines()) > 3
+
+
+def test_interval_flushes_without_reaching_n():
+	notifier = SlowNotifier()
+	reporter = ProgressReporter(notifier, total=5, every=0, interval=0.1, min_interval=0)
+
+	async def feed(reporter):
+		reporter.add('success', 'line 0')
+		await asyncio.sleep(0.35)
+
+	run_reporter(reporter, feed)
+	assert len(notifier.messages) == 1
+
+
+def test_main_sends_progress_and_final_summary(monkeypatch, tmp_path):
+	accounts = [{'cookies': {'session': f's{i}'}, 'api_user': str(i)} for i in range(6)]
+	monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps(accounts))
+	monkeypatch.setenv('ANYROUTER_JOURNAL_FILE', str(tmp_path / 'checkpoint.jsonl'))
+	monkeypatch.setenv('ANYROUTER_PROGRESS_EVERY', '2')
+	monkeypatch.setenv('ANYROUTER_PROGRESS_MIN_INTERVAL', '0')
+	monkeypatch.setenv('ANYROUTER_PRECHECK', '0')
+
+	async def check_in(account_info, account_index, *args):
+		await asyncio.sleep(0.05)
+		return True, None
+
+	monkeypatch.setattr(checkin, 'check_in_account', check_in)
+	with patch.object(checkin.notify, 'push_message') as mock_push, pytest.raises(SystemExit):
+		asyncio.run(checkin.main())
+
+	titles = [call.args[0] for call in mock_push.call_args_list]
+	assert titles[-1] == 'AnyRouter Check-in Results'
+	assert 'AnyRouter Check-in Progress' in titles
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import checkin
+from quarantine import AccountQuarantine
+from results import Failure
+
+ACCOUNT = {'cookies': {'session': 's'}, 'api_user': '1'}
+
+
+class FakeClock:
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+
+def test_consecutive_failures_of_same_kind_quarantine_account():
+	clock = FakeClock()
+	book = AccountQuarantine(threshold=3, probe_interval=100, max_probe_interval=300, clock=clock)
+	book.record('a', ACCOUNT, 'A', False, Failure.SESSION)
+	book.record('a', ACCOUNT, 'A', False, Failure.REJECTED)
+	book.record('a', ACCOUNT, 'A', False, Failure.WAF)
+	book.record('a', ACCOUNT, 'A', False, Failure.REJECTED)
+	assert book.check('a', ACCOUNT) is None
+
+	book.record('a', ACCOUNT, 'A', False, Failure.REJECTED)
+	entry = book.check('a', ACCOUNT)
+	assert entry['streak'] == 3
+	assert book.transitions == ['[QUARANTINE] A: quarantined after 3 consecutive rejected failures']
+
+	# 探测失败后间隔翻倍，不超过上限
+	for interval in (100, 200, 300):
+		clock.now += interval - 1
+		assert book.check('a', ACCOUNT) is not None
+		clock.now += 1
+		assert book.check('a', ACCOUNT) is None
+		book.record('a', ACCOUNT, 'A', False, Failure.REJECTED)
+
+	clock.now += 300
+	book.record('a', ACCOUNT, 'A', True)
+	assert book.check('a', ACCOUNT) is None
+	assert book.transitions[-1] == '[QUARANTINE] A: probe succeeded, released'
+
+
+def test_changed_account_config_lifts_quarantine(tmp_path):
+	path = tmp_path / 'health.json'
+	book = AccountQuarantine(path, threshold=1)
+	book.record('a', ACCOUNT, 'A', False, Failure.SESSION)
+	book.save()
+
+	reloaded = AccountQuarantine(path, threshold=1)
+	assert reloaded.check('a', ACCOUNT) is not None
+	assert reloaded.check('a', {**ACCOUNT, 'cookies': {'session': 'new'}}) is None
+
+
+def test_main_reports_quarantined_accounts_separately(monkeypatch, tmp_path):
+	accounts = [{'cookies': {'session': f's{i}'}, 'api_user': str(i)} for i in range(3)]
+	monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps(accounts))
+	monkeypatch.setenv('ANYROUTER_STATE_DIR', str(tmp_path))
+	monkeypatch.setenv('ANYROUTER_PRECHECK', '0')
+	monkeypatch.setenv('ANYROUTER_QUARANTINE_AFTER', '2')
+	calls = []
+
+	async def check_in(account_info, account_index, ctx, label, result):
+		calls.append(account_index)
+		if account_index == 1:
+			result.fail(Failure.REJECTED, 'invalid session')
+			return False, None
+		return True, None
+
+	monkeypatch.setattr(checkin, 'check_in_account', check_in)
+
+	def run():
+		calls.clear()
+		with patch.object(checkin.notify, 'push_message') as mock_push, pytest.raises(SystemExit):
+			asyncio.run(checkin.main())
+		return mock_push.call_args[0][1]
+
+	run()
+	content = run()
+	assert '[QUARANTINE] Account 2: quarantined after 2 consecutive rejected failures' in content
+
+	content = run()
+	assert sorted(calls) == [0, 2]
+	assert '[QUARANTINE] Account 2: 2 consecutive rejected failures, next probe at' in content
+	assert '[FAIL] Failed: 0/3' in content
+	assert '[QUARANTINE] Quarantined: 1/3' in content
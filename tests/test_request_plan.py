@@ -0,0 +1,76 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fake_anyrouter import FakeAnyRouter
+
+import checkin
+
+
+def run_plan(server, plan, session='s'):
+	"""返回 (是否成功, 用户信息)"""
+
+	async def run():
+		cookies = {**server.waf_cookies(), 'session': session}
+		async with httpx.AsyncClient() as client:
+			return await checkin.execute_check_in(client, 'Account 1', '1', server.base_url, cookies, plan=plan)
+
+	return asyncio.run(run())
+
+
+def test_sequential_reports_reward():
+	with FakeAnyRouter() as server:
+		success, user_info = run_plan(server, checkin.SEQUENTIAL)
+	assert success
+	assert user_info == ':money: Current balance: $30.0, Used: $1.0, Reward: +$25.0'
+
+
+def test_skip_balance_sends_only_sign_in():
+	with FakeAnyRouter() as server:
+		success, user_info = run_plan(server, checkin.SKIP_BALANCE)
+	assert success
+	assert user_info is None
+	assert server.api_requests == 1
+
+
+def test_balance_after_shows_balance_without_reward():
+	with FakeAnyRouter() as server:
+		success, user_info = run_plan(server, checkin.BALANCE_AFTER)
+	assert success
+	assert user_info == ':money: Current balance: $30.0, Used: $1.0'
+	assert server.api_requests == 2
+
+
+def test_expired_session_reports_no_balance():
+	with FakeAnyRouter(expired_sessions={'s'}) as server:
+		success, user_info = run_plan(server, checkin.SEQUENTIAL)
+	assert not success
+	assert user_info is None
+	assert server.sign_ins == 0
+
+
+def test_request_order_per_plan():
+	user_info, sign_in = 'GET /api/user/self', 'POST /api/user/sign_in'
+	calls = {}
+	for plan in checkin.REQUEST_PLANS:
+		with FakeAnyRouter() as server:
+			run_plan(server, plan)
+		calls[plan] = server.api_calls
+
+	assert calls[checkin.SKIP_BALANCE] == [sign_in]
+	assert calls[checkin.SEQUENTIAL] == [user_info, sign_in, user_info]
+	assert calls[checkin.BALANCE_AFTER] == [sign_in, user_info]
+
+
+@pytest.mark.parametrize(
+	'value,expected', [('', 'balance_after'), ('SEQUENTIAL', 'sequential'), ('bogus', 'balance_after')]
+)
+def test_request_plan_from_env(monkeypatch, value, expected):
+	monkeypatch.setenv('ANYROUTER_REQUEST_PLAN', value)
+	assert checkin.request_plan() == expected
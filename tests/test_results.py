@@ -0,0 +1,75 @@
+import asyncio
+import csv
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fake_anyrouter import FakeAnyRouter, make_waf_fetcher
+
+import checkin
+from results import AccountResult, Failure, ResultSink
+
+
+def test_records_are_readable_before_close(tmp_path):
+	sink = ResultSink(tmp_path / 'results.ndjson')
+	result = AccountResult(0, 'Account 1', 'anyrouter.top', status='failed')
+	result.fail(Failure.WAF, 'Unable to get WAF cookies')
+	result.fail(Failure.TIMEOUT, 'later failure does not override')
+	result.add_timing('waf', 1.5)
+	sink.write(result)
+
+	record = json.loads((tmp_path / 'results.ndjson').read_text(encoding='utf-8'))
+	assert record['category'] == 'waf'
+	assert record['waf_ms'] == 1500
+	assert record['http_ms'] is None
+	sink.close()
+
+
+def test_csv_header_written_once(tmp_path):
+	path = tmp_path / 'results.csv'
+	for i in range(2):
+		sink = ResultSink(path)
+		sink.write(AccountResult(i, f'Account {i + 1}', status='success', balance=30.0))
+		sink.close()
+
+	rows = list(csv.DictReader(path.open(encoding='utf-8')))
+	assert [row['account'] for row in rows] == ['Account 1', 'Account 2']
+	assert rows[0]['balance'] == '30.0'
+	assert rows[0]['reward'] == ''
+
+
+def test_main_streams_one_record_per_account(monkeypatch, tmp_path):
+	path = tmp_path / 'results.ndjson'
+	with FakeAnyRouter(expired_sessions={'s1'}) as server:
+		accounts = [{'cookies': {'session': f's{i}'}, 'api_user': str(i)} for i in range(3)]
+		accounts.append({'cookies': {}, 'api_user': '3'})
+		monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps(accounts))
+		monkeypatch.setenv('ANYROUTER_BASE_URL', server.base_url)
+		monkeypatch.setenv('ANYROUTER_RESULTS_FILE', str(path))
+		monkeypatch.setenv('ANYROUTER_STATE_DIR', str(tmp_path))
+		monkeypatch.setenv('ANYROUTER_REQUEST_PLAN', 'sequential')
+		monkeypatch.setattr(checkin, 'get_waf_cookies_with_playwright', make_waf_fetcher())
+
+		with patch.object(checkin.notify, 'push_message'), pytest.raises(SystemExit):
+			asyncio.run(checkin.main())
+
+	records = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+	by_index = {record['index']: record for record in records}
+	assert len(records) == 4
+
+	assert by_index[0]['status'] == 'success'
+	assert by_index[0]['category'] == ''
+	assert by_index[0]['reward'] == 25.0
+	assert by_index[0]['waf_ms'] is not None and by_index[0]['http_ms'] is not None
+
+	assert by_index[1]['status'] == 'failed'
+	assert by_index[1]['category'] == Failure.REJECTED
+	assert by_index[1]['error'] == 'HTTP 401'
+
+	assert by_index[3]['category'] == Failure.CONFIG
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import checkin
+from journal import account_keys
+from scheduling import AccountHistory, estimate, predict_makespan, schedule_order
+from sites import Site
+
+UNIT = 0.05
+
+
+def test_predict_makespan_assigns_earliest_free_slot():
+	assert predict_makespan([1, 1, 1, 1, 4], 2) == 6
+	assert predict_makespan([4, 1, 1, 1, 1], 2) == 4
+	assert predict_makespan([], 3) == 0
+
+
+def test_schedule_order_is_longest_first_with_priority_ahead():
+	expected = {0: 1.0, 1: 5.0, 2: 1.02, 3: 3.0}
+	assert schedule_order([0, 1, 2, 3], expected, set()) == [1, 3, 0, 2]
+	assert schedule_order([0, 1, 2, 3], expected, {2}) == [2, 1, 3, 0]
+
+
+def test_history_is_smoothed_and_persisted(tmp_path):
+	path = tmp_path / 'history.json'
+	history = AccountHistory(path, alpha=0.5)
+	history.record('a', 2.0, success=True)
+	history.record('a', 4.0, success=False)
+	assert history.expected('a') == pytest.approx(3.0 * 1.5)
+	history.save()
+
+	reloaded = AccountHistory(path)
+	assert reloaded.expected('a') == pytest.approx(4.5)
+	assert estimate(reloaded, ['b', 'a']) == ([pytest.approx(4.5), pytest.approx(4.5)], 1)
+
+
+def test_history_save_failure_is_logged(tmp_path, capsys):
+	blocker = tmp_path / 'blocker'
+	blocker.write_text('')
+	history = AccountHistory(blocker / 'history.json')
+	history.record('a', 2.0, success=True)
+	history.save()
+	assert '[SCHEDULE] Failed to save account history' in capsys.readouterr().out
+
+
+def test_reserved_slots_leave_one_for_normal_accounts():
+	site = Site('https://a.example.com', concurrency=3)
+	assert site.reserve(5) == 2
+	assert site.slot(priority=True) is not site.slot()
+	assert Site('https://b.example.com', concurrency=1).reserve(1) == 0
+
+
+def run_main(monkeypatch, tmp_path, accounts, durations):
+	monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps(accounts))
+	monkeypatch.setenv('ANYROUTER_STATE_DIR', str(tmp_path))
+	monkeypatch.setenv('ANYROUTER_CONCURRENCY', '2')
+	monkeypatch.setenv('ANYROUTER_PRECHECK', '0')
+	started = []
+
+	async def check_in(account_info, account_index, *args):
+		started.append(account_index)
+		await asyncio.sleep(durations[account_index] * UNIT)
+		return True, None
+
+	monkeypatch.setattr(checkin, 'check_in_account', check_in)
+	with patch.object(checkin.notify, 'push_message') as mock_push, pytest.raises(SystemExit):
+		asyncio.run(checkin.main())
+	return started, mock_push.call_args[0][1]
+
+
+def test_main_starts_slow_accounts_first(monkeypatch, tmp_path, capsys):
+	accounts = [{'cookies': {'session': f's{i}'}, 'api_user': str(i)} for i in range(5)]
+	durations = [1, 1, 1, 1, 4]
+
+	# 第一次运行没有历史，按配置顺序签到并记录耗时
+	started, _ = run_main(monkeypatch, tmp_path, accounts, durations)
+	assert started == [0, 1, 2, 3, 4]
+	history = json.loads((tmp_path / 'account_history.json').read_text(encoding='utf-8'))
+	assert set(history) == set(account_keys(accounts))
+
+	capsys.readouterr()
+	started, content = run_main(monkeypatch, tmp_path, accounts, durations)
+	assert started == [4, 0, 1, 2, 3]
+	# 通知内容仍按配置顺序
+	assert content.index('Account 1') < content.index('Account 5')
+	output = capsys.readouterr().out
+	assert '[SCHEDULE] 5/5 accounts have timing history, predicted makespan 0.2s' in output
+	assert '[SCHEDULE] Predicted makespan 0.2s, actual' in output
+
+
+def test_priority_accounts_use_reserved_slots(monkeypatch, tmp_path):
+	accounts = [{'cookies': {'session': f's{i}'}, 'api_user': str(i)} for i in range(4)]
+	accounts[3]['priority'] = True
+	monkeypatch.setenv('ANYROUTER_PRIORITY_SLOTS', '1')
+	monkeypatch.setenv('ANYROUTER_SCHEDULE', 'list')
+
+	started, _ = run_main(monkeypatch, tmp_path, accounts, [2, 2, 2, 1])
+	# 保留一个槽位后普通账号依次使用剩下的一个槽位，优先账号不必等待
+	assert started[:2] == [0, 3]
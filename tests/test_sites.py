@@ -0,0 +1,77 @@
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fake_anyrouter import FakeAnyRouter, make_waf_fetcher
+
+import checkin
+from sites import RateLimiter, SitePools, account_base_url
+
+
+def test_account_base_url(monkeypatch):
+	monkeypatch.delenv('ANYROUTER_BASE_URL', raising=False)
+	assert account_base_url({}) == 'https://anyrouter.top'
+	assert account_base_url({'base_url': 'https://relay.example.com/'}) == 'https://relay.example.com'
+	monkeypatch.setenv('ANYROUTER_BASE_URL', 'https://other.example.com')
+	assert account_base_url({}) == 'https://other.example.com'
+
+
+def test_rate_limiter_spaces_requests():
+	async def run():
+		limiter = RateLimiter(20)
+		start = time.perf_counter()
+		await asyncio.gather(*(limiter.wait() for _ in range(5)))
+		return time.perf_counter() - start
+
+	# 5 个请求按 50ms 间隔放行，第一个立即放行
+	assert asyncio.run(run()) >= 0.18
+
+
+def test_sites_share_client_per_exit():
+	async def run():
+		pools = SitePools()
+		site = pools.get('https://a.example.com')
+		assert pools.get('https://a.example.com') is site
+		assert site.client() is site.client()
+		assert site.client() is not site.client('http://127.0.0.1:1')
+		assert pools.get('https://b.example.com') is not site
+		await pools.aclose()
+
+	asyncio.run(run())
+
+
+def test_mixed_run_covers_all_sites(monkeypatch, tmp_path):
+	with FakeAnyRouter(latency=0.01, expired_sessions={'s2'}) as first, FakeAnyRouter(latency=0.01) as second:
+		accounts = [
+			{'cookies': {'session': f's{i}'}, 'api_user': str(i), 'base_url': server.base_url}
+			for i, server in enumerate([first, second, first, second, first])
+		]
+		monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps(accounts))
+		monkeypatch.setenv('ANYROUTER_CONCURRENCY', '3')
+		monkeypatch.setenv('ANYROUTER_STATE_DIR', str(tmp_path))
+		monkeypatch.setattr(checkin, 'get_waf_cookies_with_playwright', make_waf_fetcher())
+
+		with patch.object(checkin.notify, 'push_message') as mock_push, pytest.raises(SystemExit) as exit_info:
+			asyncio.run(checkin.main())
+
+	assert exit_info.value.code == 0
+	# 每个站点各获取一次 WAF cookies，签到请求发往各自的站点
+	assert (first.logins, second.logins) == (1, 1)
+	# 共享连接池时每个账号仍然使用自己的 session，过期的 s2 不会借用其他账号的 cookies
+	assert (first.sign_ins, second.sign_ins) == (2, 2)
+	assert set(first.balances) == {'0', '4'}
+	assert set(second.balances) == {'1', '3'}
+
+	content = mock_push.call_args[0][1]
+	first_host = first.base_url.split('://')[1]
+	assert f'[SUCCESS] Account 1 ({first_host})' in content
+	assert f'[FAIL] Account 3 ({first_host})' in content
+	assert '[SUCCESS] Success: 4/5' in content
@@ -0,0 +1,81 @@
+"""
+启动时间门禁
+
+定时任务每次都是冷启动，入口模块在导入时不应加载 Playwright、httpx 等只在部分代码路径上
+用到的依赖。用 python -X importtime 在子进程中测量入口模块的累计导入耗时，与
+tests/perf_baseline.json 中的 startup 基线比较。
+
+- PERF_TOLERANCE_SCALE: 按比例放宽容忍范围
+- PERF_UPDATE_BASELINE=1: 用本次结果重写基线
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+BASELINE_FILE = Path(__file__).parent / 'perf_baseline.json'
+
+# 入口: (工作目录, 模块名, 导入时不应加载的模块)
+ENTRY_POINTS = {
+	'checkin': (project_root, 'checkin', ('httpx', 'playwright', 'dotenv', 'h2', 'smtplib', 'cProfile', 'tracemalloc')),
+	'daemon': (project_root, 'daemon', ('httpx', 'playwright', 'dotenv', 'h2', 'smtplib', 'cProfile', 'tracemalloc')),
+	'qinglong': (project_root / 'qinglong', 'anyrouter_checkin', ('httpx', 'playwright', 'h2')),
+}
+
+RUNS = 3
+
+
+def import_time(cwd: Path, module: str) -> tuple[float, set[str]]:
+	"""返回模块的累计导入耗时（秒）和导入过程中加载的所有模块"""
+	proc = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+		cwd=cwd,
+		capture_output=True,
+		text=True,
+		check=True,
+	)
+	cumulative = None
+	modules = set()
+	for line in proc.stderr.splitlines():
+		if not line.startswith('import time:') or 'cumulative' in line:
+			continue
+		_, cumulative_us, name = line.split('|')
+		modules.add(name.strip())
+		if name.strip() == module and not name.startswith('  '):
+			cumulative = int(cumulative_us) / 1_000_000
+	assert cumulative is not None, proc.stderr[-2000:]
+	return cumulative, modules
+
+
+@pytest.mark.parametrize('name', list(ENTRY_POINTS))
+def test_heavy_dependencies_are_lazy(name):
+	cwd, module, lazy = ENTRY_POINTS[name]
+	_, modules = import_time(cwd, module)
+	loaded = sorted(m for m in modules if m.split('.')[0] in lazy)
+	assert not loaded, f'{module} imports {", ".join(loaded)} at startup'
+
+
+@pytest.mark.perf
+@pytest.mark.parametrize('name', list(ENTRY_POINTS))
+def test_startup_time(name, capsys):
+	cwd, module, _ = ENTRY_POINTS[name]
+	# 第一次运行预热字节码和文件系统缓存，取之后几次的最小值
+	import_time(cwd, module)
+	seconds = min(import_time(cwd, module)[0] for _ in range(RUNS))
+	with capsys.disabled():
+		print(f'\n[PERF] startup {name}: {seconds * 1000:.1f}ms')
+
+	baseline = json.loads(BASELINE_FILE.read_text(encoding='utf-8'))
+	if os.getenv('PERF_UPDATE_BASELINE') == '1':
+		baseline.setdefault('startup', {})[name] = round(seconds, 4)
+		BASELINE_FILE.write_text(json.dumps(baseline, indent=2) + '\n', encoding='utf-8')
+		return
+
+	scale = float(os.getenv('PERF_TOLERANCE_SCALE', '1'))
+	budget = baseline['startup'][name] * (1 + baseline['tolerances']['startup_growth'] * scale)
+	assert seconds <= budget, f'{name} startup regressed: {seconds * 1000:.1f}ms > {budget * 1000:.1f}ms'
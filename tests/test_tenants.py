@@ -0,0 +1,95 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fake_anyrouter import FakeAnyRouter, make_waf_fetcher
+
+import checkin
+
+NOTIFY_VARIABLES = (
+	'DINGDING_WEBHOOK',
+	'FEISHU_WEBHOOK',
+	'WEIXIN_WEBHOOK',
+	'PUSHPLUS_TOKEN',
+	'SERVERPUSHKEY',
+	'EMAIL_USER',
+)
+
+
+def test_tenants_share_the_run_and_get_their_own_reports(monkeypatch, tmp_path):
+	for name in NOTIFY_VARIABLES:
+		monkeypatch.delenv(name, raising=False)
+	monkeypatch.delenv('ANYROUTER_ACCOUNTS', raising=False)
+	monkeypatch.setenv('ANYROUTER_STATE_DIR', str(tmp_path))
+	monkeypatch.setenv('ANYROUTER_PRECHECK', '0')
+	monkeypatch.setenv('ANYROUTER_PROGRESS_EVERY', '1')
+	monkeypatch.setenv('ANYROUTER_PROGRESS_MIN_INTERVAL', '0')
+	monkeypatch.setattr(checkin, 'get_waf_cookies_with_playwright', make_waf_fetcher())
+
+	with FakeAnyRouter(expired_sessions={'b2'}) as server:
+
+		def accounts(prefix, count):
+			return [
+				{'cookies': {'session': f'{prefix}{i}'}, 'api_user': f'{prefix}{i}', 'base_url': server.base_url}
+				for i in range(1, count + 1)
+			]
+
+		tenants = [
+			{
+				'name': 'team-a',
+				'accounts': accounts('a', 1),
+				'notify': {'DINGDING_WEBHOOK': f'{server.base_url}/webhook/a'},
+			},
+			{
+				'name': 'team-b',
+				'accounts': accounts('b', 2),
+				'notify': {'WEIXIN_WEBHOOK': f'{server.base_url}/webhook/b'},
+			},
+		]
+		monkeypatch.setenv('ANYROUTER_TENANTS', json.dumps(tenants))
+		with patch.object(checkin.notify, 'push_message') as global_push, pytest.raises(SystemExit) as exit_info:
+			asyncio.run(checkin.main())
+
+	assert exit_info.value.code == 0
+	# 进度和汇总都只发到租户自己的通道，不经过环境变量中的通道
+	global_push.assert_not_called()
+	progress = [
+		(path, body['text']['content']) for path, body in server.webhooks if 'Progress' in body['text']['content']
+	]
+	assert {path for path, _ in progress} == {'/webhook/a', '/webhook/b'}
+	assert all(('team-b' in content) == (path == '/webhook/b') for path, content in progress)
+	# 所有租户共用一次 WAF cookies 获取
+	assert (server.logins, server.sign_ins) == (1, 2)
+	reports = {path: body['text']['content'] for path, body in server.webhooks}
+	assert set(reports) == {'/webhook/a', '/webhook/b'}
+	assert 'AnyRouter Check-in Results (team-a)' in reports['/webhook/a']
+	assert '[SUCCESS] team-a Account 1' in reports['/webhook/a']
+	assert 'team-b' not in reports['/webhook/a']
+	assert '[SUCCESS] Success: 1/1' in reports['/webhook/a']
+	assert '[FAIL] team-b Account 2' in reports['/webhook/b']
+	assert '[SUCCESS] Success: 1/2' in reports['/webhook/b']
+	# 各租户的通道熔断状态分开保存
+	assert (tmp_path / 'notify_breaker_team-a.json').exists()
+	assert (tmp_path / 'notify_breaker_team-b.json').exists()
+
+
+@pytest.mark.parametrize(
+	'tenants',
+	[
+		{'name': 'team-a'},
+		[{'name': 'team-a', 'accounts': [{'cookies': {}}]}],
+		[{'name': 'team-a', 'accounts': []}, {'name': 'team-a', 'accounts': []}],
+		[{'name': 'team-a', 'accounts': [], 'notify': 'https://example.com/hook'}],
+	],
+)
+def test_invalid_tenant_configuration(monkeypatch, tenants):
+	monkeypatch.delenv('ANYROUTER_TENANTS_FILE', raising=False)
+	monkeypatch.setenv('ANYROUTER_TENANTS', json.dumps(tenants))
+	assert checkin.load_tenants() == []
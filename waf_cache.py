@@ -0,0 +1,139 @@
+"""
+WAF cookies 共享缓存
+
+WAF cookies 属于出口 IP 和浏览器会话，而不是某个 AnyRouter 账号，因此一次运行中
+同一出口只获取一次，所有账号复用。并发的账号等待同一个进行中的获取（single-flight），
+响应显示 cookies 已失效时按出口失效并重新获取。
+
+指定 store 时 cookies 会保存到状态文件，有效期内的下一次运行可以直接复用，不用启动浏览器。
+文件中的出口以哈希保存，不会写入代理认证信息。
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+
+from proxy_pool import Proxy
+from state import load_json, save_json
+
+WAF_COOKIE_NAMES = ('acw_tc', 'cdn_sec_tc', 'acw_sc__v2')
+DIRECT = 'direct'
+
+
+def describe_key(key) -> str:
+	"""日志中的出口描述，代理地址去掉认证信息"""
+	if isinstance(key, tuple):
+		base_url, exit_key = key
+		return f'{base_url} via {describe_key(exit_key)}'
+	return DIRECT if key == DIRECT else Proxy(key).label
+
+
+class WafChallengeError(Exception):
+	"""响应是 WAF 挑战页面，说明 WAF cookies 已失效"""
+
+
+def is_waf_challenge(response) -> bool:
+	"""判断响应是否为 WAF 挑战页面而不是 API 的 JSON 响应"""
+	content_type = response.headers.get('content-type', '')
+	if 'json' in content_type:
+		return False
+	text = response.text
+	return 'acw_sc__v2' in text or 'arg1=' in text
+
+
+class WafCookieCache:
+	def __init__(self, fetch, max_age: float | None = None, clock=time.monotonic, store=None):
+		"""fetch 为 async (key, label) -> dict | None，实际负责获取 cookies；store 为持久化文件路径"""
+		self._fetch = fetch
+		self.max_age = max_age
+		self.clock = clock
+		self.store = store
+		self._entries: dict = {}
+		self._inflight: dict = {}
+		self._stored: dict = load_json(store, {}) if store else {}
+		self.fetch_count = 0
+		self.refresh_count = 0
+
+	@staticmethod
+	def _store_key(key) -> str:
+		return hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()[:32]
+
+	def _load_stored(self, key):
+		"""把状态文件中仍在有效期内的 cookies 载入内存，保存时间换算为本进程的时钟"""
+		stored = self._stored.pop(self._store_key(key), None)
+		if not stored:
+			return
+		age = max(0.0, time.time() - stored['saved_at'])
+		if self.max_age is None or age <= self.max_age:
+			self._entries[key] = (stored['cookies'], self.clock() - age)
+
+	def _save(self):
+		if not self.store:
+			return
+		now = time.time()
+		# 本次运行还没用到的出口原样保留
+		data = dict(self._stored)
+		for key, (cookies, fetched_at) in self._entries.items():
+			data[self._store_key(key)] = {'cookies': cookies, 'saved_at': now - (self.clock() - fetched_at)}
+		try:
+			save_json(self.store, data)
+		except OSError as e:
+			print(f'[WARNING] Unable to save WAF cookies: {e}')
+
+	def peek(self, key=DIRECT):
+		"""返回已缓存且未过期的 cookies，不触发获取"""
+		return self._fresh(key)
+
+	def _fresh(self, key):
+		if key not in self._entries and self._stored:
+			self._load_stored(key)
+		entry = self._entries.get(key)
+		if entry is None:
+			return None
+		cookies, fetched_at = entry
+		if self.max_age is not None and self.clock() - fetched_at > self.max_age:
+			del self._entries[key]
+			return None
+		return cookies
+
+	async def _fetch_and_store(self, key, label, on_failure=None):
+		cookies = None
+		try:
+			self.fetch_count += 1
+			cookies = await self._fetch(key, label)
+			if cookies:
+				self._entries[key] = (cookies, self.clock())
+				self._save()
+			return cookies
+		finally:
+			self._inflight.pop(key, None)
+			if not cookies and on_failure:
+				on_failure()
+
+	async def get(self, key=DIRECT, label: str = '', on_failure=None):
+		"""获取出口对应的 WAF cookies，缓存未命中时合并并发请求为一次获取
+
+		on_failure 只在本次调用实际发起的获取失败时调用一次，等待同一获取的其他账号不会重复调用。
+		"""
+		cookies = self._fresh(key)
+		if cookies is not None:
+			return cookies
+
+		task = self._inflight.get(key)
+		if task is None:
+			task = asyncio.ensure_future(self._fetch_and_store(key, label, on_failure))
+			self._inflight[key] = task
+		# shield 保证单个等待者被取消时不会中断其他账号共享的获取
+		return await asyncio.shield(task)
+
+	def invalidate(self, key=DIRECT, stale=None):
+		"""使出口的 cookies 失效；传入 stale 时只在缓存仍是这份 cookies 时失效，避免丢弃别人刚刷新的结果"""
+		entry = self._entries.get(key)
+		if entry is None:
+			return
+		if stale is None or entry[0] is stale:
+			del self._entries[key]
+			self.refresh_count += 1
+			self._save()
+			print(f'[INFO] WAF cookies for {describe_key(key)} are stale, will refresh on next use')